@@ -2,17 +2,26 @@ import sys
 import ctypes
 import os
 import traceback
-from PyQt6.QtWidgets import *
-from PyQt6.QtGui import *
-from PyQt6.QtCore import *
-from PyQt6.QtNetwork import QLocalServer, QLocalSocket
-from src.ui.main_window import MainWindow
-from src.core.path_utils import get_resource_path, get_config_path, get_winws_path
-from src.core.translator import tr
-from src.core.config_manager import ConfigManager
-from src.core.embedded_assets import get_app_icon
-from src.core.embedded_style import EmbeddedStyle
-from src.ui import theme
+from src.core import startup_profiler
+from src.core.single_instance import SHARED_MEMORY_KEY, SERVER_NAME, lower_server_integrity_label, notify_running_instance
+
+# Быстрый путь для повторного запуска: до импорта Qt, проверки прав и загрузки конфига
+# просим уже запущенный экземпляр показать окно и сразу выходим.
+if __name__ == '__main__' and notify_running_instance():
+    sys.exit(0)
+
+with startup_profiler.phase('import PyQt6'):
+    from PyQt6.QtWidgets import *
+    from PyQt6.QtGui import *
+    from PyQt6.QtCore import *
+    from PyQt6.QtNetwork import QLocalServer, QLocalSocket
+with startup_profiler.phase('import core'):
+    from src.core.path_utils import get_resource_path, get_config_path, get_winws_path
+    from src.core.translator import tr
+    from src.core.config_manager import ConfigManager
+    from src.core.embedded_assets import get_app_icon
+    from src.core.embedded_style import EmbeddedStyle
+    from src.ui import theme
 
 
 def is_admin():
@@ -28,13 +37,13 @@ def _check_single_instance():
     Если exit_this_process True — второй экземпляр, нужно подключиться к первому, показать окно и выйти.
     Иначе — первый экземпляр; shared_memory_to_keep нужно хранить до конца работы приложения."""
     from PyQt6.QtCore import QSharedMemory
-    shared = QSharedMemory("ZapretDesktop_SingleInstance")
+    shared = QSharedMemory(SHARED_MEMORY_KEY)
     if shared.create(1):
         return (False, shared)  # первый экземпляр — держим shared, чтобы сегмент не освободился
     if shared.attach():
         # второй экземпляр — просим первый показать окно
         sock = QLocalSocket()
-        sock.connectToServer("ZapretDesktop_Show", QLocalSocket.OpenModeFlag.ReadWrite)
+        sock.connectToServer(SERVER_NAME, QLocalSocket.OpenModeFlag.ReadWrite)
         if sock.waitForConnected(1500):
             sock.write(b"show")
             sock.flush()
@@ -111,43 +120,20 @@ def main():
         else:
             sys.exit(0)
     
-    app = QApplication(sys.argv)
-    app.setStyle(EmbeddedStyle('Fusion'))
-    app.setApplicationName('ZapretDesktop')
-    app.setOrganizationName('ZapretDesktop')
-
-    # Тема из настроек (до создания окна)
-    config = ConfigManager()
-    settings = config.load_settings()
-    theme_value = settings.get('color_theme', 'dark')
-    theme.set_theme(theme_value)
-    app = QApplication.instance()
-    app.setStyleSheet(theme.app_stylesheet())
-
-    from src.widgets.custom_scrollbar import ScrollbarStyler
-    ScrollbarStyler.apply_scrollbar_style(app, fade_timeout=1000)
-    app.setQuitOnLastWindowClosed(False)
-    app.setFont(QFont("Segoe UI", 9))
+    with startup_profiler.phase('QApplication'):
+        app = QApplication(sys.argv)
 
-    # Один экземпляр: при повторном запуске поднимаем существующее окно и выходим
+    # Один экземпляр: при повторном запуске поднимаем существующее окно и выходим.
+    # Проверяем до стиля, конфига и таблицы стилей — второму экземпляру они не нужны.
     exit_process, single_instance_shared = _check_single_instance()
     if exit_process:
         sys.exit(0)
     # single_instance_shared держим до конца работы приложения
 
-    winws_path = get_winws_path()
-    if not os.path.exists(winws_path):
-        from src.dialogs.winws_setup_dialog import WinwsSetupDialog
-
-        setup_dialog = WinwsSetupDialog(None, config)
-        if setup_dialog.exec() != QDialog.DialogCode.Accepted:
-            sys.exit(0)
-
-    window = MainWindow()
-    from src.core.window_styles import apply_window_style
-    apply_window_style(window)
-
-    # Локальный сервер: второй экземпляр подключается и просит показать окно
+    # Локальный сервер: второй экземпляр подключается и просит показать окно.
+    # Слушаем сразу, чтобы быстрый путь (single_instance.notify_running_instance)
+    # срабатывал и пока первый экземпляр ещё загружается.
+    window_holder = {'window': None}
     single_instance_server = QLocalServer()
     def on_show_request():
         conn = single_instance_server.nextPendingConnection()
@@ -155,6 +141,9 @@ def main():
             conn.disconnectFromServer()
             if conn.state() != QLocalSocket.LocalSocketState.UnconnectedState:
                 conn.waitForDisconnected(300)
+        window = window_holder['window']
+        if window is None:
+            return  # окно ещё создаётся и будет показано само
         if window.isMinimized() or not window.isVisible():
             window.show()
             window.raise_()
@@ -163,9 +152,50 @@ def main():
             window.raise_()
             window.activateWindow()
     single_instance_server.newConnection.connect(on_show_request)
-    single_instance_server.listen("ZapretDesktop_Show")
+    # Первый экземпляр повышен, а повторный запуск — обычный процесс: без доступа
+    # для всех и метки Medium он не сможет открыть канал
+    single_instance_server.setSocketOptions(QLocalServer.SocketOption.WorldAccessOption)
+    if single_instance_server.listen(SERVER_NAME):
+        lower_server_integrity_label(SERVER_NAME)
     # single_instance_server держим до конца работы
 
+    app.setStyle(EmbeddedStyle('Fusion'))
+    app.setApplicationName('ZapretDesktop')
+    app.setOrganizationName('ZapretDesktop')
+
+    # Тема из настроек (до создания окна)
+    with startup_profiler.phase('load settings'):
+        config = ConfigManager()
+        settings = config.load_settings()
+    with startup_profiler.phase('app stylesheet'):
+        theme_value = settings.get('color_theme', 'dark')
+        theme.set_theme(theme_value)
+        app = QApplication.instance()
+        app.setStyleSheet(theme.app_stylesheet())
+
+        from src.widgets.custom_scrollbar import ScrollbarStyler
+        ScrollbarStyler.apply_scrollbar_style(app, fade_timeout=1000)
+    app.setQuitOnLastWindowClosed(False)
+    app.setFont(QFont("Segoe UI", 9))
+
+    winws_path = get_winws_path()
+    if not os.path.exists(winws_path):
+        from src.dialogs.winws_setup_dialog import WinwsSetupDialog
+
+        setup_dialog = WinwsSetupDialog(None, config)
+        if setup_dialog.exec() != QDialog.DialogCode.Accepted:
+            sys.exit(0)
+
+    # MainWindow импортируем только здесь: тянет за собой диалоги, виджеты и psutil
+    with startup_profiler.phase('import MainWindow'):
+        from src.ui.main_window import MainWindow
+    with startup_profiler.phase('MainWindow()'):
+        window = MainWindow()
+        from src.core.window_styles import apply_window_style
+        apply_window_style(window)
+
+    window_holder['window'] = window
+
     sys.exit(app.exec())
 
 
@@ -2,7 +2,6 @@
 Класс для проверки и обновления самой программы ZapretDesktop.exe
 """
 import os
-import requests
 import shutil
 import sys
 import subprocess
@@ -31,33 +30,26 @@ class AppUpdater:
     
     def check_for_updates(self):
         """Проверяет наличие обновлений на GitHub"""
+        import requests
+        from .http_client import get_http_client, find_release_asset
+        from .downloader import sha256_from_digest
         try:
-            response = requests.get(self.GITHUB_API_URL, timeout=10)
-            response.raise_for_status()
-            release_data = response.json()
+            # Условный запрос: при неизменном релизе GitHub отвечает 304, данные берутся из кэша
+            release_data = get_http_client().get_json(self.GITHUB_API_URL, timeout=10)
             
             latest_version = release_data.get('tag_name', '').lstrip('v')
-            download_url = None
             
-            # Ищем exe файл для скачивания
-            for asset in release_data.get('assets', []):
-                asset_name = asset.get('name', '').lower()
-                if asset_name.endswith('.exe') and 'ZapretDesktop' in asset_name:
-                    download_url = asset.get('browser_download_url')
-                    break
-            
-            # Если не нашли по имени, ищем любой exe файл
-            if not download_url:
-                for asset in release_data.get('assets', []):
-                    if asset.get('name', '').endswith('.exe'):
-                        download_url = asset.get('browser_download_url')
-                        break
+            # Ищем exe файл для скачивания; если не нашли по имени, берём любой exe
+            asset = (find_release_asset(release_data, '.exe', name_contains='ZapretDesktop')
+                     or find_release_asset(release_data, '.exe'))
+            download_url = asset.get('browser_download_url') if asset else None
             
             return {
                 'has_update': self._compare_versions(latest_version, self.current_version),
                 'latest_version': latest_version,
                 'current_version': self.current_version,
                 'download_url': download_url,
+                'sha256': sha256_from_digest(asset.get('digest')) if asset else None,
                 'release_url': release_data.get('html_url', ''),
                 'release_notes': release_data.get('body', '')
             }
@@ -97,28 +89,17 @@ class AppUpdater:
             # Если не удалось сравнить, считаем что есть обновление если версии отличаются
             return v1 != v2 if 'v1' in locals() and 'v2' in locals() else version1 != version2
     
-    def download_update(self, download_url, progress_callback=None):
-        """Скачивает обновление"""
+    def download_update(self, download_url, progress_callback=None, expected_sha256=None):
+        """Скачивает обновление (с докачкой и проверкой SHA-256, если она известна)"""
+        from .downloader import download_file
         try:
-            response = requests.get(download_url, stream=True, timeout=30)
-            response.raise_for_status()
-            
             # Создаем временную папку для загрузки
             temp_dir = os.path.join(self.base_path, 'temp_update')
             os.makedirs(temp_dir, exist_ok=True)
             
             exe_path = os.path.join(temp_dir, 'ZapretDesktop_new.exe')
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded = 0
-            
-            with open(exe_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        if progress_callback and total_size > 0:
-                            progress = (downloaded / total_size) * 100
-                            progress_callback(progress)
+            download_file(download_url, exe_path, progress_callback=progress_callback,
+                          expected_sha256=expected_sha256)
             
             return exe_path
         except Exception as e:
@@ -7,7 +7,8 @@
 
 import os
 import sys
-import subprocess
+
+from .system_backend import get_backend
 
 
 class AutostartManager:
@@ -18,22 +19,20 @@ class AutostartManager:
     Для создания задачи приложение должно быть запущено с правами администратора.
     """
 
-    def __init__(self, app_name="ZapretDesktop"):
+    def __init__(self, app_name="ZapretDesktop", backend=None):
         self.app_name = app_name
         self.task_name = f"\\{app_name}"
+        self._backend = backend
+
+    @property
+    def backend(self):
+        """Backend системных вызовов (по умолчанию общий из system_backend)."""
+        return self._backend or get_backend()
 
     def is_enabled(self):
         """Проверяет, включен ли автозапуск (есть задача в планировщике)."""
         try:
-            result = subprocess.run(
-                ['schtasks', '/query', '/tn', self.task_name],
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            return result.returncode == 0
+            return self.backend.task_exists(self.task_name)
         except Exception:
             return False
 
@@ -60,29 +59,9 @@ class AutostartManager:
             if not username:
                 username = os.environ.get('USER', '')
 
-            cmd = [
-                'schtasks', '/Create',
-                '/TN', self.task_name,
-                '/TR', tr_arg,
-                '/SC', 'ONLOGON',
-                '/RL', 'HIGHEST',
-                '/F',
-            ]
-            if username:
-                cmd.extend(['/RU', username])
-
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-
-            if result.returncode == 0:
+            ok, err = self.backend.create_task(self.task_name, tr_arg, username)
+            if ok:
                 return True
-            err = result.stderr or result.stdout or ''
             print(f"Ошибка при создании задачи автозапуска: {err}")
             return False
 
@@ -93,14 +72,7 @@ class AutostartManager:
     def disable(self):
         """Выключает автозапуск (удаляет задачу из планировщика)."""
         try:
-            subprocess.run(
-                ['schtasks', '/delete', '/tn', self.task_name, '/f'],
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
+            self.backend.delete_task(self.task_name)
             # Удаляем старый ярлык из Startup (миграция со старых версий)
             startup_dir = os.path.join(
                 os.environ.get('APPDATA', ''),
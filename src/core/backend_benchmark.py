@@ -0,0 +1,112 @@
+"""
+Сценарий запуск -> диагностика -> остановка -> перезапуск на FakeBackend.
+
+Проходит через те же функции, что и главное окно (launch_strategy,
+stop_processes, run_diagnostics, кэш CachingBackend), с задержками
+операций, близкими к реальным sc / schtasks / psutil. Проверяет состояние
+после каждого шага и печатает время шагов; работает на Linux:
+
+    python -m src.core.backend_benchmark
+"""
+import os
+import sys
+import time
+
+from .diagnostics import CHECKS, run_diagnostics
+from .system_backend import CachingBackend, FakeBackend, stop_processes
+from .translator import tr
+
+
+# Задержки FakeBackend (секунды), порядок реальных вызовов на Windows
+DEFAULT_LATENCIES = {
+    'query_services': 0.15,
+    'query_service': 0.05,
+    'stop_service': 0.2,
+    'delete_service': 0.1,
+    'list_processes': 0.02,
+    'is_process_running': 0.01,
+    'terminate_processes': 0.05,
+    'kill_processes': 0.05,
+    'launch_strategy': 0.3,
+    'get_tcp_timestamps': 0.1,
+}
+# Проверки, которые целиком идут через backend (без winreg, powershell и ctypes)
+BACKEND_CHECKS = ('BFE', 'TCP timestamps', 'Adguard', 'Killer', 'VPN',
+                  'WinDivert conflict', 'zapret service', 'winws.exe')
+LANG = 'en'
+
+
+class ScenarioError(AssertionError):
+    """Состояние после шага сценария не совпало с ожидаемым."""
+
+
+def _diagnose(backend):
+    checks = [check for check in CHECKS if check[0] in BACKEND_CHECKS]
+    messages = []
+    run_diagnostics(LANG, lambda status, message: messages.append(message), checks=checks, backend=backend)
+    return messages
+
+
+def _expect(condition, message):
+    if not condition:
+        raise ScenarioError(message)
+
+
+def run_scenario(latencies=None, winws_folder='C:\\zapret\\winws', strategy='general'):
+    """Выполняет сценарий; возвращает [(шаг, секунды)]. При расхождении — ScenarioError."""
+    fake = FakeBackend(DEFAULT_LATENCIES if latencies is None else latencies)
+    backend = CachingBackend(fake)
+    bat_path = os.path.join(winws_folder, f'{strategy}.bat')
+    timings = []
+
+    def step(name, func):
+        start = time.perf_counter()
+        result = func()
+        timings.append((name, time.perf_counter() - start))
+        return result
+
+    messages = step('diagnostics (stopped)', lambda: _diagnose(backend))
+    _expect(tr('diag_winws_not_running', LANG) in messages, 'winws reported running before start')
+
+    process = step('start', lambda: backend.launch_strategy(bat_path, winws_folder))
+    _expect(process.poll() == 0, 'launcher did not exit')
+    _expect(backend.is_process_running('winws.exe'), 'winws.exe not running after start')
+    # Кэш служб сброшен запуском — WinDivert виден сразу, без ожидания TTL
+    _expect((backend.query_service('WinDivert') or {}).get('state') == 'RUNNING', 'WinDivert not running after start')
+
+    messages = step('diagnostics (running)', lambda: _diagnose(backend))
+    pid = backend.list_processes('winws.exe')[0].pid
+    _expect(tr('diag_winws_running', LANG).format(pid) in messages, 'diagnostics missed running winws.exe')
+    _expect(tr('diag_windivert_conflict_passed', LANG) in messages, 'WinDivert conflict while winws runs')
+
+    step('stop', lambda: stop_processes('winws.exe', grace=0.0, backend=backend))
+    _expect(not backend.is_process_running('winws.exe'), 'winws.exe still running after stop')
+    _expect(backend.query_service('WinDivert')['state'] == 'STOPPED', 'WinDivert still running after stop')
+
+    messages = step('diagnostics (after stop)', lambda: _diagnose(backend))
+    _expect(tr('diag_winws_not_running', LANG) in messages, 'diagnostics reported winws.exe after stop')
+    _expect(tr('diag_windivert_conflict_passed', LANG) in messages, 'stopped WinDivert reported as conflict')
+
+    def restart():
+        stop_processes('winws.exe', grace=0.0, backend=backend)
+        return backend.launch_strategy(bat_path, winws_folder)
+
+    step('restart', restart)
+    _expect(len(backend.list_processes('winws.exe')) == 1, 'restart left more than one winws.exe')
+    return timings
+
+
+def main():
+    try:
+        timings = run_scenario()
+    except ScenarioError as e:
+        print(f'FAILED: {e}')
+        return 1
+    for name, seconds in timings:
+        print(f'{name:<28}{seconds * 1000:8.1f} ms')
+    print(f'{"total":<28}{sum(s for _n, s in timings) * 1000:8.1f} ms')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,10 +2,102 @@
 Модуль для генерации BAT файлов стратегий winws
 """
 import os
+from .ipset_engine import IntervalSet
 from .path_utils import get_winws_path
 from .winws_manager import WinwsManager
 
 
+MAX_PORT = 65535
+
+
+class PortRangeSet:
+    """Набор портов как отсортированные слитые диапазоны плюс токены вроде %GameFilter%
+    
+    Диапазоны хранятся в IntervalSet (как ipset), поэтому 1024-65535 — это одна пара
+    чисел, а не 64 тысячи портов; объединение и форматирование не зависят от ширины диапазонов.
+    """
+    
+    def __init__(self, spec=None):
+        self._ranges = IntervalSet(bits=16)
+        self._tokens = {}  # токены (переменные bat и прочее) в порядке добавления
+        if spec:
+            self.add(spec)
+    
+    @staticmethod
+    def _parse(port_string):
+        """Разбирает "80,443,19294-19344,%GameFilter%" в (диапазоны, токены)"""
+        ranges = []
+        tokens = []
+        for part in port_string.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            start, sep, end = part.partition('-')
+            try:
+                start_port = int(start)
+                end_port = int(end) if sep else start_port
+            except ValueError:
+                if not sep:
+                    # Это может быть переменная типа %GameFilter%
+                    tokens.append(part)
+                continue
+            if 0 <= start_port <= end_port <= MAX_PORT:
+                ranges.append((start_port, end_port))
+        return ranges, tokens
+    
+    def add(self, ports):
+        """Добавляет порты: строку winws, другой PortRangeSet, порт (int) или итерируемое из них"""
+        ranges = []
+        tokens = []
+        self._collect(ports, ranges, tokens)
+        self._ranges.add_ranges(ranges)  # одно слияние на весь вызов
+        self._tokens.update(dict.fromkeys(tokens))
+        return self
+    
+    def _collect(self, ports, ranges, tokens):
+        if isinstance(ports, PortRangeSet):
+            ranges.extend(ports._ranges.ranges())
+            tokens.extend(ports._tokens)
+        elif isinstance(ports, str):
+            parsed_ranges, parsed_tokens = self._parse(ports)
+            ranges.extend(parsed_ranges)
+            tokens.extend(parsed_tokens)
+        elif isinstance(ports, int):
+            ranges.append((ports, ports))
+        else:
+            for item in ports:
+                self._collect(item, ranges, tokens)
+    
+    def __or__(self, other):
+        return PortRangeSet().add(self).add(other)
+    
+    def __ior__(self, other):
+        return self.add(other)
+    
+    def __contains__(self, port):
+        if isinstance(port, int):
+            return port in self._ranges
+        return port in self._tokens
+    
+    def __len__(self):
+        """Число портов (токены не считаются)"""
+        return self._ranges.address_count()
+    
+    def ranges(self):
+        return list(self._ranges.ranges())
+    
+    def format(self):
+        """Строка для --wf-tcp/--wf-udp: диапазоны по возрастанию, затем прочие токены, затем %переменные%"""
+        parts = [str(start) if start == end else f'{start}-{end}' for start, end in self._ranges.ranges()]
+        variables = [t for t in self._tokens if t.startswith('%') and t.endswith('%')]
+        parts.extend(t for t in self._tokens if t not in variables)
+        parts.extend(variables)
+        return ','.join(parts)
+    
+    def __str__(self):
+        return self.format()
+
+
 class BatGenerator:
     """Класс для генерации BAT файлов стратегий"""
     
@@ -52,35 +144,27 @@ class BatGenerator:
             '',
         ])
         
-        # Собираем порты для Windows Firewall
-        wf_tcp_ports = set()
-        wf_udp_ports = set()
+        # Собираем порты для Windows Firewall (диапазоны сливаются сразу, без разворачивания в порты)
+        wf_tcp_ports = PortRangeSet()
+        wf_udp_ports = PortRangeSet()
         
         for rule in rules:
             if 'filter_tcp' in rule:
-                ports = self._parse_ports(rule['filter_tcp'])
-                wf_tcp_ports.update(ports)
+                wf_tcp_ports.add(rule['filter_tcp'])
             if 'filter_udp' in rule:
-                ports = self._parse_ports(rule['filter_udp'])
-                wf_udp_ports.update(ports)
+                wf_udp_ports.add(rule['filter_udp'])
         
         # Добавляем стандартные порты
-        wf_tcp_ports.update([80, 443, 2053, 2083, 2087, 2096, 8443])
-        wf_udp_ports.update([443, 19294, 19344, 50000, 50100])
+        wf_tcp_ports.add([80, 443, 2053, 2083, 2087, 2096, 8443])
+        wf_udp_ports.add([443, 19294, 19344, 50000, 50100])
         
         if use_game_filter:
             wf_tcp_ports.add('%GameFilter%')
             wf_udp_ports.add('%GameFilter%')
         
         # Формируем строку запуска winws.exe
-        wf_tcp_str = ','.join(sorted([str(p) for p in wf_tcp_ports if not isinstance(p, str)]) + 
-                                  [p for p in wf_tcp_ports if isinstance(p, str)])
-        wf_udp_str = ','.join(sorted([str(p) for p in wf_udp_ports if not isinstance(p, str)]) + 
-                                  [p for p in wf_udp_ports if isinstance(p, str)])
-        
-        # Объединяем диапазоны портов
-        wf_tcp_str = self._merge_port_ranges(wf_tcp_str)
-        wf_udp_str = self._merge_port_ranges(wf_udp_str)
+        wf_tcp_str = wf_tcp_ports.format()
+        wf_udp_str = wf_udp_ports.format()
         
         start_line = f'start "zapret: %~n0" /B /min "%BIN%winws.exe" --wf-tcp={wf_tcp_str} --wf-udp={wf_udp_str}'
         
@@ -179,93 +263,6 @@ class BatGenerator:
         
         return bat_file
     
-    def _parse_ports(self, port_string):
-        """Парсит строку портов в список
-        
-        Args:
-            port_string: Строка вида "80,443,19294-19344" или "%GameFilter%"
-        
-        Returns:
-            set: Множество портов (может содержать строки типа "%GameFilter%")
-        """
-        ports = set()
-        parts = port_string.split(',')
-        
-        for part in parts:
-            part = part.strip()
-            if '-' in part:
-                # Диапазон портов
-                start, end = part.split('-')
-                try:
-                    start_port = int(start.strip())
-                    end_port = int(end.strip())
-                    ports.update(range(start_port, end_port + 1))
-                except ValueError:
-                    pass
-            else:
-                # Одиночный порт или переменная
-                try:
-                    ports.add(int(part))
-                except ValueError:
-                    # Это может быть переменная типа %GameFilter%
-                    ports.add(part)
-        
-        return ports
-    
-    def _merge_port_ranges(self, port_string):
-        """Объединяет последовательные порты в диапазоны
-        
-        Args:
-            port_string: Строка вида "80,443,19294,19295,19296"
-        
-        Returns:
-            str: Строка с объединенными диапазонами "80,443,19294-19296"
-        """
-        parts = port_string.split(',')
-        ports = []
-        variables = []
-        
-        for part in parts:
-            part = part.strip()
-            if part.startswith('%') and part.endswith('%'):
-                variables.append(part)
-            else:
-                try:
-                    ports.append(int(part))
-                except ValueError:
-                    ports.append(part)
-        
-        # Сортируем числовые порты
-        numeric_ports = sorted([p for p in ports if isinstance(p, int)])
-        other_ports = [p for p in ports if not isinstance(p, int)]
-        
-        # Объединяем последовательные порты в диапазоны
-        merged = []
-        if numeric_ports:
-            start = numeric_ports[0]
-            end = numeric_ports[0]
-            
-            for port in numeric_ports[1:]:
-                if port == end + 1:
-                    end = port
-                else:
-                    if start == end:
-                        merged.append(str(start))
-                    else:
-                        merged.append(f"{start}-{end}")
-                    start = port
-                    end = port
-            
-            if start == end:
-                merged.append(str(start))
-            else:
-                merged.append(f"{start}-{end}")
-        
-        merged.extend(other_ports)
-        merged.extend(variables)
-        
-        return ','.join(merged)
-    
     def get_available_bin_files(self):
         """Получает список доступных bin файлов для DPI desync
         
@@ -0,0 +1,182 @@
+"""
+Пакетная правка .bat стратегий за один проход.
+
+Каждый .bat читается один раз, к содержимому последовательно применяется
+упорядоченный список преобразований (/B, удаление check_updates,
+пользовательские regex-правила из настройки bat_regex_rules), и файл
+записывается только если содержимое изменилось — атомарно (временный
+файл + os.replace). Файлы обрабатываются в пуле потоков.
+
+Содержимое декодируется как UTF-8 с surrogateescape, поэтому байты
+в других кодировках (cp866 и т.п.) и переводы строк сохраняются как есть.
+В режиме dry_run файлы не меняются, а возвращаются unified diff.
+"""
+import difflib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+
+START_PLAIN = 'start "zapret: %~n0" /min'
+START_WITH_B = 'start "zapret: %~n0" /B /min'
+CHECK_UPDATES_LINE = 'call service.bat check_updates'
+MAX_WORKERS = 8
+
+
+def add_b_flag(content):
+    """Добавляет /B в строку запуска winws (окно не создаётся)."""
+    return content.replace(START_PLAIN, START_WITH_B)
+
+
+def remove_b_flag(content):
+    """Убирает /B из строки запуска winws."""
+    return content.replace(START_WITH_B, START_PLAIN)
+
+
+def remove_check_updates(content):
+    """Удаляет строки с "call service.bat check_updates"."""
+    lines = content.splitlines(keepends=True)
+    kept = [line for line in lines if CHECK_UPDATES_LINE not in line.strip().lower()]
+    if len(kept) == len(lines):
+        return content
+    return ''.join(kept)
+
+
+# Зарегистрированные преобразования: имя -> функция str -> str
+TRANSFORMS = {
+    'add_b_flag': add_b_flag,
+    'remove_b_flag': remove_b_flag,
+    'remove_check_updates': remove_check_updates,
+}
+
+
+def register_transform(name, func):
+    """Регистрирует преобразование под именем name."""
+    TRANSFORMS[name] = func
+
+
+def regex_transform(pattern, replacement, ignore_case=False):
+    """Преобразование по регулярному выражению (re.sub, многострочный режим).
+
+    Для файлов с CRLF шаблон применяется к тексту с LF, чтобы '$' совпадал с концом строки.
+    Некорректный шаблон выбрасывает re.error при создании.
+    """
+    flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+    compiled = re.compile(pattern, flags)
+
+    def transform(content):
+        if '\r\n' in content:
+            return compiled.sub(replacement, content.replace('\r\n', '\n')).replace('\n', '\r\n')
+        return compiled.sub(replacement, content)
+    return transform
+
+
+def rule_transforms(rules):
+    """Преобразования из настройки bat_regex_rules.
+
+    Элемент правила: {'pattern': ..., 'replacement': ..., 'ignore_case': bool, 'enabled': bool}.
+    Отключённые и некорректные правила пропускаются.
+    """
+    result = []
+    for i, rule in enumerate(rules or []):
+        if not isinstance(rule, dict) or not rule.get('enabled', True) or not rule.get('pattern'):
+            continue
+        try:
+            func = regex_transform(rule['pattern'], rule.get('replacement', ''),
+                                   rule.get('ignore_case', False))
+        except re.error:
+            continue
+        result.append((f"regex:{rule.get('name') or i}", func))
+    return result
+
+
+def update_transforms(settings):
+    """Упорядоченный список преобразований после обновления zapret по настройкам."""
+    transforms = []
+    if settings.get('add_b_flag_on_update', False):
+        transforms.append(('add_b_flag', TRANSFORMS['add_b_flag']))
+    if settings.get('remove_check_updates', False):
+        transforms.append(('remove_check_updates', TRANSFORMS['remove_check_updates']))
+    transforms.extend(rule_transforms(settings.get('bat_regex_rules')))
+    return transforms
+
+
+def resolve(names):
+    """Список (имя, функция) по именам зарегистрированных преобразований."""
+    return [(name, TRANSFORMS[name]) for name in names]
+
+
+def list_bat_files(winws_folder):
+    """Имена всех .bat в папке winws (как и раньше, включая service.bat)."""
+    try:
+        with os.scandir(winws_folder) as it:
+            return sorted(e.name for e in it if e.name.lower().endswith('.bat') and e.is_file())
+    except OSError:
+        return []
+
+
+def _write_atomic(path, data):
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _process_file(path, transforms, dry_run):
+    """Возвращает (изменён ли файл, diff или None)."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    original = raw.decode('utf-8', errors='surrogateescape')
+    content = original
+    for _name, func in transforms:
+        content = func(content)
+    if content == original:
+        return False, None
+    if dry_run:
+        name = os.path.basename(path)
+        diff = ''.join(difflib.unified_diff(
+            original.splitlines(keepends=True), content.splitlines(keepends=True),
+            fromfile=name, tofile=name,
+        ))
+        return True, diff.encode('utf-8', errors='surrogateescape').decode('utf-8', errors='replace')
+    _write_atomic(path, content.encode('utf-8', errors='surrogateescape'))
+    return True, None
+
+
+def apply_transforms(winws_folder, transforms, dry_run=False, files=None):
+    """Применяет преобразования ко всем .bat в winws_folder за один проход.
+
+    transforms — список (имя, функция). Возвращает dict:
+    processed — число обработанных файлов, modified — изменённые файлы,
+    errors — строки "файл: ошибка", diffs — {файл: diff} (только при dry_run).
+    """
+    result = {'processed': 0, 'modified': [], 'errors': [], 'diffs': {}}
+    if files is None:
+        files = list_bat_files(winws_folder)
+    if not transforms or not files:
+        return result
+    workers = min(MAX_WORKERS, len(files))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            name: pool.submit(_process_file, os.path.join(winws_folder, name), transforms, dry_run)
+            for name in files
+        }
+        for name, future in futures.items():
+            try:
+                changed, diff = future.result()
+            except Exception as e:
+                result['errors'].append(f'{name}: {e}')
+                continue
+            result['processed'] += 1
+            if changed:
+                result['modified'].append(name)
+                if diff is not None:
+                    result['diffs'][name] = diff
+    return result
@@ -44,6 +44,7 @@ class ConfigManager:
             'auto_restart_apps': [],  # Список имён процессов для автоперезапуска (discord.exe и т.п.)
             'zapret_repo': 'Flowseal/zapret-discord-youtube',  # Репозиторий zapret по умолчанию
             'remove_check_updates': True,  # Удалять проверку обновлений zapret из стратегий
+            'bat_regex_rules': [],  # Пользовательские regex-правки .bat: [{'pattern', 'replacement', 'ignore_case', 'enabled'}]
         }
         self.default_config = {
             'app': self.default_settings.copy(),
@@ -0,0 +1,400 @@
+"""
+Диагностика системы (аналог проверок service.bat).
+
+Каждая проверка — независимая функция, возвращающая список строк
+(статус, сообщение); статус: "✓" — пройдено, "✗" — проблема, "?" — предупреждение.
+Проверки выполняются параллельно в пуле потоков с таймаутом на каждую,
+результаты передаются в callback по мере готовности.
+
+Общие данные (список служб и драйверов из одного вызова `sc query`,
+список процессов) вычисляются один раз в DiagnosticsContext и
+разделяются между проверками. Службы, процессы и netsh идут через
+system_backend, поэтому диагностику можно прогнать на FakeBackend.
+"""
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from .path_utils import get_winws_path
+from .system_backend import get_backend, invalidate_service_cache
+from .translator import tr
+
+
+DEFAULT_CHECK_TIMEOUT = 10
+MAX_WORKERS = 8
+# Как часто проверять, начали ли выполняться проверки из очереди пула (для отсчёта их таймаута)
+START_POLL_INTERVAL = 0.1
+# Активные состояния служб (sc query без state= all показывает именно их)
+ACTIVE_STATES = ('RUNNING', 'START_PENDING', 'STOP_PENDING', 'CONTINUE_PENDING', 'PAUSE_PENDING', 'PAUSED')
+
+
+def _run(args, timeout=5):
+    kwargs = {}
+    if os.name == 'nt':
+        kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW
+    return subprocess.run(args, capture_output=True, text=True, timeout=timeout, **kwargs)
+
+
+class DiagnosticsContext:
+    """Общие для проверок данные; каждое значение вычисляется один раз (потокобезопасно)."""
+
+    def __init__(self, lang='ru', backend=None):
+        self.lang = lang
+        self.backend = backend or get_backend()
+        self.winws_folder = get_winws_path()
+        self._lock = threading.Lock()
+        self._services = None
+        self._processes = None
+
+    def services(self):
+        """Все службы и драйверы (включая остановленные) из одного вызова sc query."""
+        with self._lock:
+            if self._services is None:
+                self._services = self.backend.query_services()
+            return self._services
+
+    def service(self, name):
+        return self.services().get(name.lower())
+
+    def active_services(self):
+        return [s for s in self.services().values() if s['state'] in ACTIVE_STATES]
+
+    def processes(self):
+        """{имя процесса в нижнем регистре: pid} по одному обходу процессов."""
+        with self._lock:
+            if self._processes is None:
+                procs = {}
+                for proc in self.backend.list_processes():
+                    procs.setdefault(proc.name.lower(), proc.pid)
+                self._processes = procs
+            return self._processes
+
+
+def _find_active(ctx, *words):
+    """Активные службы, в имени или отображаемом имени которых есть все слова."""
+    found = []
+    for s in ctx.active_services():
+        text = f"{s['name']} {s['display_name']}"
+        if all(w in text for w in words):
+            found.append(s)
+    return found
+
+
+# ---------- Проверки ----------
+
+def check_bfe(ctx):
+    lang = ctx.lang
+    bfe = ctx.service('BFE')
+    if bfe and bfe['state'] == 'RUNNING':
+        return [("✓", tr('diag_bfe_passed', lang))]
+    return [("✗", tr('diag_bfe_failed', lang))]
+
+
+def check_proxy(ctx):
+    import winreg
+    lang = ctx.lang
+    try:
+        key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Software\Microsoft\Windows\CurrentVersion\Internet Settings")
+    except FileNotFoundError:
+        return [("✓", tr('diag_proxy_passed', lang))]
+    try:
+        try:
+            proxy_enable, _ = winreg.QueryValueEx(key, "ProxyEnable")
+        except FileNotFoundError:
+            proxy_enable = 0
+        if proxy_enable:
+            proxy_server, _ = winreg.QueryValueEx(key, "ProxyServer")
+            return [("?", tr('diag_proxy_enabled', lang).format(proxy_server)),
+                    ("?", tr('diag_proxy_check_proxy', lang))]
+        return [("✓", tr('diag_proxy_passed', lang))]
+    finally:
+        winreg.CloseKey(key)
+
+
+def check_tcp_timestamps(ctx):
+    lang = ctx.lang
+    if ctx.backend.get_tcp_timestamps():
+        return [("✓", tr('diag_tcp_passed', lang))]
+    results = [("?", tr('diag_tcp_disabled', lang))]
+    if ctx.backend.set_tcp_timestamps(True):
+        results.append(("✓", tr('diag_tcp_enabled', lang)))
+    else:
+        results.append(("✗", tr('diag_tcp_failed', lang)))
+    return results
+
+
+def check_adguard(ctx):
+    lang = ctx.lang
+    try:
+        found = 'adguardsvc.exe' in ctx.processes()
+    except Exception:
+        found = False
+    if found:
+        return [("✗", tr('diag_adguard_found', lang)),
+                ("✗", "https://github.com/Flowseal/zapret-discord-youtube/issues/417")]
+    return [("✓", tr('diag_adguard_passed', lang))]
+
+
+def check_killer(ctx):
+    lang = ctx.lang
+    if _find_active(ctx, 'Killer'):
+        return [("✗", tr('diag_killer_found', lang)),
+                ("✗", "https://github.com/Flowseal/zapret-discord-youtube/issues/2512#issuecomment-2821119513")]
+    return [("✓", tr('diag_killer_passed', lang))]
+
+
+def check_intel(ctx):
+    lang = ctx.lang
+    if _find_active(ctx, 'Intel', 'Connectivity', 'Network'):
+        return [("✗", tr('diag_intel_found', lang)),
+                ("✗", "https://github.com/ValdikSS/GoodbyeDPI/issues/541#issuecomment-2661670982")]
+    return [("✓", tr('diag_intel_passed', lang))]
+
+
+def check_checkpoint(ctx):
+    lang = ctx.lang
+    if _find_active(ctx, 'TracSrvWrapper') or _find_active(ctx, 'EPWD'):
+        return [("✗", tr('diag_checkpoint_found', lang)),
+                ("✗", tr('diag_checkpoint_uninstall', lang))]
+    return [("✓", tr('diag_checkpoint_passed', lang))]
+
+
+def check_smartbyte(ctx):
+    lang = ctx.lang
+    if _find_active(ctx, 'SmartByte'):
+        return [("✗", tr('diag_smartbyte_found', lang)),
+                ("✗", tr('diag_smartbyte_uninstall', lang))]
+    return [("✓", tr('diag_smartbyte_passed', lang))]
+
+
+def check_windivert_file(ctx):
+    lang = ctx.lang
+    bin_path = os.path.join(ctx.winws_folder, 'bin')
+    sys_files = [f for f in os.listdir(bin_path) if f.endswith('.sys')] if os.path.exists(bin_path) else []
+    if not sys_files:
+        return [("✗", tr('diag_windivert_not_found', lang))]
+    return [("✓", tr('diag_windivert_found', lang).format(', '.join(sys_files)))]
+
+
+def check_vpn(ctx):
+    lang = ctx.lang
+    vpn_services = [s['display_name'] or s['name'] for s in _find_active(ctx, 'VPN')]
+    if vpn_services:
+        return [("?", tr('diag_vpn_found', lang).format(', '.join(vpn_services))),
+                ("?", tr('diag_vpn_disable', lang))]
+    return [("✓", tr('diag_vpn_passed', lang))]
+
+
+def check_secure_dns(ctx):
+    lang = ctx.lang
+    ps_cmd = "Get-ChildItem -Recurse -Path 'HKLM:System\\CurrentControlSet\\Services\\Dnscache\\InterfaceSpecificParameters\\' -ErrorAction SilentlyContinue | Get-ItemProperty -ErrorAction SilentlyContinue | Where-Object { $_.DohFlags -gt 0 } | Measure-Object | Select-Object -ExpandProperty Count"
+    try:
+        result = _run(['powershell', '-NoProfile', '-Command', ps_cmd], timeout=10)
+    except Exception:
+        return [("?", tr('diag_dns_unknown', lang))]
+    out = result.stdout.strip()
+    if out.isdigit() and int(out) > 0:
+        return [("✓", tr('diag_secure_dns_passed', lang))]
+    return [("?", tr('diag_dns_configure', lang)), ("?", tr('diag_dns_win11', lang))]
+
+
+def check_windivert_conflict(ctx):
+    lang = ctx.lang
+    windivert = ctx.service('WinDivert')
+    windivert_running = bool(windivert) and windivert['state'] in ('RUNNING', 'STOP_PENDING')
+    if 'winws.exe' in ctx.processes() or not windivert_running:
+        return [("✓", tr('diag_windivert_conflict_passed', lang))]
+    results = [("?", tr('diag_windivert_attempt', lang))]
+    try:
+        ctx.backend.stop_service('WinDivert')
+        ctx.backend.delete_service('WinDivert')
+        if ctx.backend.query_service('WinDivert') is None:
+            results.append(("✓", tr('diag_windivert_removed', lang)))
+        else:
+            results.append(("✗", tr('diag_windivert_delete_failed', lang)))
+    except Exception as e:
+        results.append(("✗", tr('diag_windivert_error', lang).format(str(e))))
+    return results
+
+
+def check_zapret_service(ctx):
+    lang = ctx.lang
+    zapret = ctx.service('zapret')
+    if not zapret:
+        return [("?", tr('diag_zapret_not_installed', lang))]
+    if zapret['state'] == 'RUNNING':
+        results = [("✓", tr('diag_zapret_running', lang))]
+        # Пытаемся получить информацию о стратегии из реестра
+        try:
+            import winreg
+            key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"System\CurrentControlSet\Services\zapret")
+            strategy_path, _ = winreg.QueryValueEx(key, "zapret-discord-youtube")
+            results.append(("✓", tr('diag_zapret_strategy', lang).format(strategy_path)))
+            winreg.CloseKey(key)
+        except Exception:
+            pass
+        return results
+    if zapret['state'] == 'STOPPED':
+        return [("?", tr('diag_zapret_stopped', lang))]
+    return [("?", tr('diag_zapret_unknown', lang))]
+
+
+def check_winws_process(ctx):
+    lang = ctx.lang
+    pid = ctx.processes().get('winws.exe')
+    if pid is not None:
+        return [("✓", tr('diag_winws_running', lang).format(pid))]
+    return [("?", tr('diag_winws_not_running', lang))]
+
+
+def check_windows_version(ctx):
+    import platform
+    return [("✓", tr('diag_windows_version', ctx.lang).format(
+        platform.release(), platform.version(), platform.machine()))]
+
+
+def check_admin(ctx):
+    import ctypes
+    if ctypes.windll.shell32.IsUserAnAdmin() != 0:
+        return [("✓", tr('diag_admin_yes', ctx.lang))]
+    return [("✗", tr('diag_admin_no', ctx.lang))]
+
+
+def check_strategies(ctx):
+    lang = ctx.lang
+    strategies_path = os.path.join(ctx.winws_folder, 'strategies')
+    if not os.path.exists(strategies_path):
+        return [("?", tr('diag_strategies_not_found', lang))]
+    bat_files = [f for f in os.listdir(strategies_path) if f.endswith('.bat')]
+    if bat_files:
+        return [("✓", tr('diag_strategies_found', lang).format(len(bat_files)))]
+    return [("?", tr('diag_strategies_empty', lang))]
+
+
+def check_dns_servers(ctx):
+    lang = ctx.lang
+    result = _run(['ipconfig', '/all'])
+    dns_servers = []
+    for line in result.stdout.split('\n'):
+        if 'DNS Servers' in line or 'DNS-серверы' in line:
+            parts = line.split(':')
+            if len(parts) > 1:
+                dns = parts[1].strip()
+                if dns and dns not in dns_servers:
+                    dns_servers.append(dns)
+    if dns_servers:
+        return [("✓", tr('diag_dns_servers', lang).format(', '.join(dns_servers[:3])))]
+    return [("?", tr('diag_dns_not_detected', lang))]
+
+
+def check_adapters(ctx):
+    lang = ctx.lang
+    result = _run(['ipconfig'])
+    adapters = [line.strip() for line in result.stdout.split('\n')
+                if 'adapter' in line.lower() or 'адаптер' in line.lower()]
+    if adapters:
+        return [("✓", tr('diag_adapters_found', lang).format(len(adapters)))]
+    return [("?", tr('diag_adapters_not_detected', lang))]
+
+
+def check_targets(ctx):
+    lang = ctx.lang
+    targets_path = os.path.join(ctx.winws_folder, 'utils', 'targets.txt')
+    if not os.path.exists(targets_path):
+        return [("?", tr('diag_targets_not_found', lang))]
+    with open(targets_path, 'r', encoding='utf-8') as f:
+        targets_count = len([line for line in f if line.strip()])
+    return [("✓", tr('diag_targets_found', lang).format(targets_count))]
+
+
+def check_hosts(ctx):
+    lang = ctx.lang
+    hosts_path = r"C:\Windows\System32\drivers\etc\hosts"
+    if not os.path.exists(hosts_path):
+        return [("✗", tr('diag_hosts_not_found', lang))]
+    with open(hosts_path, 'r', encoding='utf-8', errors='ignore') as f:
+        hosts_lines = [line for line in f if line.strip() and not line.strip().startswith('#')]
+    return [("✓", tr('diag_hosts_found', lang).format(len(hosts_lines)))]
+
+
+# (имя, функция, ключ перевода для ошибки, таймаут в секундах);
+# проверки с ключом None обрабатывают свои ошибки сами
+CHECKS = [
+    ('BFE', check_bfe, 'diag_error_bfe', DEFAULT_CHECK_TIMEOUT),
+    ('Proxy', check_proxy, 'diag_error_proxy', DEFAULT_CHECK_TIMEOUT),
+    ('TCP timestamps', check_tcp_timestamps, 'diag_error_tcp', DEFAULT_CHECK_TIMEOUT),
+    ('Adguard', check_adguard, None, DEFAULT_CHECK_TIMEOUT),
+    ('Killer', check_killer, 'diag_error_killer', DEFAULT_CHECK_TIMEOUT),
+    ('Intel Connectivity', check_intel, 'diag_error_intel', DEFAULT_CHECK_TIMEOUT),
+    ('Check Point', check_checkpoint, 'diag_error_checkpoint', DEFAULT_CHECK_TIMEOUT),
+    ('SmartByte', check_smartbyte, 'diag_error_smartbyte', DEFAULT_CHECK_TIMEOUT),
+    ('WinDivert64.sys', check_windivert_file, 'diag_error_windivert', DEFAULT_CHECK_TIMEOUT),
+    ('VPN', check_vpn, 'diag_error_vpn', DEFAULT_CHECK_TIMEOUT),
+    ('Secure DNS', check_secure_dns, None, 15),
+    ('WinDivert conflict', check_windivert_conflict, 'diag_error_windivert_conflict', 20),
+    ('zapret service', check_zapret_service, 'diag_error_zapret', DEFAULT_CHECK_TIMEOUT),
+    ('winws.exe', check_winws_process, 'diag_error_winws', DEFAULT_CHECK_TIMEOUT),
+    ('Windows', check_windows_version, 'diag_error_windows', DEFAULT_CHECK_TIMEOUT),
+    ('Admin', check_admin, 'diag_error_admin', DEFAULT_CHECK_TIMEOUT),
+    ('Strategies', check_strategies, 'diag_error_strategies', DEFAULT_CHECK_TIMEOUT),
+    ('DNS servers', check_dns_servers, 'diag_error_dns', DEFAULT_CHECK_TIMEOUT),
+    ('Adapters', check_adapters, 'diag_error_adapters', DEFAULT_CHECK_TIMEOUT),
+    ('targets.txt', check_targets, 'diag_error_targets', DEFAULT_CHECK_TIMEOUT),
+    ('hosts', check_hosts, 'diag_error_hosts', DEFAULT_CHECK_TIMEOUT),
+]
+
+
+def _safe_check(ctx, func, error_key):
+    try:
+        return func(ctx)
+    except Exception as e:
+        if error_key is None:
+            return [("?", str(e))]
+        return [("?", tr(error_key, ctx.lang).format(str(e)))]
+
+
+def run_diagnostics(lang, on_result, checks=None, max_workers=MAX_WORKERS, context=None, backend=None):
+    """Выполняет проверки параллельно и передаёт строки результатов в on_result(status, message).
+
+    on_result вызывается из потока, вызвавшего run_diagnostics, по мере завершения проверок.
+    Таймаут проверки отсчитывается с момента, когда она начала выполняться (а не
+    с постановки в очередь пула). Проверка, не уложившаяся в него, даёт предупреждение
+    diag_check_timeout (её поток дорабатывает в фоне, результат отбрасывается).
+    """
+    ctx = context or DiagnosticsContext(lang, backend)
+    # Службы могли запустить или остановить вне приложения — диагностика читает их заново
+    invalidate_service_cache(ctx.backend)
+    checks = CHECKS if checks is None else checks
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    started = {}  # номер проверки -> момент начала выполнения
+
+    def run_check(index, func, error_key):
+        started[index] = time.monotonic()
+        return _safe_check(ctx, func, error_key)
+
+    try:
+        pending = {}
+        for index, (name, func, error_key, timeout) in enumerate(checks):
+            future = pool.submit(run_check, index, func, error_key)
+            pending[future] = (index, name, timeout)
+        while pending:
+            deadlines = [started[index] + timeout
+                         for index, _name, timeout in pending.values() if index in started]
+            wait_timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            if len(deadlines) < len(pending):
+                # Есть проверки в очереди: их старт не завершает ни одну future — замечаем опросом
+                wait_timeout = min(wait_timeout, START_POLL_INTERVAL) if deadlines else START_POLL_INTERVAL
+            done, _ = wait(list(pending), timeout=wait_timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.pop(future)
+                for status, message in future.result():
+                    on_result(status, message)
+            now = time.monotonic()
+            for future, (index, name, timeout) in list(pending.items()):
+                if index in started and now >= started[index] + timeout:
+                    pending.pop(future)
+                    on_result("?", tr('diag_check_timeout', lang).format(name, timeout))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
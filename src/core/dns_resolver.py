@@ -0,0 +1,323 @@
+"""
+Массовое разрешение доменов в IP-адреса для построения ipset из hostlist.
+
+Запросы A и AAAA отправляются по UDP через один сокет asyncio: ответы
+сопоставляются с запросами по ID, одновременно в полёте не больше
+concurrency запросов, на каждый — таймаут и повторы. Ответы кешируются
+на время их TTL (отрицательные — на NEGATIVE_TTL). Адреса всех доменов
+сливаются через IpSet в минимальное покрытие CIDR и пишутся в
+ipset-*.txt. Сервер задаётся параметром, поэтому модуль можно проверить
+против локального тестового DNS.
+
+Пустой ipset в zapret означает «все адреса» (режим IPSet 'any'), поэтому
+если не разрешился ни один домен, файл не записывается. Разрешение можно
+прервать threading.Event (cancel_event) из другого потока.
+"""
+import asyncio
+import ipaddress
+import os
+import random
+import struct
+import threading
+import time
+
+from .ipset_engine import IpSet, parse_cidr
+
+
+DEFAULT_SERVER = ('1.1.1.1', 53)
+DEFAULT_CONCURRENCY = 200
+DEFAULT_TIMEOUT = 2.0
+DEFAULT_RETRIES = 2
+NEGATIVE_TTL = 300
+MAX_TTL = 86400
+CANCEL_POLL_INTERVAL = 0.1
+
+TYPE_A = 1
+TYPE_CNAME = 5
+TYPE_AAAA = 28
+RCODE_NXDOMAIN = 3
+
+_HEADER = struct.Struct('!HHHHHH')
+_RR = struct.Struct('!HHIH')
+
+
+class DnsError(Exception):
+    """Ответ DNS не удалось разобрать."""
+
+
+class ResolveCancelled(Exception):
+    """Разрешение прервано через cancel_event."""
+
+
+def encode_name(domain):
+    """Доменное имя в формате DNS (метки с длиной), IDN — через punycode."""
+    out = bytearray()
+    for label in domain.strip().strip('.').split('.'):
+        raw = label.encode('idna') if not label.isascii() else label.encode('ascii')
+        if not raw or len(raw) > 63:
+            raise ValueError(f'Invalid domain: {domain}')
+        out.append(len(raw))
+        out += raw
+    out.append(0)
+    return bytes(out)
+
+
+def build_query(query_id, domain, qtype):
+    """Пакет запроса: один вопрос, рекурсия запрошена."""
+    return _HEADER.pack(query_id, 0x0100, 1, 0, 0, 0) + encode_name(domain) + struct.pack('!HH', qtype, 1)
+
+
+def _skip_name(data, pos):
+    while True:
+        if pos >= len(data):
+            raise DnsError('Truncated name')
+        length = data[pos]
+        if length & 0xC0 == 0xC0:
+            return pos + 2
+        if length == 0:
+            return pos + 1
+        pos += 1 + length
+
+
+def parse_response(data):
+    """Разбирает ответ. Возвращает (id, rcode, [(тип, ttl, адрес)]) — только записи A и AAAA.
+
+    Цепочки CNAME не разворачиваются отдельно: рекурсивный сервер кладёт
+    в ответ и CNAME, и конечные адреса.
+    """
+    if len(data) < _HEADER.size:
+        raise DnsError('Short packet')
+    query_id, flags, qdcount, ancount, _ns, _ar = _HEADER.unpack_from(data)
+    pos = _HEADER.size
+    for _ in range(qdcount):
+        pos = _skip_name(data, pos) + 4
+    records = []
+    for _ in range(ancount):
+        pos = _skip_name(data, pos)
+        if pos + _RR.size > len(data):
+            raise DnsError('Truncated record')
+        rtype, _rclass, ttl, rdlength = _RR.unpack_from(data, pos)
+        pos += _RR.size
+        rdata = data[pos:pos + rdlength]
+        pos += rdlength
+        if rtype == TYPE_A and rdlength == 4:
+            records.append((rtype, ttl, '.'.join(str(b) for b in rdata)))
+        elif rtype == TYPE_AAAA and rdlength == 16:
+            records.append((rtype, ttl, str(ipaddress.IPv6Address(rdata))))
+    return query_id, flags & 0x000F, records
+
+
+class DnsCache:
+    """Кеш ответов: (домен, тип) -> (момент истечения, адреса, ошибка)."""
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, domain, qtype):
+        with self._lock:
+            entry = self._entries.get((domain, qtype))
+            if entry is None:
+                return None
+            if entry[0] <= self._clock():
+                del self._entries[(domain, qtype)]
+                return None
+            return entry[1], entry[2]
+
+    def put(self, domain, qtype, addresses, error, ttl):
+        with self._lock:
+            self._entries[(domain, qtype)] = (self._clock() + max(0, min(ttl, MAX_TTL)), addresses, error)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_dns_cache():
+    """Общий для приложения кеш DNS-ответов."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DnsCache()
+    return _cache
+
+
+class _ResolverProtocol(asyncio.DatagramProtocol):
+    """Один UDP-сокет на все запросы; ответы раздаются ожидающим по ID."""
+
+    def __init__(self):
+        self.transport = None
+        self.pending = {}  # id -> Future
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if len(data) < 2:
+            return
+        future = self.pending.pop(struct.unpack_from('!H', data)[0], None)
+        if future is not None and not future.done():
+            future.set_result(data)
+
+    def error_received(self, exc):
+        pass
+
+    def connection_lost(self, exc):
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(exc or ConnectionError('DNS socket closed'))
+        self.pending.clear()
+
+
+class AsyncResolver:
+    """Асинхронный резолвер A/AAAA с ограниченным окном запросов в полёте."""
+
+    def __init__(self, server=DEFAULT_SERVER, concurrency=DEFAULT_CONCURRENCY,
+                 timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, cache=None):
+        self.server = server
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.cache = cache if cache is not None else get_dns_cache()
+        self._protocol = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        _transport, self._protocol = await loop.create_datagram_endpoint(
+            _ResolverProtocol, remote_addr=self.server)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self._protocol and self._protocol.transport:
+            self._protocol.transport.close()
+
+    def _new_id(self):
+        while True:
+            query_id = random.getrandbits(16)
+            if query_id not in self._protocol.pending:
+                return query_id
+
+    async def query(self, domain, qtype):
+        """(адреса, ошибка) для одного типа записи; ошибка — None, 'nxdomain', 'servfail' или 'timeout'."""
+        cached = self.cache.get(domain, qtype)
+        if cached is not None:
+            return cached
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            for _attempt in range(self.retries + 1):
+                query_id = self._new_id()
+                packet = build_query(query_id, domain, qtype)
+                future = loop.create_future()
+                self._protocol.pending[query_id] = future
+                self._protocol.transport.sendto(packet)
+                try:
+                    data = await asyncio.wait_for(future, self.timeout)
+                except asyncio.TimeoutError:
+                    self._protocol.pending.pop(query_id, None)
+                    continue
+                try:
+                    _id, rcode, records = parse_response(data)
+                except DnsError:
+                    continue
+                if rcode:
+                    error = 'nxdomain' if rcode == RCODE_NXDOMAIN else 'servfail'
+                    self.cache.put(domain, qtype, [], error, NEGATIVE_TTL)
+                    return [], error
+                addresses = [addr for rtype, _ttl, addr in records if rtype == qtype]
+                ttl = min((r[1] for r in records), default=NEGATIVE_TTL)
+                self.cache.put(domain, qtype, addresses, None, ttl)
+                return addresses, None
+        return [], 'timeout'
+
+    async def resolve(self, domain, ipv6=True):
+        """dict: domain, addresses, error (ошибка A-запроса, если адресов нет)."""
+        qtypes = (TYPE_A, TYPE_AAAA) if ipv6 else (TYPE_A,)
+        results = await asyncio.gather(*(self.query(domain, qtype) for qtype in qtypes))
+        addresses = [addr for found, _error in results for addr in found]
+        return {'domain': domain, 'addresses': addresses, 'error': None if addresses else results[0][1]}
+
+    async def resolve_many(self, domains, ipv6=True, on_progress=None, cancel_event=None):
+        """Разрешает домены пакетом; порядок результатов совпадает с порядком доменов.
+
+        Если установлен cancel_event, запросы в полёте отменяются и выбрасывается ResolveCancelled.
+        """
+        domains = list(domains)
+        done = 0
+
+        async def one(domain):
+            nonlocal done
+            try:
+                result = await self.resolve(domain, ipv6)
+            except ValueError:
+                result = {'domain': domain, 'addresses': [], 'error': 'invalid'}
+            done += 1
+            if on_progress:
+                on_progress(done, len(domains))
+            return result
+
+        batch = asyncio.gather(*(one(domain) for domain in domains))
+        if cancel_event is None:
+            return await batch
+
+        async def watch():
+            while not cancel_event.is_set():
+                await asyncio.sleep(CANCEL_POLL_INTERVAL)
+            batch.cancel()
+
+        watcher = asyncio.ensure_future(watch())
+        try:
+            return await batch
+        except asyncio.CancelledError:
+            if cancel_event.is_set():
+                raise ResolveCancelled() from None
+            raise
+        finally:
+            watcher.cancel()
+
+
+def resolve_domains(domains, server=DEFAULT_SERVER, ipv6=True, on_progress=None, cancel_event=None, **options):
+    """Синхронная обёртка над AsyncResolver.resolve_many (для фоновых потоков)."""
+    async def run():
+        async with AsyncResolver(server, **options) as resolver:
+            return await resolver.resolve_many(domains, ipv6, on_progress, cancel_event)
+    return asyncio.run(run())
+
+
+def read_hostlist(path):
+    """Домены из hostlist (без пустых строк, комментариев и повторов)."""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        lines = (line.strip().lower() for line in f)
+        return list(dict.fromkeys(line for line in lines if line and not line.startswith('#')))
+
+
+def build_ipset_from_domains(domains, target_path, server=DEFAULT_SERVER, ipv6=True, on_progress=None,
+                             cancel_event=None, **options):
+    """Разрешает домены и пишет минимальное CIDR-покрытие их адресов в target_path.
+
+    Возвращает dict: domains, resolved, failed, addresses (уникальных), cidrs, written.
+    Если адресов нет (сеть недоступна, все запросы без ответа), файл не пишется
+    и written = False: пустой ipset расширил бы правило на все адреса.
+    """
+    results = resolve_domains(domains, server, ipv6, on_progress, cancel_event, **options)
+    ranges = []
+    unique = set()
+    for result in results:
+        for address in result['addresses']:
+            parsed = parse_cidr(address)
+            if parsed is not None:
+                ranges.append(parsed)
+                unique.add(address)
+    cidrs = list(IpSet.from_ranges(ranges).to_cidrs())
+    if cidrs:
+        os.makedirs(os.path.dirname(os.path.abspath(target_path)), exist_ok=True)
+        tmp_path = target_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(''.join(cidr + '\n' for cidr in cidrs))
+        os.replace(tmp_path, target_path)
+    resolved = sum(1 for r in results if r['addresses'])
+    return {'domains': len(results), 'resolved': resolved, 'failed': len(results) - resolved,
+            'addresses': len(unique), 'cidrs': len(cidrs), 'written': bool(cidrs)}
@@ -0,0 +1,144 @@
+"""
+Индекс доменов hostlist на префиксном дереве по перевёрнутым меткам.
+
+winws сопоставляет hostlist с поддоменами: запись example.com покрывает и
+sub.example.com, поэтому такие записи избыточны. Домен хранится путём
+com -> example -> sub; узел, отмеченный как запись, покрывает всё своё
+поддерево. Вставка и запрос «покрыт ли домен» — O(число меток).
+"""
+
+
+def split_labels(domain):
+    """Метки домена в обратном порядке (com, example, sub) в нижнем регистре."""
+    return domain.strip().strip('.').lower().split('.')[::-1]
+
+
+class DomainIndex:
+    """Префиксное дерево доменов; узел — dict {метка: узел}, признак записи — ключ None."""
+
+    _TERMINAL = None
+
+    def __init__(self, domains=()):
+        self._root = {}
+        self._count = 0
+        self.add_many(domains)
+
+    def __len__(self):
+        return self._count
+
+    def add(self, domain):
+        """Добавляет домен; возвращает False, если он уже был записью."""
+        node = self._root
+        for label in split_labels(domain):
+            node = node.setdefault(label, {})
+        if self._TERMINAL in node:
+            return False
+        node[self._TERMINAL] = True
+        self._count += 1
+        return True
+
+    def add_many(self, domains):
+        """Пакетная вставка; возвращает число новых записей."""
+        added = 0
+        for domain in domains:
+            if domain and domain.strip() and self.add(domain):
+                added += 1
+        return added
+
+    def remove(self, domain):
+        """Удаляет запись домена (поддомены-записи остаются); True, если она была."""
+        path = []
+        node = self._root
+        for label in split_labels(domain):
+            child = node.get(label)
+            if child is None:
+                return False
+            path.append((node, label))
+            node = child
+        if self._TERMINAL not in node:
+            return False
+        del node[self._TERMINAL]
+        self._count -= 1
+        # Удаляем опустевшие узлы
+        for parent, label in reversed(path):
+            if parent[label]:
+                break
+            del parent[label]
+        return True
+
+    def __contains__(self, domain):
+        """Точное совпадение с записью."""
+        node = self._root
+        for label in split_labels(domain):
+            node = node.get(label)
+            if node is None:
+                return False
+        return self._TERMINAL in node
+
+    def covering_entry(self, domain, strict=False):
+        """Самая короткая запись, покрывающая домен (сам домен или его родитель), или None.
+
+        При strict=True учитываются только родительские записи.
+        """
+        labels = split_labels(domain)
+        node = self._root
+        last = len(labels) - 1
+        for i, label in enumerate(labels):
+            node = node.get(label)
+            if node is None:
+                return None
+            if self._TERMINAL in node and not (strict and i == last):
+                return '.'.join(reversed(labels[:i + 1]))
+        return None
+
+    def is_covered(self, domain, strict=False):
+        return self.covering_entry(domain, strict) is not None
+
+    def _walk(self, node, labels, prune):
+        if self._TERMINAL in node:
+            yield '.'.join(reversed(labels))
+            if prune:
+                return
+        for label in sorted(k for k in node if k is not None):
+            labels.append(label)
+            yield from self._walk(node[label], labels, prune)
+            labels.pop()
+
+    def domains(self, prune_redundant=False):
+        """Все записи (по перевёрнутым меткам); при prune_redundant — без покрытых родителем."""
+        return list(self._walk(self._root, [], prune_redundant))
+
+
+def optimize_hostlist_lines(lines):
+    """Удаляет дубликаты и поддомены, уже покрытые родительской записью.
+
+    Порядок оставшихся строк и комментарии сохраняются. Возвращает
+    (новые строки, статистика: before, after, duplicates, redundant).
+    """
+    entries = []
+    index = DomainIndex()
+    for line in lines:
+        stripped = line.strip()
+        if stripped and not stripped.startswith('#'):
+            entries.append(stripped)
+            index.add(stripped)
+    result = []
+    seen = set()
+    duplicates = redundant = 0
+    for line in lines:
+        stripped = line.strip()
+        if not stripped or stripped.startswith('#'):
+            result.append(line)
+            continue
+        key = '.'.join(reversed(split_labels(stripped)))
+        if key in seen:
+            duplicates += 1
+            continue
+        if index.is_covered(stripped, strict=True):
+            redundant += 1
+            continue
+        seen.add(key)
+        result.append(line)
+    stats = {'before': len(entries), 'after': len(entries) - duplicates - redundant,
+             'duplicates': duplicates, 'redundant': redundant}
+    return result, stats
@@ -0,0 +1,176 @@
+"""
+Потоковая нормализация списков доменов.
+
+Строки из OONI, аддонов, ручной вставки и hosts-файлов приводятся к
+единому виду: из URL убираются схема, путь, учётные данные и порт,
+домен переводится в нижний регистр и в punycode (IDNA), проверяется,
+после чего повторы и поддомены, уже покрытые родительским доменом,
+удаляются, а результат сортируется.
+
+Всё построено на генераторах: вход читается построчно, а сортировка —
+внешняя (отсортированные блоки по chunk_size строк во временных файлах
+сливаются heapq.merge), поэтому память не зависит от размера входа.
+Поддомены отбрасываются за один проход по списку, отсортированному по
+перевёрнутым меткам: в таком порядке родитель всегда идёт раньше своих
+поддоменов.
+"""
+import heapq
+import ipaddress
+import os
+import re
+import tempfile
+from itertools import islice
+
+
+DEFAULT_CHUNK_SIZE = 100000
+# Разделитель перевёрнутых меток в ключе сортировки: меньше любого допустимого символа домена,
+# чтобы example.com шёл сразу перед sub.example.com, а не после example-x.com
+_KEY_SEP = ' '
+
+_SCHEME_RE = re.compile(r'^[a-z][a-z0-9+.-]*://')
+_BARE_SCHEME_RE = re.compile(r'^(?:stuns?|turns?):')
+_LABEL_RE = re.compile(r'^[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?$')
+
+
+def _is_ip(text):
+    try:
+        ipaddress.ip_address(text)
+    except ValueError:
+        return False
+    return True
+
+
+def iter_candidates(lines):
+    """Кандидаты в домены из строк: комментарии отбрасываются, у строк hosts ("IP имя ...") берутся имена."""
+    for line in lines:
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        tokens = line.split()
+        if len(tokens) > 1 and _is_ip(tokens[0]):
+            tokens = tokens[1:]
+        yield from tokens
+
+
+def is_valid_domain(domain):
+    """Проверка уже нормализованного (ASCII, нижний регистр) домена: метки, длина, не IP."""
+    if not domain or len(domain) > 253:
+        return False
+    labels = domain.split('.')
+    if len(labels) < 2 or len(labels[-1]) < 2 or labels[-1].isdigit():
+        return False
+    return all(_LABEL_RE.match(label) for label in labels)
+
+
+def to_ascii(domain):
+    """Домен в нижнем регистре и punycode (IDNA) или None, если кодирование невозможно."""
+    domain = domain.strip().strip('.').lower()
+    if domain.isascii():
+        return domain
+    try:
+        return domain.encode('idna').decode('ascii')
+    except UnicodeError:
+        return None
+
+
+def normalize_domain(text):
+    """URL, host:port или домен -> нормализованный домен либо None, если это не домен."""
+    text = text.strip().lower()
+    text = _SCHEME_RE.sub('', text, count=1)
+    text = _BARE_SCHEME_RE.sub('', text, count=1).lstrip('/')
+    host = re.split(r'[/?#]', text, maxsplit=1)[0]
+    host = host.rsplit('@', 1)[-1]
+    if host.startswith('['):
+        return None  # IPv6 адрес в URL
+    name, sep, port = host.partition(':')
+    if sep and not port.isdigit():
+        return None
+    if name.startswith('*.'):
+        name = name[2:]
+    name = to_ascii(name)
+    return name if name and is_valid_domain(name) else None
+
+
+def _domain_key(domain):
+    return _KEY_SEP.join(reversed(domain.split('.')))
+
+
+def _key_domain(key):
+    return '.'.join(reversed(key.split(_KEY_SEP)))
+
+
+def external_sort(items, chunk_size=DEFAULT_CHUNK_SIZE, tmp_dir=None):
+    """Сортирует поток строк (без переводов строк) с памятью O(chunk_size)."""
+    items = iter(items)
+    first = sorted(islice(items, chunk_size))
+    if len(first) < chunk_size:
+        yield from first
+        return
+    files = []
+    try:
+        chunk = first
+        while chunk:
+            f = tempfile.TemporaryFile('w+', encoding='utf-8', dir=tmp_dir)
+            f.writelines(item + '\n' for item in chunk)
+            f.seek(0)
+            files.append(f)
+            chunk = sorted(islice(items, chunk_size))
+        yield from heapq.merge(*((line.rstrip('\n') for line in f) for f in files))
+    finally:
+        for f in files:
+            f.close()
+
+
+def normalize_domains(lines, chunk_size=DEFAULT_CHUNK_SIZE, order='alpha', stats=None, tmp_dir=None):
+    """Нормализует поток строк и выдаёт домены без повторов и покрытых поддоменов.
+
+    order: 'alpha' — по алфавиту, 'reversed' — по перевёрнутым меткам (группировка
+    по зонам, на один проход сортировки меньше). Если передан dict stats, в нём
+    накапливаются input, invalid, duplicates, redundant, output.
+    """
+    counts = {'input': 0, 'invalid': 0, 'duplicates': 0, 'redundant': 0, 'output': 0}
+    if stats is not None:
+        stats.update(counts)
+        counts = stats
+
+    def keys():
+        for candidate in iter_candidates(lines):
+            counts['input'] += 1
+            domain = normalize_domain(candidate)
+            if domain is None:
+                counts['invalid'] += 1
+                continue
+            yield _domain_key(domain)
+
+    def kept():
+        last = None
+        for key in external_sort(keys(), chunk_size, tmp_dir):
+            if key == last:
+                counts['duplicates'] += 1
+                continue
+            if last is not None and key.startswith(last + _KEY_SEP):
+                counts['redundant'] += 1
+                continue
+            last = key
+            yield key
+
+    if order == 'reversed':
+        result = (_key_domain(key) for key in kept())
+    else:
+        result = external_sort((_key_domain(key) for key in kept()), chunk_size, tmp_dir)
+    for domain in result:
+        counts['output'] += 1
+        yield domain
+
+
+def normalize_file(src_path, dst_path=None, **options):
+    """Нормализует файл списка (по умолчанию на месте, через временный файл). Возвращает статистику."""
+    dst_path = dst_path or src_path
+    stats = {}
+    tmp_path = dst_path + '.tmp'
+    with open(src_path, 'r', encoding='utf-8-sig', errors='replace') as src, \
+            open(tmp_path, 'w', encoding='utf-8') as dst:
+        for domain in normalize_domains(src, stats=stats, **options):
+            dst.write(domain + '\n')
+    os.replace(tmp_path, dst_path)
+    return stats
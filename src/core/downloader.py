@@ -0,0 +1,282 @@
+"""
+Загрузка файлов обновлений: докачка, параллельные сегменты и проверка SHA-256.
+
+- Недокачанные данные хранятся в <файл>.part (при сегментной загрузке —
+  в <файл>.part.N по сегменту) и при повторной попытке докачиваются
+  запросом с заголовком Range.
+- Если сервер объявляет Accept-Ranges и файл достаточно большой, он
+  скачивается несколькими соединениями параллельно.
+- Буфер чтения подстраивается под скорость канала (64 КБ … 1 МБ).
+- SHA-256 считается по ходу загрузки (для сегментов — при склейке) и
+  сверяется с digest из метаданных релиза GitHub.
+- progress_callback вызывается только из вызывающего потока и не чаще
+  progress_interval секунд, чтобы не заваливать UI событиями.
+"""
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_EXCEPTION, wait
+
+from .http_client import get_http_client
+
+
+MIN_BUFFER = 64 * 1024
+MAX_BUFFER = 1024 * 1024
+MIN_SEGMENT_SIZE = 4 * 1024 * 1024
+DEFAULT_SEGMENTS = 4
+PROGRESS_INTERVAL = 0.1
+TIMEOUT = 30
+
+
+class DownloadError(Exception):
+    """Ошибка загрузки (в т.ч. несовпадение контрольной суммы)."""
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def sha256_from_digest(digest):
+    """Извлекает hex SHA-256 из поля digest ассета GitHub ("sha256:<hex>"), иначе None."""
+    if not digest or not isinstance(digest, str):
+        return None
+    algo, _, value = digest.partition(':')
+    if algo.lower() != 'sha256' or len(value) != 64:
+        return None
+    return value.lower()
+
+
+class _Progress:
+    """Счётчик скачанных байт (общий для потоков) с редкими вызовами callback."""
+
+    def __init__(self, total, callback, interval):
+        self.total = total
+        self.done = 0
+        self._callback = callback
+        self._interval = interval
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, n):
+        with self._lock:
+            self.done += n
+
+    def report(self, force=False):
+        """Вызывает callback, если прошло interval секунд (или force). Только из вызывающего потока."""
+        if not self._callback or not self.total:
+            return
+        now = time.monotonic()
+        if not force and now - self._last < self._interval:
+            return
+        self._last = now
+        self._callback(min(self.done, self.total) * 100.0 / self.total)
+
+
+def _read_adaptive(response, write, progress, stop_event=None, on_chunk=None):
+    """Читает тело ответа блоками адаптивного размера и передаёт их в write."""
+    size = MIN_BUFFER
+    raw = response.raw
+    while True:
+        if stop_event is not None and stop_event.is_set():
+            raise _Cancelled()
+        started = time.monotonic()
+        chunk = raw.read(size, decode_content=True)
+        if not chunk:
+            break
+        write(chunk)
+        progress.add(len(chunk))
+        if on_chunk:
+            on_chunk()
+        took = time.monotonic() - started
+        # Быстрый канал — увеличиваем блок, медленный — уменьшаем (меньше задержка прогресса)
+        if len(chunk) == size and took < 0.05:
+            size = min(size * 2, MAX_BUFFER)
+        elif took > 0.5:
+            size = max(size // 2, MIN_BUFFER)
+
+
+def _probe(session, url):
+    """HEAD-запрос: (размер или 0, поддерживается ли Range, ETag, итоговый URL после редиректов)."""
+    try:
+        r = session.head(url, allow_redirects=True, timeout=TIMEOUT)
+        if r.status_code >= 400:
+            return 0, False, None, url
+        total = int(r.headers.get('Content-Length') or 0)
+        ranges = r.headers.get('Accept-Ranges', '').lower() == 'bytes'
+        return total, ranges, r.headers.get('ETag'), r.url or url
+    except Exception:
+        return 0, False, None, url
+
+
+def _remove_parts(dest_path):
+    for path in glob.glob(glob.escape(dest_path) + '.part*'):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _check_parts(dest_path, url, total, etag):
+    """Сверяет недокачанные части с описанием в <файл>.part.json.
+
+    Если части относятся к другому файлу (другой URL, размер или ETag) — удаляет их,
+    чтобы не склеить данные разных версий. Затем записывает актуальное описание.
+    """
+    meta_path = dest_path + '.part.json'
+    meta = {'url': url, 'total': total, 'etag': etag}
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            stale = json.load(f) != meta
+    except (OSError, ValueError):
+        stale = True
+    if stale:
+        _remove_parts(dest_path)
+        if not (total and etag):
+            return  # без размера и ETag докачку безопасно не проверить
+        os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+
+def _hash_file(path, hasher):
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(MAX_BUFFER)
+            if not block:
+                break
+            hasher.update(block)
+
+
+def _download_single(session, url, dest_path, total, ranges, progress):
+    """Один поток с докачкой из .part. Хэш считается по ходу загрузки."""
+    part_path = dest_path + '.part'
+    hasher = hashlib.sha256()
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if offset and not (ranges and total and offset < total):
+        offset = 0  # докачка невозможна — начинаем заново
+    headers = {'Range': f'bytes={offset}-'} if offset else {}
+    response = session.get(url, stream=True, timeout=TIMEOUT, headers=headers)
+    response.raise_for_status()
+    if offset and response.status_code != 206:
+        offset = 0  # сервер проигнорировал Range и отдаёт файл целиком
+    if offset:
+        _hash_file(part_path, hasher)
+    else:
+        total = total or int(response.headers.get('Content-Length') or 0)
+        progress.total = total
+    progress.add(offset)
+
+    def write(chunk):
+        f.write(chunk)
+        hasher.update(chunk)
+
+    with response, open(part_path, 'ab' if offset else 'wb') as f:
+        _read_adaptive(response, write, progress, on_chunk=progress.report)
+    os.replace(part_path, dest_path)
+    return hasher.hexdigest()
+
+
+def _download_segment(session, url, seg_path, start, end, progress, stop_event):
+    """Скачивает байты [start, end] в seg_path, докачивая уже имеющиеся."""
+    have = os.path.getsize(seg_path) if os.path.exists(seg_path) else 0
+    length = end - start + 1
+    if have > length:
+        have = 0
+    progress.add(have)
+    if have == length:
+        return
+    headers = {'Range': f'bytes={start + have}-{end}'}
+    response = session.get(url, stream=True, timeout=TIMEOUT, headers=headers)
+    response.raise_for_status()
+    if response.status_code != 206:
+        raise DownloadError('Сервер не поддерживает загрузку по частям')
+    with response, open(seg_path, 'ab' if have else 'wb') as f:
+        _read_adaptive(response, f.write, progress, stop_event=stop_event)
+    if os.path.getsize(seg_path) != length:
+        raise DownloadError('Сегмент загружен не полностью')
+
+
+def _download_parallel(session, url, dest_path, total, segments, progress):
+    """N параллельных сегментов; SHA-256 считается при склейке частей."""
+    step = -(-total // segments)
+    bounds = [(i * step, min(total, (i + 1) * step) - 1) for i in range(segments)]
+    seg_paths = [f'{dest_path}.part.{i}' for i in range(segments)]
+    stop_event = threading.Event()
+    with ThreadPoolExecutor(max_workers=segments) as pool:
+        futures = [
+            pool.submit(_download_segment, session, url, path, start, end, progress, stop_event)
+            for path, (start, end) in zip(seg_paths, bounds)
+        ]
+        try:
+            pending = futures
+            while pending:
+                _done, pending = wait(pending, timeout=PROGRESS_INTERVAL, return_when=FIRST_EXCEPTION)
+                progress.report()
+                for fut in _done:
+                    if fut.exception() is not None:
+                        raise fut.exception()
+        except BaseException:
+            stop_event.set()
+            raise
+
+    hasher = hashlib.sha256()
+    part_path = dest_path + '.part'
+    with open(part_path, 'wb') as out:
+        for path in seg_paths:
+            with open(path, 'rb') as f:
+                while True:
+                    block = f.read(MAX_BUFFER)
+                    if not block:
+                        break
+                    out.write(block)
+                    hasher.update(block)
+    os.replace(part_path, dest_path)
+    for path in seg_paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return hasher.hexdigest()
+
+
+def download_file(url, dest_path, progress_callback=None, expected_sha256=None,
+                  segments=DEFAULT_SEGMENTS, client=None, progress_interval=PROGRESS_INTERVAL):
+    """Скачивает url в dest_path и возвращает SHA-256 (hex).
+
+    progress_callback(percent) вызывается из этого же потока; исключение в нём
+    прерывает загрузку, а скачанные части остаются для докачки.
+    При несовпадении expected_sha256 файл удаляется и выбрасывается DownloadError.
+    """
+    session = (client or get_http_client()).session
+    total, ranges, etag, final_url = _probe(session, url)
+    _check_parts(dest_path, url, total, etag)
+    progress = _Progress(total, progress_callback, progress_interval)
+
+    # Уже начатая однопоточная загрузка продолжается одним потоком
+    resume_single = os.path.exists(dest_path + '.part')
+    use_segments = (
+        segments > 1 and ranges and total >= MIN_SEGMENT_SIZE * 2 and not resume_single
+    )
+    if use_segments:
+        segments = max(1, min(segments, total // MIN_SEGMENT_SIZE))
+        digest = _download_parallel(session, final_url, dest_path, total, segments, progress)
+    else:
+        digest = _download_single(session, final_url, dest_path, total, ranges, progress)
+    progress.report(force=True)
+    try:
+        os.remove(dest_path + '.part.json')
+    except OSError:
+        pass
+
+    if expected_sha256 and digest != expected_sha256.lower():
+        try:
+            os.remove(dest_path)
+        except OSError:
+            pass
+        raise DownloadError(
+            f'Контрольная сумма не совпадает: ожидалась {expected_sha256}, получена {digest}'
+        )
+    return digest
@@ -0,0 +1,198 @@
+"""
+Общий HTTP-клиент для обращений к GitHub и загрузок.
+
+Один пул соединений (requests.Session с keep-alive) на всё приложение,
+ограниченные повторы с нарастающей паузой и дисковый кэш ответов API:
+повторный запрос отправляется с If-None-Match / If-Modified-Since, и
+неизменившиеся метаданные релиза стоят один ответ 304 без тела.
+
+Каталог кэша, сессия и адрес API задаются в конструкторе, поэтому клиент
+можно направить на локальный HTTP-сервер-заглушку.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from .path_utils import get_config_path
+
+
+DEFAULT_TIMEOUT = 15
+CACHE_DIRNAME = 'http_cache'
+GITHUB_API_BASE = 'https://api.github.com'
+USER_AGENT = 'ZapretDesktop'
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HttpClient:
+    """HTTP-клиент с пулом соединений, повторами и кэшем ETag/Last-Modified."""
+
+    def __init__(self, cache_dir=None, session=None, retries=3, backoff_factor=0.5,
+                 pool_size=8, api_base=GITHUB_API_BASE):
+        self.cache_dir = cache_dir or get_config_path(CACHE_DIRNAME)
+        self.api_base = api_base.rstrip('/')
+        self._session = session
+        self._retries = retries
+        self._backoff_factor = backoff_factor
+        self._pool_size = pool_size
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """requests.Session; создаётся при первом обращении (requests импортируется лениво)."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry_kwargs = dict(
+            total=self._retries,
+            connect=self._retries,
+            read=self._retries,
+            status=self._retries,
+            backoff_factor=self._backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        try:
+            retry = Retry(allowed_methods=frozenset(['GET', 'HEAD']), **retry_kwargs)
+        except TypeError:
+            # urllib3 < 1.26
+            retry = Retry(method_whitelist=frozenset(['GET', 'HEAD']), **retry_kwargs)
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=self._pool_size,
+                              pool_maxsize=self._pool_size)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers['User-Agent'] = USER_AGENT
+        return session
+
+    # --- Дисковый кэш ---
+
+    def _cache_path(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def _load_cached(self, url):
+        try:
+            with open(self._cache_path(url), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or entry.get('url') != url or 'body' not in entry:
+            return None
+        return entry
+
+    def _store_cached(self, url, response):
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return  # без валидаторов условный запрос невозможен — кэшировать незачем
+        entry = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'stored_at': time.time(),
+            'body': response.text,
+        }
+        path = self._cache_path(url)
+        tmp_path = path + '.tmp'
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    # --- Запросы ---
+
+    def get(self, url, timeout=DEFAULT_TIMEOUT, **kwargs):
+        """Обычный GET через общую сессию (для загрузок: stream=True, заголовок Range и т.п.)."""
+        return self.session.get(url, timeout=timeout, **kwargs)
+
+    def get_json(self, url, timeout=DEFAULT_TIMEOUT, use_cache=True):
+        """GET с разбором JSON и условным запросом по закэшированным ETag/Last-Modified.
+
+        При 304 возвращает закэшированные данные. Ошибки HTTP (в т.ч. 404)
+        пробрасываются как requests.HTTPError.
+        """
+        headers = {'Accept': 'application/vnd.github+json'}
+        cached = self._load_cached(url) if use_cache else None
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+        response = self.session.get(url, timeout=timeout, headers=headers)
+        if response.status_code == 304 and cached:
+            return json.loads(cached['body'])
+        response.raise_for_status()
+        data = response.json()
+        if use_cache:
+            self._store_cached(url, response)
+        return data
+
+    # --- GitHub ---
+
+    def get_latest_release(self, repo_slug, timeout=DEFAULT_TIMEOUT):
+        """Метаданные последнего релиза owner/repo или None, если релизов нет (404)."""
+        import requests
+        url = f"{self.api_base}/repos/{repo_slug}/releases/latest"
+        try:
+            return self.get_json(url, timeout=timeout)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            raise
+
+    def get_release_zip_url(self, repo_slug, timeout=DEFAULT_TIMEOUT):
+        """URL zip-архива для установки из owner/repo.
+
+        Берётся первый .zip из последнего релиза; если релизов или zip-ассетов нет —
+        архив ветки по умолчанию.
+        """
+        release = self.get_latest_release(repo_slug, timeout=timeout)
+        asset = find_release_asset(release, '.zip') if release else None
+        if asset:
+            return asset.get('browser_download_url')
+        repo_data = self.get_json(f"{self.api_base}/repos/{repo_slug}", timeout=timeout)
+        default_branch = (repo_data.get('default_branch') or 'main').strip() or 'main'
+        return f"https://github.com/{repo_slug}/archive/refs/heads/{default_branch}.zip"
+
+
+def find_release_asset(release_data, suffix, name_contains=None):
+    """Первый ассет релиза с именем на suffix (и, если задано, содержащим name_contains)."""
+    for asset in (release_data or {}).get('assets', []):
+        name = asset.get('name', '')
+        if not name.lower().endswith(suffix.lower()):
+            continue
+        if name_contains and name_contains.lower() not in name.lower():
+            continue
+        return asset
+    return None
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """Общий экземпляр HttpClient на всё приложение."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HttpClient()
+    return _client
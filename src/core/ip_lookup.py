@@ -0,0 +1,216 @@
+"""
+Поиск IP-адресов в ipset-списках: в каком списке, какой записью (CIDR)
+и на какой строке покрыт адрес.
+
+Для каждого списка строится индекс: записи, отсортированные по началу
+диапазона, и массив «префиксного максимума» концов. Запрос — один
+bisect: среди записей с началом <= адреса берётся та, что простирается
+дальше всех; если её конец >= адреса, она покрывает адрес. IPv4 индекс
+берётся прямо из mmap-снимка list_cache (без копирования), IPv6
+индексируется отдельно (128-битные целые) из записей того же снимка;
+индексы перестраиваются, только когда у файла меняются mtime или размер.
+"""
+import os
+import re
+from array import array
+from bisect import bisect_right
+
+from .ipset_engine import IPV4_BITS, IPV6_BITS, parse_cidr, parse_ipv6_cidr, bounds_store
+from .list_cache import get_list_snapshot
+
+
+DEFAULT_LISTS = ('ipset-exclude.txt', 'ipset-all.txt')
+IPV4_IN_TEXT = re.compile(r'(?<![\d.])(?:\d{1,3}\.){3}\d{1,3}(?![\d.])')
+# Кандидаты в IPv6: последовательности шестнадцатеричных групп с двоеточиями (проверяются разбором)
+IPV6_IN_TEXT = re.compile(r'(?<![\w:.])(?:[0-9A-Fa-f]{0,4}:){2,7}(?:[0-9A-Fa-f]{1,4}|(?:\d{1,3}\.){3}\d{1,3})?(?![\w:])')
+
+
+def extract_ips(text):
+    """IPv4 и IPv6 адреса из произвольного текста (например, вставленного лога) без повторов, в порядке появления."""
+    found = []
+    for match in re.finditer(f'{IPV4_IN_TEXT.pattern}|{IPV6_IN_TEXT.pattern}', text):
+        candidate = match.group(0)
+        if ':' in candidate and parse_ipv6_cidr(candidate) is None:
+            continue
+        found.append(candidate)
+    return list(dict.fromkeys(found))
+
+
+class _SnapshotTexts:
+    """Тексты IPv4 записей снимка в порядке отсортированных диапазонов (читаются по запросу)."""
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+
+    def __len__(self):
+        return len(self._snapshot.entry_indexes)
+
+    def __getitem__(self, i):
+        return self._snapshot.entry(self._snapshot.entry_indexes[i])
+
+
+class ListIndex:
+    """Индекс одного ipset-файла для поиска покрывающей записи."""
+
+    def __init__(self, entries, bits=IPV4_BITS):
+        # entries: (начало, конец, номер строки, текст записи)
+        entries.sort()
+        self.starts = bounds_store(bits, (e[0] for e in entries))
+        self.ends = bounds_store(bits, (e[1] for e in entries))
+        self.lines = array('L', (e[2] for e in entries))
+        self.texts = [e[3] for e in entries]
+        # best[i] — индекс записи с наибольшим концом среди 0..i
+        self.best = array('L')
+        best = 0
+        for i, end in enumerate(self.ends):
+            if end > self.ends[best]:
+                best = i
+            self.best.append(best)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """{бит семейства: ListIndex}: IPv4 — массивы снимка list_cache как есть, IPv6 — из его записей."""
+        ipv4 = cls.__new__(cls)
+        ipv4.starts, ipv4.ends, ipv4.lines, ipv4.best = snapshot.starts, snapshot.ends, snapshot.lines, snapshot.best
+        ipv4.texts = _SnapshotTexts(snapshot)
+        entries = []
+        for i, text in enumerate(snapshot.entries()):
+            if ':' in text:
+                parsed = parse_ipv6_cidr(text)
+                if parsed is not None:
+                    entries.append((parsed[0], parsed[1], snapshot.entry_lines[i], text))
+        return {IPV4_BITS: ipv4, IPV6_BITS: cls(entries, IPV6_BITS)}
+
+    def __len__(self):
+        return len(self._snapshot.entry_indexes)
+
+    def __getitem__(self, i):
+        return self._snapshot.entry(self._snapshot.entry_indexes[i])
+
+
+class ListIndex:
+    """Индекс одного ipset-файла для поиска покрывающей записи."""
+
+    def __init__(self, entries, bits=IPV4_BITS):
+        # entries: (начало, конец, номер строки, текст записи)
+        entries.sort()
+        self.starts = bounds_store(bits, (e[0] for e in entries))
+        self.ends = bounds_store(bits, (e[1] for e in entries))
+        self.lines = array('L', (e[2] for e in entries))
+        self.texts = [e[3] for e in entries]
+        # best[i] — индекс записи с наибольшим концом среди 0..i
+        self.best = array('L')
+        best = 0
+        for i, end in enumerate(self.ends):
+            if end > self.ends[best]:
+                best = i
+            self.best.append(best)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """{бит семейства: ListIndex}: IPv4 — массивы снимка list_cache как есть, IPv6 — из его записей."""
+        ipv4 = cls.__new__(cls)
+        ipv4.starts, ipv4.ends, ipv4.lines, ipv4.best = snapshot.starts, snapshot.ends, snapshot.lines, snapshot.best
+        ipv4.texts = _SnapshotTexts(snapshot)
+        entries = []
+        for i, text in enumerate(snapshot.entries()):
+            if ':' in text:
+                parsed = parse_ipv6_cidr(text)
+                if parsed is not None:
+                    entries.append((parsed[0], parsed[1], snapshot.entry_lines[i], text))
+        return {IPV4_BITS: ipv4, IPV6_BITS: cls(entries, IPV6_BITS)}
+
+    @classmethod
+    def from_file(cls, path):
+        """{бит семейства: ListIndex} для IPv4 и IPv6 записей файла."""
+        entries = {IPV4_BITS: [], IPV6_BITS: []}
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line_no, raw in enumerate(f, 1):
+                line = raw.strip()
+                if not line or line.startswith('#'):
+                    continue
+                parsed = parse_cidr(line)
+                if parsed is not None:
+                    entries[parsed[0]].append((parsed[1], parsed[2], line_no, line))
+        return {bits: cls(family_entries, bits) for bits, family_entries in entries.items()}
+
+    def __len__(self):
+        return len(self.starts)
+
+    def lookup(self, value):
+        """(номер строки, запись) покрывающей value записи или None."""
+        i = bisect_right(self.starts, value) - 1
+        if i < 0:
+            return None
+        j = self.best[i]
+        if self.ends[j] < value:
+            return None
+        return self.lines[j], self.texts[j]
+
+    def covering(self, start, end):
+        """(номер строки, запись) той записи, что целиком покрывает [start, end], или None."""
+        i = bisect_right(self.starts, start) - 1
+        if i < 0:
+            return None
+        j = self.best[i]
+        if self.ends[j] < end:
+            return None
+        return self.lines[j], self.texts[j]
+
+
+class IpLookup:
+    """Поиск адресов по нескольким ipset-спискам папки lists."""
+
+    def __init__(self, lists_folder, list_names=DEFAULT_LISTS):
+        self.lists_folder = lists_folder
+        self.list_names = tuple(list_names)
+        self._indexes = {}  # имя -> (снимок list_cache, {бит семейства: ListIndex})
+
+    def _index(self, list_name):
+        snapshot = get_list_snapshot(os.path.join(self.lists_folder, list_name))
+        if snapshot is None:
+            self._indexes.pop(list_name, None)
+            return None
+        cached = self._indexes.get(list_name)
+        if cached and cached[0] is snapshot:
+            return cached[1]
+        index = ListIndex.from_snapshot(snapshot)
+        self._indexes[list_name] = (snapshot, index)
+        return index
+
+    def lookup(self, ip):
+        """Ищет один адрес. Возвращает dict: ip, valid, matches — [{list, cidr, line}]."""
+        return self.lookup_many([ip])[0]
+
+    def lookup_many(self, ips):
+        """Ищет адреса пакетом (индексы проверяются один раз на весь пакет)."""
+        indexes = [(name, self._index(name)) for name in self.list_names]
+        indexes = [(name, index) for name, index in indexes if index is not None]
+        results = []
+        for ip in ips:
+            ip = ip.strip()
+            parsed = parse_cidr(ip) if '/' not in ip else None
+            if parsed is None:
+                results.append({'ip': ip, 'valid': False, 'matches': []})
+                continue
+            bits, value = parsed[0], parsed[1]
+            matches = []
+            for name, index in indexes:
+                family_index = index[bits]
+                found = family_index.lookup(value) if len(family_index) else None
+                if found:
+                    matches.append({'list': name, 'cidr': found[1], 'line': found[0]})
+            results.append({'ip': ip, 'valid': True, 'matches': matches})
+        return results
+
+
+def verdict(result):
+    """'invalid', 'excluded' (есть в ipset-exclude), 'included' (есть в другом списке) или 'none'."""
+    if not result['valid']:
+        return 'invalid'
+    names = [m['list'] for m in result['matches']]
+    if any('exclude' in name for name in names):
+        return 'excluded'
+    if names:
+        return 'included'
+    return 'none'
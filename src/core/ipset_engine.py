@@ -0,0 +1,292 @@
+"""
+Интервальное представление ipset-списков.
+
+Каждая запись CIDR превращается в замкнутый диапазон целых [начало, конец].
+IntervalSet хранит отсортированные непересекающиеся диапазоны одного
+семейства адресов: IPv4 — в массивах array('Q'), IPv6 — в списках
+128-битных целых Python. IpSet объединяет оба семейства. Слияние
+пересекающихся и соседних диапазонов — O(n log n); из набора
+восстанавливается минимальное покрытие CIDR-блоками, поэтому большие
+списки можно сжать до того, как их загрузит winws.
+"""
+import ipaddress
+import re
+from array import array
+from bisect import bisect_right
+
+
+IPV4_BITS = 32
+IPV6_BITS = 128
+
+# Строгий IPv4 CIDR: быстрая проверка большинства строк без разбора
+_OCTET = r'(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)'
+_IPV4_CIDR_RE = re.compile(rf'{_OCTET}(?:\.{_OCTET}){{3}}(?:/(?:3[0-2]|[12]?\d))?')
+
+
+def parse_ipv4_cidr(text):
+    """Разбирает "a.b.c.d" или "a.b.c.d/n" в диапазон (начало, конец); None, если запись некорректна.
+
+    Биты хоста обнуляются, как у ip_network(strict=False): 10.1.2.3/8 -> 10.0.0.0/8.
+    """
+    addr, sep, prefix_text = text.partition('/')
+    parts = addr.split('.')
+    if len(parts) != 4:
+        return None
+    value = 0
+    for part in parts:
+        # Ведущие нули запрещены, как в ipaddress: 010 нельзя спутать с восьмеричной записью
+        if not (part.isascii() and part.isdigit()) or len(part) > 3 or (len(part) > 1 and part[0] == '0'):
+            return None
+        octet = int(part)
+        if octet > 255:
+            return None
+        value = (value << 8) | octet
+    if sep:
+        if (not (prefix_text.isascii() and prefix_text.isdigit()) or len(prefix_text) > 2
+                or (len(prefix_text) > 1 and prefix_text[0] == '0')):
+            return None
+        prefix = int(prefix_text)
+        if prefix > IPV4_BITS:
+            return None
+    else:
+        prefix = IPV4_BITS
+    host_mask = (1 << (IPV4_BITS - prefix)) - 1
+    start = value & ~host_mask
+    return start, start | host_mask
+
+
+def parse_ipv6_cidr(text):
+    """Разбирает IPv6 адрес или префикс в диапазон (начало, конец); None, если запись некорректна."""
+    if ':' not in text:
+        return None
+    try:
+        net = ipaddress.IPv6Network(text, strict=False)
+    except ValueError:
+        return None
+    return int(net.network_address), int(net.broadcast_address)
+
+
+def parse_cidr(text):
+    """(число бит семейства, начало, конец) для IPv4/IPv6 записи или None."""
+    if ':' in text:
+        parsed = parse_ipv6_cidr(text)
+        return (IPV6_BITS,) + parsed if parsed else None
+    parsed = parse_ipv4_cidr(text)
+    return (IPV4_BITS,) + parsed if parsed else None
+
+
+def is_valid_cidr(text):
+    """True для корректного IPv4/IPv6 адреса или префикса."""
+    return bool(_IPV4_CIDR_RE.fullmatch(text)) or parse_cidr(text) is not None
+
+
+def format_ipv4(value):
+    return f'{value >> 24 & 255}.{value >> 16 & 255}.{value >> 8 & 255}.{value & 255}'
+
+
+def format_address(value, bits=IPV4_BITS):
+    if bits == IPV4_BITS:
+        return format_ipv4(value)
+    return str(ipaddress.IPv6Address(value))
+
+
+def bounds_store(bits, values=()):
+    """Хранилище границ: array('Q') для IPv4, список int для 128-битных IPv6."""
+    return array('Q', values) if bits <= 64 else list(values)
+
+
+def range_to_cidrs(start, end, bits=IPV4_BITS):
+    """Минимальный набор блоков (начало, длина префикса), точно покрывающий [start, end]."""
+    while start <= end:
+        # Наибольший блок, выровненный по start и не выходящий за end
+        align = (start & -start).bit_length() - 1 if start else bits
+        fit = (end - start + 1).bit_length() - 1
+        size = min(align, fit)
+        yield start, bits - size
+        start += 1 << size
+
+
+class IntervalSet:
+    """Отсортированные непересекающиеся замкнутые диапазоны целых чисел."""
+
+    def __init__(self, bits=IPV4_BITS):
+        self.bits = bits
+        self.starts = bounds_store(bits)
+        self.ends = bounds_store(bits)
+
+    @classmethod
+    def from_ranges(cls, ranges, bits=IPV4_BITS):
+        result = cls(bits)
+        result._assign(sorted(ranges))
+        return result
+
+    def _assign(self, sorted_ranges):
+        """Сливает отсортированные по началу диапазоны (пересекающиеся и соседние) и сохраняет их."""
+        starts = bounds_store(self.bits)
+        ends = bounds_store(self.bits)
+        for start, end in sorted_ranges:
+            if ends and start <= ends[-1] + 1:
+                if end > ends[-1]:
+                    ends[-1] = end
+            else:
+                starts.append(start)
+                ends.append(end)
+        self.starts = starts
+        self.ends = ends
+
+    def ranges(self):
+        return zip(self.starts, self.ends)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return iter(self.ranges())
+
+    def address_count(self):
+        return sum(e - s + 1 for s, e in self.ranges())
+
+    def add_ranges(self, ranges):
+        """Добавляет диапазоны пакетом: одна сортировка и один проход слияния."""
+        new = sorted(ranges)
+        if not new:
+            return
+        merged = sorted(list(self.ranges()) + new) if self.starts else new
+        self._assign(merged)
+
+    def remove_ranges(self, ranges):
+        """Вычитает диапазоны пакетом (проход по двум отсортированным последовательностям)."""
+        cut = IntervalSet.from_ranges(ranges, self.bits)
+        if not cut or not self:
+            return
+        starts = bounds_store(self.bits)
+        ends = bounds_store(self.bits)
+        cut_starts, cut_ends = cut.starts, cut.ends
+        j = 0
+        for start, end in self.ranges():
+            while j < len(cut_starts) and cut_ends[j] < start:
+                j += 1
+            k = j
+            while start <= end:
+                if k >= len(cut_starts) or cut_starts[k] > end:
+                    starts.append(start)
+                    ends.append(end)
+                    break
+                if cut_starts[k] > start:
+                    starts.append(start)
+                    ends.append(cut_starts[k] - 1)
+                start = max(start, cut_ends[k] + 1)
+                k += 1
+        self.starts = starts
+        self.ends = ends
+
+    def find(self, value):
+        """Индекс диапазона, содержащего value, или -1 (двоичный поиск)."""
+        i = bisect_right(self.starts, value) - 1
+        if i >= 0 and self.ends[i] >= value:
+            return i
+        return -1
+
+    def __contains__(self, value):
+        return self.find(value) >= 0
+
+    def covers(self, start, end):
+        """True, если диапазон [start, end] целиком входит в набор."""
+        i = self.find(start)
+        return i >= 0 and self.ends[i] >= end
+
+    def to_cidrs(self):
+        """Минимальное покрытие набора CIDR-блоками: пары (начало, длина префикса)."""
+        for start, end in self.ranges():
+            yield from range_to_cidrs(start, end, self.bits)
+
+
+class IpSet:
+    """Набор IPv4 и IPv6 диапазонов (по IntervalSet на семейство)."""
+
+    def __init__(self):
+        self.families = {IPV4_BITS: IntervalSet(IPV4_BITS), IPV6_BITS: IntervalSet(IPV6_BITS)}
+
+    @staticmethod
+    def _split(ranges):
+        split = {IPV4_BITS: [], IPV6_BITS: []}
+        for bits, start, end in ranges:
+            split[bits].append((start, end))
+        return split
+
+    @classmethod
+    def from_ranges(cls, ranges):
+        """ranges — тройки (бит семейства, начало, конец), как из parse_cidr."""
+        result = cls()
+        result.add_ranges(ranges)
+        return result
+
+    def add_ranges(self, ranges):
+        for bits, family_ranges in self._split(ranges).items():
+            self.families[bits].add_ranges(family_ranges)
+
+    def remove_ranges(self, ranges):
+        for bits, family_ranges in self._split(ranges).items():
+            self.families[bits].remove_ranges(family_ranges)
+
+    def __len__(self):
+        return sum(len(s) for s in self.families.values())
+
+    def __contains__(self, address):
+        parsed = parse_cidr(address)
+        return parsed is not None and self.families[parsed[0]].covers(parsed[1], parsed[2])
+
+    def to_cidrs(self):
+        """Строки минимального CIDR-покрытия: сначала IPv4, затем IPv6."""
+        for bits, interval_set in self.families.items():
+            for start, prefix in interval_set.to_cidrs():
+                yield f'{format_address(start, bits)}/{prefix}'
+
+
+def parse_ipset_lines(lines):
+    """Разбирает строки ipset.
+
+    Возвращает dict: ranges — список диапазонов, entries — число записей с данными,
+    comments — строки комментариев, invalid — пары (номер строки, текст).
+    """
+    ranges = []  # (бит семейства, начало, конец)
+    comments = []
+    invalid = []
+    entries = 0
+    for line_no, raw in enumerate(lines, 1):
+        line = raw.strip()
+        if not line:
+            continue
+        if line.startswith('#'):
+            comments.append(line)
+            continue
+        entries += 1
+        parsed = parse_cidr(line)
+        if parsed is None:
+            invalid.append((line_no, line))
+        else:
+            ranges.append(parsed)
+    return {'ranges': ranges, 'entries': entries, 'comments': comments, 'invalid': invalid}
+
+
+def format_cidrs(interval_set):
+    """Строки CIDR минимального покрытия набора (IntervalSet или IpSet)."""
+    if isinstance(interval_set, IpSet):
+        return list(interval_set.to_cidrs())
+    bits = interval_set.bits
+    return [f'{format_address(start, bits)}/{prefix}' for start, prefix in interval_set.to_cidrs()]
+
+
+def optimize_ipset_text(text):
+    """Сжимает текст ipset до минимального покрытия CIDR.
+
+    Комментарии сохраняются в начале, некорректные строки — в конце (без изменений).
+    Возвращает (новый текст, статистика: before, after, invalid).
+    """
+    parsed = parse_ipset_lines(text.splitlines())
+    cidrs = list(IpSet.from_ranges(parsed['ranges']).to_cidrs())
+    out_lines = parsed['comments'] + cidrs + [line for _no, line in parsed['invalid']]
+    new_text = '\n'.join(out_lines) + '\n' if out_lines else ''
+    stats = {'before': parsed['entries'], 'after': len(cidrs) + len(parsed['invalid']),
+             'invalid': len(parsed['invalid'])}
+    return new_text, stats
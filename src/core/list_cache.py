@@ -0,0 +1,196 @@
+"""
+Кеш разобранных списков (list-*.txt, ipset-*.txt) в бинарных снимках.
+
+Для каждого списка один раз строится снимок в папке конфигурации
+(AppData\\ZapretDesktop\\list_cache): таблица смещений, номера строк и
+блок записей (строки без пустых и комментариев, в порядке файла), а для ipset —
+ещё и отсортированные массивы IPv4 диапазонов (начала, концы,
+префиксный максимум концов, номера строк, индексы записей). Снимок
+открывается через mmap, массивы читаются как memoryview без копирования,
+поэтому большой список открывается мгновенно, а один и тот же снимок
+разделяют менеджер списков и поиск IP.
+
+В заголовке снимка записаны размер и mtime исходного файла; если они не
+совпадают, снимок строится заново. Имя файла снимка включает сигнатуру
+исходника: пересборка никогда не перезаписывает снимок, который ещё
+отображён в память (на Windows это невозможно), старые удаляются позже.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from array import array
+
+from .ipset_engine import IPV4_BITS, parse_cidr
+from .path_utils import get_config_path
+
+
+CACHE_DIRNAME = 'list_cache'
+MAGIC = b'ZDLCACHE'
+VERSION = 1
+# magic, версия, размер исходника, mtime_ns исходника, число записей, число IPv4 диапазонов
+_HEADER = struct.Struct('<8sIQQQQ')
+_ITEM = 8  # все массивы — 64-битные беззнаковые ('Q')
+
+_lock = threading.Lock()
+_snapshots = {}  # абсолютный путь исходника -> ListSnapshot
+
+
+def _align(offset):
+    return (offset + _ITEM - 1) // _ITEM * _ITEM
+
+
+def _signature(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def build_snapshot_bytes(path, signature=None):
+    """Разбирает список и возвращает содержимое снимка (bytes)."""
+    size, mtime_ns = signature or _signature(path)
+    is_ipset = os.path.basename(path).lower().startswith('ipset')
+    offsets = array('Q', [0])
+    entry_lines = array('Q')
+    blob = bytearray()
+    ranges = []  # (начало, конец, номер строки, индекс записи)
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line_no, raw in enumerate(f, 1):
+            line = raw.strip()
+            if not line or line.startswith('#'):
+                continue
+            if is_ipset:
+                parsed = parse_cidr(line)
+                if parsed is not None and parsed[0] == IPV4_BITS:
+                    ranges.append((parsed[1], parsed[2], line_no, len(offsets) - 1))
+            blob += line.encode('utf-8')
+            offsets.append(len(blob))
+            entry_lines.append(line_no)
+    ranges.sort()
+    best = array('Q')
+    best_index = 0
+    for i, (_start, end, _line, _entry) in enumerate(ranges):
+        if end > ranges[best_index][1]:
+            best_index = i
+        best.append(best_index)
+
+    out = bytearray(_HEADER.pack(MAGIC, VERSION, size, mtime_ns, len(offsets) - 1, len(ranges)))
+    out += offsets.tobytes()
+    out += entry_lines.tobytes()
+    out += blob
+    out += b'\0' * (_align(len(out)) - len(out))
+    for column in range(4):
+        out += array('Q', (r[column] for r in ranges)).tobytes()
+    out += best.tobytes()
+    return bytes(out)
+
+
+class ListSnapshot:
+    """Снимок разобранного списка поверх mmap (или bytes, если кеш недоступен)."""
+
+    def __init__(self, buffer, source_signature):
+        self._buffer = buffer
+        view = memoryview(buffer)
+        magic, version, size, mtime_ns, count, ranges = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Unsupported list cache format')
+        self.signature = (size, mtime_ns)
+        self.is_current = self.signature == source_signature
+        pos = _HEADER.size
+        self._offsets = view[pos:pos + (count + 1) * _ITEM].cast('Q')
+        pos += (count + 1) * _ITEM
+        self.entry_lines = view[pos:pos + count * _ITEM].cast('Q')
+        pos += count * _ITEM
+        self._blob_start = pos
+        pos = _align(pos + self._offsets[count])
+        columns = []
+        for _ in range(5):
+            columns.append(view[pos:pos + ranges * _ITEM].cast('Q'))
+            pos += ranges * _ITEM
+        # IPv4 диапазоны, отсортированные по началу: как в ip_lookup.ListIndex
+        self.starts, self.ends, self.lines, self.entry_indexes, self.best = columns
+        self._view = view
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def entry(self, index):
+        start = self._blob_start + self._offsets[index]
+        end = self._blob_start + self._offsets[index + 1]
+        return bytes(self._view[start:end]).decode('utf-8')
+
+    def entries(self):
+        """Записи списка в порядке файла."""
+        blob = bytes(self._view[self._blob_start:self._blob_start + self._offsets[len(self)]])
+        offsets = self._offsets
+        return [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(self))]
+
+
+def _cache_file(path, signature):
+    key = hashlib.sha1(os.path.normcase(path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(get_config_path(CACHE_DIRNAME), f'{key}-{signature[0]}-{signature[1]}.bin'), key
+
+
+def _remove_stale(key, keep):
+    folder = get_config_path(CACHE_DIRNAME)
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return
+    for name in names:
+        if name.startswith(key + '-') and os.path.join(folder, name) != keep:
+            try:
+                os.remove(os.path.join(folder, name))
+            except OSError:
+                pass  # снимок ещё отображён в память — удалим при следующей пересборке
+
+
+def _open_mapped(cache_path, signature):
+    with open(cache_path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    snapshot = ListSnapshot(mapped, signature)
+    if not snapshot.is_current:
+        raise ValueError('Stale list cache')
+    return snapshot
+
+
+def _load(path, signature):
+    cache_path, key = _cache_file(path, signature)
+    try:
+        return _open_mapped(cache_path, signature)
+    except (OSError, ValueError, struct.error):
+        pass
+    data = build_snapshot_bytes(path, signature)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, cache_path)
+        _remove_stale(key, cache_path)
+        return _open_mapped(cache_path, signature)
+    except (OSError, ValueError):
+        # Папка кеша недоступна — работаем со снимком в памяти
+        return ListSnapshot(data, signature)
+
+
+def get_list_snapshot(path):
+    """Актуальный снимок списка path или None, если файла нет.
+
+    Снимки общие для всего процесса: повторный вызов для неизменённого файла
+    стоит одного os.stat.
+    """
+    path = os.path.abspath(path)
+    try:
+        signature = _signature(path)
+    except OSError:
+        with _lock:
+            _snapshots.pop(path, None)
+        return None
+    with _lock:
+        snapshot = _snapshots.get(path)
+        if snapshot is not None and snapshot.signature == signature:
+            return snapshot
+        snapshot = _load(path, signature)
+        _snapshots[path] = snapshot
+        return snapshot
@@ -0,0 +1,205 @@
+"""
+Поиск конфликтов между включающими и исключающими списками папки lists.
+
+После слияния аддонов и списков стран один и тот же домен или подсеть
+может оказаться и в list-general.txt, и в list-exclude.txt (или в
+ipset-all.txt и ipset-exclude.txt) — такая запись фактически не работает.
+Конфликт — запись включающего списка, которая совпадает с записью
+исключающего (exact) или целиком покрыта ею (covered: родительский домен,
+более широкая подсеть).
+
+Каждый файл разбирается один раз и индексируется: домены — в DomainIndex,
+IP — в ListIndex (отсортированные массивы интервалов). При повторном
+анализе перечитываются только файлы, у которых изменились mtime или
+размер, и пересчитываются только пары списков, в которых есть изменённый.
+"""
+import os
+import threading
+
+from .domain_index import DomainIndex, split_labels
+from .ip_lookup import ListIndex
+from .ipset_engine import IPV4_BITS, IPV6_BITS, parse_cidr
+
+
+KIND_DOMAIN = 'domain'
+KIND_IP = 'ip'
+
+
+def classify_list(name):
+    """(вид списка, исключающий ли) по имени файла или None для посторонних файлов."""
+    lower = name.lower()
+    if not lower.endswith('.txt'):
+        return None
+    if lower.startswith('list-'):
+        kind = KIND_DOMAIN
+    elif lower.startswith('ipset-'):
+        kind = KIND_IP
+    else:
+        return None
+    return kind, 'exclude' in lower
+
+
+def _normalize_domain(domain):
+    return '.'.join(reversed(split_labels(domain)))
+
+
+def _data_lines(path):
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line_no, raw in enumerate(f, 1):
+            line = raw.strip()
+            if line and not line.startswith('#'):
+                yield line_no, line
+
+
+class _DomainFile:
+    """Разобранный список доменов: записи по порядку и индекс для проверки покрытия."""
+
+    def __init__(self, path):
+        self.entries = []  # (номер строки, нормализованный домен)
+        self.lines = {}    # нормализованный домен -> номер первой строки
+        for line_no, line in _data_lines(path):
+            domain = _normalize_domain(line)
+            if domain and domain not in self.lines:
+                self.lines[domain] = line_no
+                self.entries.append((line_no, domain))
+        self._index = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = DomainIndex(self.lines)
+        return self._index
+
+    def conflicts_with(self, exclude):
+        """Записи этого списка, совпадающие с записями exclude или покрытые ими."""
+        index = exclude.index
+        for line_no, domain in self.entries:
+            covering = index.covering_entry(domain)
+            if covering is not None:
+                kind = 'exact' if covering == domain else 'covered'
+                yield kind, line_no, domain, exclude.lines[covering], covering
+
+
+class _IpFile:
+    """Разобранный ipset: записи по порядку и ListIndex на каждое семейство адресов."""
+
+    def __init__(self, path):
+        self.entries = []  # (бит семейства, начало, конец, номер строки, текст)
+        exact = {}
+        for line_no, line in _data_lines(path):
+            parsed = parse_cidr(line)
+            if parsed is None:
+                continue
+            if parsed not in exact:
+                exact[parsed] = (line_no, line)
+                self.entries.append(parsed + (line_no, line))
+        self.exact = exact
+        self._indexes = None
+
+    @property
+    def indexes(self):
+        if self._indexes is None:
+            split = {IPV4_BITS: [], IPV6_BITS: []}
+            for bits, start, end, line_no, text in self.entries:
+                split[bits].append((start, end, line_no, text))
+            self._indexes = {bits: ListIndex(family, bits) for bits, family in split.items()}
+        return self._indexes
+
+    def conflicts_with(self, exclude):
+        indexes = exclude.indexes
+        for bits, start, end, line_no, text in self.entries:
+            same = exclude.exact.get((bits, start, end))
+            if same is not None:
+                yield 'exact', line_no, text, same[0], same[1]
+                continue
+            index = indexes[bits]
+            found = index.covering(start, end) if len(index) else None
+            if found is not None:
+                yield 'covered', line_no, text, found[0], found[1]
+
+
+class ListConflictAnalyzer:
+    """Инкрементальный анализатор конфликтов для папки lists.
+
+    refresh() можно вызывать из фонового потока: состояние защищено блокировкой.
+    """
+
+    def __init__(self, lists_folder):
+        self.lists_folder = lists_folder
+        self._lock = threading.Lock()
+        self._files = {}      # имя -> (сигнатура, вид, исключающий, _DomainFile | _IpFile)
+        self._pairs = {}      # (включающий, исключающий) -> список конфликтов
+        self.last_reparsed = []
+
+    def _scan(self):
+        """{имя: (сигнатура, вид, исключающий)} для списков папки (только stat, без чтения)."""
+        found = {}
+        try:
+            names = os.listdir(self.lists_folder)
+        except OSError:
+            return found
+        for name in names:
+            info = classify_list(name)
+            if info is None:
+                continue
+            try:
+                st = os.stat(os.path.join(self.lists_folder, name))
+            except OSError:
+                continue
+            found[name] = ((st.st_mtime_ns, st.st_size),) + info
+        return found
+
+    def refresh(self):
+        """Переиндексирует изменённые файлы и возвращает актуальный список конфликтов.
+
+        Конфликт — dict: kind ('domain'/'ip'), type ('exact'/'covered'), include,
+        include_line, entry, exclude, exclude_line, exclude_entry.
+        """
+        with self._lock:
+            current = self._scan()
+            changed = set()
+            for name in list(self._files):
+                if name not in current:
+                    del self._files[name]
+                    changed.add(name)
+            for name, (signature, kind, is_exclude) in current.items():
+                cached = self._files.get(name)
+                if cached and cached[0] == signature:
+                    continue
+                path = os.path.join(self.lists_folder, name)
+                try:
+                    parsed = _DomainFile(path) if kind == KIND_DOMAIN else _IpFile(path)
+                except OSError:
+                    self._files.pop(name, None)
+                    changed.add(name)
+                    continue
+                self._files[name] = (signature, kind, is_exclude, parsed)
+                changed.add(name)
+            self.last_reparsed = sorted(changed)
+
+            wanted = set()
+            for inc_name, (_sig, kind, is_exclude, _parsed) in self._files.items():
+                if is_exclude:
+                    continue
+                for exc_name, (_sig2, kind2, is_exclude2, _parsed2) in self._files.items():
+                    if is_exclude2 and kind2 == kind:
+                        wanted.add((inc_name, exc_name))
+            for pair in list(self._pairs):
+                if pair not in wanted or changed.intersection(pair):
+                    del self._pairs[pair]
+            for pair in wanted - self._pairs.keys():
+                self._pairs[pair] = self._compare(*pair)
+
+            result = []
+            for pair in sorted(self._pairs):
+                result.extend(self._pairs[pair])
+            return result
+
+    def _compare(self, inc_name, exc_name):
+        _sig, kind, _exc, include = self._files[inc_name]
+        exclude = self._files[exc_name][3]
+        return [
+            {'kind': kind, 'type': conflict_type, 'include': inc_name, 'include_line': inc_line,
+             'entry': entry, 'exclude': exc_name, 'exclude_line': exc_line, 'exclude_entry': exc_entry}
+            for conflict_type, inc_line, entry, exc_line, exc_entry in include.conflicts_with(exclude)
+        ]
@@ -0,0 +1,198 @@
+"""
+Обновление списков ipset и hosts из репозитория Flowseal.
+
+Загрузка идёт через общий HTTP-клиент (один пул соединений). Запрос
+отправляется с If-None-Match / If-Modified-Since, если локальный файл не
+менялся с прошлой загрузки, — при ответе 304 файл не трогается вовсе.
+Тело ответа потоково пишется во временный файл рядом с целевым, каждая
+строка проверяется (CIDR для ipset, "IP имя..." для hosts), и только
+после успешной проверки файл атомарно заменяется (os.replace).
+"""
+import ipaddress
+import json
+import os
+import threading
+
+from .http_client import get_http_client
+from .ipset_engine import is_valid_cidr
+from .path_utils import get_config_path
+
+
+IPSET_URL = 'https://raw.githubusercontent.com/Flowseal/zapret-discord-youtube/refs/heads/main/.service/ipset-service.txt'
+HOSTS_URL = 'https://raw.githubusercontent.com/Flowseal/zapret-discord-youtube/refs/heads/main/.service/hosts'
+STATE_FILENAME = 'list_updates.json'
+CHUNK_SIZE = 64 * 1024
+TIMEOUT = 30
+
+_state_lock = threading.Lock()
+
+
+class ListValidationError(Exception):
+    """Скачанный список не прошёл проверку (пустой или содержит некорректные строки)."""
+
+
+def _is_comment(line):
+    return not line or line.startswith('#')
+
+
+def validate_cidr_line(line):
+    """Строка ipset: пустая, комментарий, IP или подсеть CIDR (IPv4/IPv6)."""
+    return _is_comment(line) or is_valid_cidr(line)
+
+
+def validate_hosts_line(line):
+    """Строка hosts: пустая, комментарий или "IP имя [имя ...] [# комментарий]"."""
+    if _is_comment(line):
+        return True
+    parts = line.split('#', 1)[0].split()
+    if len(parts) < 2:
+        return False
+    try:
+        ipaddress.ip_address(parts[0])
+    except ValueError:
+        return False
+    return True
+
+
+def _load_state():
+    try:
+        with open(get_config_path(STATE_FILENAME), 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(state):
+    path = get_config_path(STATE_FILENAME)
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _conditional_headers(entry, url, target_path):
+    """Заголовки условного запроса, если файл на диске тот же, что был скачан в прошлый раз."""
+    if not entry or entry.get('url') != url:
+        return {}
+    if entry.get('signature') != _file_signature(target_path):
+        return {}  # файл удалён или изменён вручную — скачиваем заново
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def _stream_validated(response, tmp_path, validator):
+    """Пишет тело ответа в tmp_path как есть, проверяя каждую строку. Возвращает число строк с данными."""
+    data_lines = 0
+    line_no = 0
+    tail = b''
+
+    def check(raw_line):
+        nonlocal data_lines, line_no
+        line_no += 1
+        text = raw_line.decode('utf-8-sig' if line_no == 1 else 'utf-8', errors='replace').strip()
+        if not validator(text):
+            raise ListValidationError(f'Некорректная строка {line_no}: {text[:100]}')
+        if not _is_comment(text):
+            data_lines += 1
+
+    with open(tmp_path, 'wb') as f:
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            if not chunk:
+                continue
+            f.write(chunk)
+            lines = (tail + chunk).split(b'\n')
+            tail = lines.pop()
+            for raw_line in lines:
+                check(raw_line)
+        if tail:
+            check(tail)
+    if not data_lines:
+        raise ListValidationError('Скачанный файл пуст')
+    return data_lines
+
+
+def update_list(url, target_path, validator, client=None):
+    """Скачивает список url в target_path с проверкой строк validator.
+
+    Возвращает dict: status — 'updated' или 'not_modified', lines — число строк
+    с данными (только для 'updated'). При ошибке проверки целевой файл не меняется
+    и выбрасывается ListValidationError; сетевые ошибки пробрасываются как есть.
+    """
+    client = client or get_http_client()
+    target_path = os.path.abspath(target_path)
+    with _state_lock:
+        entry = _load_state().get(target_path)
+    headers = _conditional_headers(entry, url, target_path)
+
+    response = client.get(url, timeout=TIMEOUT, headers=headers, stream=True)
+    with response:
+        if response.status_code == 304 and headers:
+            return {'status': 'not_modified', 'lines': None}
+        response.raise_for_status()
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        tmp_path = target_path + '.download'
+        try:
+            lines = _stream_validated(response, tmp_path, validator)
+            os.replace(tmp_path, target_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+
+    with _state_lock:
+        state = _load_state()
+        state[target_path] = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'signature': _file_signature(target_path),
+        }
+        _save_state(state)
+    return {'status': 'updated', 'lines': lines}
+
+
+def update_ipset_list(target_path, client=None):
+    """Обновляет ipset-all.txt из ipset-service.txt."""
+    return update_list(IPSET_URL, target_path, validate_cidr_line, client=client)
+
+
+def update_hosts_copy(target_path, client=None):
+    """Обновляет локальную копию hosts репозитория (zapret_hosts.txt)."""
+    return update_list(HOSTS_URL, target_path, validate_hosts_line, client=client)
+
+
+def hosts_needs_update(downloaded_path, hosts_path):
+    """True, если первая или последняя строка скачанного hosts отсутствует в системном hosts."""
+    with open(downloaded_path, 'r', encoding='utf-8-sig', errors='replace') as f:
+        lines = [line.strip() for line in f if line.strip()]
+    if not lines:
+        raise ListValidationError('Скачанный файл пуст')
+    try:
+        with open(hosts_path, 'r', encoding='utf-8', errors='replace') as f:
+            hosts_content = f.read()
+    except FileNotFoundError:
+        return True
+    return lines[0] not in hosts_content or lines[-1] not in hosts_content
@@ -0,0 +1,160 @@
+"""
+Загрузка доменов с аномалиями по стране из OONI API для списков стран.
+
+Страницы measurements запрашиваются параллельно по смещению (offset)
+волнами из WORKERS запросов через общий HTTP-клиент (один пул
+соединений). Результат кэшируется на диске по стране: домены с временем
+последнего измерения и момент загрузки. Повторная генерация запрашивает
+только измерения с since= (момент прошлой загрузки минус
+INCREMENTAL_OVERLAP — измерения выгружаются в OONI с задержкой) и
+дописывает их в кэш.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from .domain_normalize import normalize_domain
+from .http_client import get_http_client
+from .path_utils import get_config_path
+
+
+MEASUREMENTS_URL = 'https://api.ooni.io/api/v1/measurements'
+CACHE_DIRNAME = 'ooni_cache'
+PAGE_SIZE = 100
+WORKERS = 6
+MAX_PAGES = 200
+TIMEOUT = 30
+INCREMENTAL_OVERLAP = 24 * 3600
+
+_cache_lock = threading.Lock()
+
+
+def domain_from_url(url):
+    """Извлекает нормализованный домен (нижний регистр, punycode) из http(s)- или stun-URL."""
+    if not url or not isinstance(url, str):
+        return None
+    url = url.strip().lower()
+    if not url.startswith(('http://', 'https://', 'stun:')):
+        return None
+    return normalize_domain(url)
+
+
+def _cache_path(country_code, confirmed_only):
+    suffix = 'confirmed' if confirmed_only else 'anomaly'
+    return get_config_path(os.path.join(CACHE_DIRNAME, f'{country_code.upper()}-{suffix}.json'))
+
+
+def load_cache(country_code, confirmed_only):
+    """dict: fetched_at (unix time или None), complete (загружены все измерения),
+    domains — {домен: время последнего измерения}."""
+    try:
+        with open(_cache_path(country_code, confirmed_only), 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if isinstance(cache, dict) and isinstance(cache.get('domains'), dict):
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {'fetched_at': None, 'domains': {}}
+
+
+def _save_cache(country_code, confirmed_only, cache):
+    path = _cache_path(country_code, confirmed_only)
+    tmp_path = path + '.tmp'
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def _page_url(country_code, confirmed_only, offset, since=None):
+    params = {
+        'probe_cc': country_code,
+        'anomaly': 'true',
+        'test_name': 'web_connectivity',
+        'order_by': 'measurement_start_time',
+        'order': 'desc',
+        'limit': PAGE_SIZE,
+        'offset': offset,
+    }
+    if confirmed_only:
+        params['confirmed'] = 'true'
+    if since:
+        params['since'] = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(since))
+    return f'{MEASUREMENTS_URL}?{urlencode(params)}'
+
+
+def _fetch_page(client, url):
+    response = client.get(url, timeout=TIMEOUT)
+    response.raise_for_status()
+    return response.json().get('results') or []
+
+
+def _merge(domains, results):
+    """Добавляет домены страницы в {домен: время последнего измерения}; возвращает число новых."""
+    added = 0
+    for m in results:
+        domain = domain_from_url(m.get('input'))
+        if not domain:
+            continue
+        seen_at = m.get('measurement_start_time') or ''
+        if domain not in domains:
+            domains[domain] = seen_at
+            added += 1
+        elif seen_at > domains[domain]:
+            domains[domain] = seen_at
+    return added
+
+
+def fetch_country_domains(country_code, limit=1000, confirmed_only=False, client=None,
+                          workers=WORKERS, use_cache=True, clock=time.time):
+    """Домены с аномалиями для страны (самые свежие — первыми).
+
+    Без кэша страницы загружаются, пока не наберётся limit доменов; с кэшем —
+    только измерения с момента прошлой загрузки. Возвращает (список доменов,
+    сообщение об ошибке или None); при ошибке возвращается то, что удалось собрать.
+    """
+    client = client or get_http_client()
+    with _cache_lock:
+        cache = load_cache(country_code, confirmed_only) if use_cache else {'fetched_at': None, 'domains': {}}
+    domains = dict(cache['domains'])
+    since = None
+    if cache['fetched_at'] and (cache.get('complete') or len(domains) >= limit):
+        # Кэша хватает на limit доменов — догружаем только новые измерения
+        since = cache['fetched_at'] - INCREMENTAL_OVERLAP
+    complete = bool(cache.get('complete'))
+    started_at = clock()
+    error = None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        page = 0
+        while page < MAX_PAGES:
+            urls = [_page_url(country_code, confirmed_only, (page + i) * PAGE_SIZE, since)
+                    for i in range(min(workers, MAX_PAGES - page))]
+            page += len(urls)
+            try:
+                pages = list(pool.map(lambda url: _fetch_page(client, url), urls))
+            except Exception as e:
+                error = str(e)
+                break
+            for results in pages:
+                _merge(domains, results)
+            if any(len(results) < PAGE_SIZE for results in pages):
+                complete = complete or since is None  # измерения закончились
+                break
+            if since is None and len(domains) >= limit:
+                break
+
+    if use_cache and error is None:
+        with _cache_lock:
+            _save_cache(country_code, confirmed_only, {'fetched_at': started_at, 'complete': complete, 'domains': domains})
+    ordered = sorted(sorted(domains), key=domains.get, reverse=True)
+    return ordered[:limit], error
@@ -0,0 +1,66 @@
+"""
+Кэш результатов дорогих внешних запросов (schtasks /query, sc query) с TTL на ключ.
+
+Значение хранится ttl секунд; после собственных изменяющих действий
+(создание/удаление задачи, sc delete и т.п.) ключи сбрасываются явно через
+invalidate(). Одновременные запросы одного ключа выполняют загрузку один раз.
+Исключения загрузчика не кэшируются.
+"""
+import threading
+import time
+
+
+class QueryCache:
+    """Потокобезопасный кэш {ключ: (значение, момент истечения)}."""
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._entries = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key_lock(self, key):
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > self._clock():
+                self.hits += 1
+                return True, entry[0]
+        return False, None
+
+    def get(self, key, loader, ttl):
+        """Значение по ключу; если его нет или оно устарело — вызывает loader() и запоминает на ttl секунд."""
+        found, value = self._lookup(key)
+        if found:
+            return value
+        with self._key_lock(key):
+            # Пока ждали блокировку, значение мог загрузить другой поток
+            found, value = self._lookup(key)
+            if found:
+                return value
+            value = loader()
+            with self._lock:
+                self.misses += 1
+                self._entries[key] = (value, self._clock() + ttl)
+            return value
+
+    def invalidate(self, key=None, prefix=None):
+        """Сбрасывает ключ key, все ключи с префиксом prefix или (без аргументов) весь кэш."""
+        with self._lock:
+            if key is None and prefix is None:
+                self._entries.clear()
+                return
+            if key is not None:
+                self._entries.pop(key, None)
+            if prefix is not None:
+                for k in [k for k in self._entries if k.startswith(prefix)]:
+                    del self._entries[k]
+
@@ -0,0 +1,122 @@
+"""
+Быстрая передача управления уже запущенному экземпляру.
+
+Работает до инициализации Qt: подключается к QLocalServer первого экземпляра
+напрямую через именованный канал (Windows) или unix-сокет (остальные ОС)
+и отправляет команду показа окна. Использует только стандартную библиотеку.
+"""
+import os
+
+
+SHARED_MEMORY_KEY = "ZapretDesktop_SingleInstance"
+SERVER_NAME = "ZapretDesktop_Show"
+SHOW_COMMAND = b"show"
+# Метка целостности Medium: писать в канал повышенного экземпляра может обычный процесс
+MEDIUM_INTEGRITY_SACL = "S:(ML;;NW;;;ME)"
+
+
+def _server_path(name=SERVER_NAME):
+    """Путь, по которому QLocalServer.listen(name) создаёт канал/сокет."""
+    if os.name == 'nt':
+        return "\\\\.\\pipe\\" + name
+    import tempfile
+    return os.path.join(tempfile.gettempdir(), name)
+
+
+def _allow_foreground_for_running_instance():
+    """Разрешает первому экземпляру вывести окно на передний план (AllowSetForegroundWindow).
+
+    Без этого Windows не даёт фоновому процессу активировать своё окно,
+    и оно лишь мигает на панели задач.
+    """
+    if os.name != 'nt':
+        return
+    try:
+        import ctypes
+        ASFW_ANY = -1
+        ctypes.windll.user32.AllowSetForegroundWindow(ASFW_ANY)
+    except Exception:
+        pass
+
+
+def lower_server_integrity_label(name=SERVER_NAME):
+    """Ставит каналу сервера метку целостности Medium (Windows).
+
+    Первый экземпляр работает с правами администратора (High). Повторный запуск
+    из проводника — обычный процесс (Medium), и без явной метки он не может
+    открыть канал на запись, так что быстрый путь не срабатывает до UAC.
+    Вызывать после QLocalServer.listen() с WorldAccessOption: DACL Qt даёт
+    всем WRITE_OWNER, без которого метку не поменять.
+    Открытие канала по имени — это подключение клиента; сервер получит
+    пустое соединение и закроет его.
+    Возвращает True, если метка установлена.
+    """
+    if os.name != 'nt':
+        return False
+    try:
+        import ctypes
+        from ctypes import wintypes
+        advapi32 = ctypes.WinDLL('advapi32', use_last_error=True)
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        kernel32.CreateFileW.restype = wintypes.HANDLE
+        WRITE_OWNER = 0x00080000
+        OPEN_EXISTING = 3
+        SE_KERNEL_OBJECT = 6
+        LABEL_SECURITY_INFORMATION = 0x10
+        SDDL_REVISION_1 = 1
+        INVALID_HANDLE_VALUE = wintypes.HANDLE(-1).value
+
+        descriptor = ctypes.c_void_p()
+        if not advapi32.ConvertStringSecurityDescriptorToSecurityDescriptorW(
+                MEDIUM_INTEGRITY_SACL, SDDL_REVISION_1, ctypes.byref(descriptor), None):
+            return False
+        try:
+            sacl = ctypes.c_void_p()
+            present = wintypes.BOOL()
+            defaulted = wintypes.BOOL()
+            if not advapi32.GetSecurityDescriptorSacl(descriptor, ctypes.byref(present),
+                                                      ctypes.byref(sacl), ctypes.byref(defaulted)):
+                return False
+            handle = kernel32.CreateFileW(_server_path(name), WRITE_OWNER,
+                                          0, None, OPEN_EXISTING, 0, None)
+            if handle in (None, INVALID_HANDLE_VALUE):
+                return False
+            try:
+                return advapi32.SetSecurityInfo(wintypes.HANDLE(handle), SE_KERNEL_OBJECT,
+                                                LABEL_SECURITY_INFORMATION,
+                                                None, None, None, sacl) == 0
+            finally:
+                kernel32.CloseHandle(wintypes.HANDLE(handle))
+        finally:
+            kernel32.LocalFree(descriptor)
+    except Exception:
+        return False
+
+
+def notify_running_instance(timeout=0.05):
+    """Просит уже запущенный экземпляр показать окно.
+
+    Возвращает True, если первый экземпляр найден и команда отправлена —
+    текущий процесс можно сразу завершать. False — сервер не найден или занят;
+    тогда запуск продолжается обычным путём (с проверкой через QSharedMemory).
+    """
+    path = _server_path()
+    _allow_foreground_for_running_instance()
+    try:
+        if os.name == 'nt':
+            # QLocalServer на Windows — именованный канал; открываем его как файл
+            with open(path, 'wb', buffering=0) as pipe:
+                pipe.write(SHOW_COMMAND)
+            return True
+        import socket
+        if not os.path.exists(path):
+            return False
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            sock.sendall(SHOW_COMMAND)
+        return True
+    except OSError:
+        # Нет сервера (первый запуск), канал занят (ERROR_PIPE_BUSY) или сокет устарел
+        return False
+
@@ -0,0 +1,100 @@
+"""
+Профилировщик запуска приложения (--profile-startup).
+
+Замеряет время импортов и фаз инициализации до показа первого окна.
+Модуль использует только стандартную библиотеку, чтобы его можно было
+импортировать самым первым — до PyQt6 и остальных тяжёлых модулей.
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+
+PROFILE_FLAG = '--profile-startup'
+LOG_FILENAME = 'startup_profile.log'
+
+_t0 = time.perf_counter()
+_enabled = PROFILE_FLAG in sys.argv
+_records = []  # (имя фазы, начало от старта, длительность) в секундах
+_first_window_time = None
+
+
+def is_enabled():
+    """Возвращает True, если приложение запущено с флагом --profile-startup."""
+    return _enabled
+
+
+def elapsed():
+    """Время в секундах с момента импорта профилировщика (≈ старта процесса)."""
+    return time.perf_counter() - _t0
+
+
+@contextmanager
+def phase(name):
+    """Контекстный менеджер: замеряет длительность блока как фазу запуска.
+
+    Замер ведётся всегда (накладные расходы — два вызова perf_counter),
+    а в лог попадает только при --profile-startup.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        _records.append((name, start - _t0, end - start))
+
+
+def mark(name):
+    """Отмечает момент времени (фаза нулевой длительности)."""
+    _records.append((name, elapsed(), 0.0))
+
+
+def first_window_shown():
+    """Фиксирует время до первого показа окна (time-to-first-window).
+
+    Вызывается из showEvent главного окна; повторные вызовы игнорируются.
+    При --profile-startup сразу пишет отчёт.
+    """
+    global _first_window_time
+    if _first_window_time is not None:
+        return
+    _first_window_time = elapsed()
+    mark('first_window_shown')
+    if _enabled:
+        report()
+
+
+def time_to_first_window():
+    """Время до первого показа окна в секундах или None, если окно ещё не показано."""
+    return _first_window_time
+
+
+def format_report():
+    """Форматирует собранные замеры в текст (по строке на фазу)."""
+    lines = [f"ZapretDesktop startup profile ({time.strftime('%Y-%m-%d %H:%M:%S')})"]
+    for name, started, duration in _records:
+        if duration:
+            lines.append(f"  {started * 1000:9.1f} ms  +{duration * 1000:8.1f} ms  {name}")
+        else:
+            lines.append(f"  {started * 1000:9.1f} ms  {'':>11}  {name}")
+    if _first_window_time is not None:
+        lines.append(f"  time_to_first_window: {_first_window_time * 1000:.1f} ms")
+    return '\n'.join(lines)
+
+
+def report():
+    """Выводит отчёт в stderr и дописывает его в startup_profile.log в папке настроек."""
+    text = format_report()
+    try:
+        print(text, file=sys.stderr)
+    except Exception:
+        pass
+    try:
+        from .path_utils import get_config_path
+        log_path = get_config_path(LOG_FILENAME)
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        with open(log_path, 'a', encoding='utf-8') as f:
+            f.write(text + '\n\n')
+    except Exception:
+        pass
@@ -0,0 +1,488 @@
+"""
+Слой интеграции с системой: службы (sc), задачи Планировщика (schtasks),
+процессы (psutil) и TCP timestamps (netsh).
+
+WindowsBackend выполняет реальные команды. FakeBackend хранит состояние
+в памяти (winws, WinDivert, BFE, задачи) и имитирует задержки операций —
+с ним сценарии запуска/остановки/диагностики можно прогонять и замерять
+на Linux. CachingBackend оборачивает любой backend и кэширует запросы
+состояния служб и задач (query_cache) до истечения TTL или до собственного
+изменяющего действия. Текущий backend выбирается через get_backend()/set_backend().
+"""
+import os
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+
+from .query_cache import QueryCache
+
+
+@dataclass
+class ProcessInfo:
+    """Снимок процесса: pid, имя, путь к exe, командная строка (список) и рабочая папка."""
+    pid: int
+    name: str
+    exe: str = ''
+    cmdline: list = field(default_factory=list)
+    cwd: str = ''
+
+
+def parse_sc_query(output):
+    """Разбирает вывод `sc query`: {имя службы в нижнем регистре: {'name', 'display_name', 'state'}}."""
+    services = {}
+    current = None
+    for raw_line in output.splitlines():
+        line = raw_line.strip()
+        if line.startswith('SERVICE_NAME:'):
+            name = line.split(':', 1)[1].strip()
+            current = {'name': name, 'display_name': '', 'state': ''}
+            services[name.lower()] = current
+        elif current is None:
+            continue
+        elif line.startswith('DISPLAY_NAME:'):
+            current['display_name'] = line.split(':', 1)[1].strip()
+        elif line.startswith('STATE'):
+            parts = line.split(':', 1)[1].split()
+            current['state'] = parts[1] if len(parts) > 1 else (parts[0] if parts else '')
+    return services
+
+
+class WindowsBackend:
+    """Реальные вызовы sc / schtasks / netsh / psutil."""
+
+    def _run(self, args, timeout=5):
+        kwargs = {}
+        if os.name == 'nt':
+            kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW
+        return subprocess.run(args, capture_output=True, text=True, encoding='utf-8',
+                              errors='replace', timeout=timeout, **kwargs)
+
+    # --- Службы и драйверы ---
+
+    def query_services(self):
+        """Все службы и драйверы (включая остановленные) одним вызовом sc query."""
+        result = self._run(['sc', 'query', 'type=', 'all', 'state=', 'all'], timeout=10)
+        return parse_sc_query(result.stdout)
+
+    def query_service(self, name):
+        """Состояние одной службы ({'name', 'display_name', 'state'}) или None, если её нет."""
+        result = self._run(['sc', 'query', name])
+        if result.returncode != 0:
+            return None
+        return parse_sc_query(result.stdout).get(name.lower())
+
+    def stop_service(self, name):
+        return self._run(['net', 'stop', name]).returncode == 0
+
+    def delete_service(self, name):
+        return self._run(['sc', 'delete', name]).returncode == 0
+
+    # --- Процессы ---
+
+    def list_processes(self, name=None):
+        """Процессы (ProcessInfo), при заданном name — только с этим именем (без учёта регистра)."""
+        import psutil
+        wanted = name.lower() if name else None
+        result = []
+        for proc in psutil.process_iter(['pid', 'name']):
+            try:
+                proc_name = proc.info.get('name') or ''
+                if wanted and proc_name.lower() != wanted:
+                    continue
+                info = ProcessInfo(pid=proc.info.get('pid'), name=proc_name)
+                if wanted:
+                    # Путь и командная строка нужны только для искомых процессов
+                    for attr, getter in (('exe', proc.exe), ('cmdline', proc.cmdline), ('cwd', proc.cwd)):
+                        try:
+                            setattr(info, attr, getter() or getattr(info, attr))
+                        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess, OSError):
+                            pass
+                result.append(info)
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                pass
+        return result
+
+    def is_process_running(self, name):
+        import psutil
+        wanted = name.lower()
+        for proc in psutil.process_iter(['name']):
+            try:
+                if (proc.info.get('name') or '').lower() == wanted:
+                    return True
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                pass
+        return False
+
+    def _signal_processes(self, name, kill):
+        import psutil
+        wanted = name.lower()
+        count = 0
+        for proc in psutil.process_iter(['pid', 'name']):
+            try:
+                if (proc.info.get('name') or '').lower() != wanted:
+                    continue
+                if kill:
+                    proc.kill()
+                else:
+                    proc.terminate()
+                count += 1
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                pass
+        return count
+
+    def terminate_processes(self, name):
+        """Мягко завершает все процессы name; возвращает их число."""
+        return self._signal_processes(name, kill=False)
+
+    def kill_processes(self, name):
+        """Принудительно завершает все процессы name; возвращает их число."""
+        return self._signal_processes(name, kill=True)
+
+    def launch_strategy(self, bat_path, cwd):
+        """Запускает .bat стратегии без окна; возвращает subprocess.Popen."""
+        if os.name == 'nt':
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            startupinfo.wShowWindow = subprocess.SW_HIDE
+            return subprocess.Popen(
+                ['cmd.exe', '/c', bat_path],
+                cwd=cwd,
+                startupinfo=startupinfo,
+                creationflags=subprocess.CREATE_NO_WINDOW
+            )
+        return subprocess.Popen(
+            [bat_path],
+            cwd=cwd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+
+    def current_process_parent(self):
+        """(имя родителя текущего процесса в нижнем регистре или '', время создания текущего процесса)."""
+        import psutil
+        current = psutil.Process()
+        parent = current.parent()
+        return (parent.name().lower() if parent else ''), current.create_time()
+
+    # --- Планировщик заданий ---
+
+    def task_exists(self, task_name):
+        return self._run(['schtasks', '/query', '/tn', task_name], timeout=15).returncode == 0
+
+    def create_task(self, task_name, command, username=''):
+        """Задача ONLOGON с наивысшими правами. Возвращает (успех, текст ошибки)."""
+        cmd = [
+            'schtasks', '/Create',
+            '/TN', task_name,
+            '/TR', command,
+            '/SC', 'ONLOGON',
+            '/RL', 'HIGHEST',
+            '/F',
+        ]
+        if username:
+            cmd.extend(['/RU', username])
+        result = self._run(cmd, timeout=15)
+        if result.returncode == 0:
+            return True, ''
+        return False, result.stderr or result.stdout or ''
+
+    def delete_task(self, task_name):
+        return self._run(['schtasks', '/delete', '/tn', task_name, '/f'], timeout=15).returncode == 0
+
+    # --- TCP timestamps ---
+
+    def get_tcp_timestamps(self):
+        out = self._run(['netsh', 'interface', 'tcp', 'show', 'global']).stdout.lower()
+        return 'timestamps' in out and 'enabled' in out
+
+    def set_tcp_timestamps(self, enabled):
+        value = 'enabled' if enabled else 'disabled'
+        return self._run(['netsh', 'interface', 'tcp', 'set', 'global', f'timestamps={value}']).returncode == 0
+
+
+class FakeLaunchedProcess:
+    """Процесс `cmd /c стратегия.bat` в FakeBackend: запускает winws и сразу завершается."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.returncode = 0
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        return self.returncode
+
+    def terminate(self):
+        pass
+
+    def kill(self):
+        pass
+
+
+class FakeBackend:
+    """Backend в памяти для тестов и замеров на Linux.
+
+    Начальное состояние: BFE запущена, WinDivert и zapret не установлены, задач нет.
+    latencies — {имя операции: секунды} (например {'query_services': 0.05}),
+    default_latency — задержка для остальных операций. Все вызовы записываются в calls.
+    """
+
+    def __init__(self, latencies=None, default_latency=0.0):
+        self.latencies = dict(latencies or {})
+        self.default_latency = default_latency
+        self.calls = []
+        self.services = {
+            'bfe': {'name': 'BFE', 'display_name': 'Base Filtering Engine', 'state': 'RUNNING'},
+        }
+        self.processes = []
+        self.tasks = {}
+        self.tcp_timestamps = True
+        self.parent_name = 'explorer.exe'
+        self.started_at = time.time()
+        self._next_pid = 1000
+        self._lock = threading.Lock()
+
+    def _op(self, name):
+        with self._lock:
+            self.calls.append(name)
+        delay = self.latencies.get(name, self.default_latency)
+        if delay:
+            time.sleep(delay)
+
+    # --- Управление состоянием из тестов ---
+
+    def add_service(self, name, state='RUNNING', display_name=None):
+        with self._lock:
+            self.services[name.lower()] = {'name': name, 'display_name': display_name or name, 'state': state}
+
+    def spawn_process(self, name, exe='', cmdline=None, cwd=''):
+        """Добавляет процесс; для winws.exe также запускает драйвер WinDivert (как настоящий winws)."""
+        with self._lock:
+            self._next_pid += 4
+            info = ProcessInfo(pid=self._next_pid, name=name, exe=exe, cmdline=list(cmdline or []), cwd=cwd)
+            self.processes.append(info)
+        if name.lower() == 'winws.exe':
+            self.add_service('WinDivert', 'RUNNING')
+        return info
+
+    def spawn_winws(self, winws_folder, strategy):
+        """Имитирует запуск стратегии strategy.bat из winws_folder."""
+        exe = os.path.join(winws_folder, 'bin', 'winws.exe')
+        return self.spawn_process('winws.exe', exe=exe, cmdline=[exe, f'--comment={strategy}'],
+                                  cwd=winws_folder)
+
+    # --- Службы и драйверы ---
+
+    def query_services(self):
+        self._op('query_services')
+        with self._lock:
+            return {k: dict(v) for k, v in self.services.items()}
+
+    def query_service(self, name):
+        self._op('query_service')
+        with self._lock:
+            entry = self.services.get(name.lower())
+            return dict(entry) if entry else None
+
+    def stop_service(self, name):
+        self._op('stop_service')
+        with self._lock:
+            entry = self.services.get(name.lower())
+            if not entry:
+                return False
+            entry['state'] = 'STOPPED'
+            return True
+
+    def delete_service(self, name):
+        self._op('delete_service')
+        with self._lock:
+            return self.services.pop(name.lower(), None) is not None
+
+    # --- Процессы ---
+
+    def list_processes(self, name=None):
+        self._op('list_processes')
+        with self._lock:
+            return [
+                ProcessInfo(p.pid, p.name, p.exe, list(p.cmdline), p.cwd)
+                for p in self.processes
+                if not name or p.name.lower() == name.lower()
+            ]
+
+    def is_process_running(self, name):
+        self._op('is_process_running')
+        with self._lock:
+            return any(p.name.lower() == name.lower() for p in self.processes)
+
+    def _remove_processes(self, name):
+        with self._lock:
+            kept = [p for p in self.processes if p.name.lower() != name.lower()]
+            count = len(self.processes) - len(kept)
+            self.processes = kept
+            # После выхода последнего winws драйвер WinDivert выгружается
+            if count and name.lower() == 'winws.exe' and 'windivert' in self.services:
+                self.services['windivert']['state'] = 'STOPPED'
+        return count
+
+    def terminate_processes(self, name):
+        self._op('terminate_processes')
+        return self._remove_processes(name)
+
+    def kill_processes(self, name):
+        self._op('kill_processes')
+        return self._remove_processes(name)
+
+    def launch_strategy(self, bat_path, cwd):
+        """Запуск стратегии: появляется winws.exe (и WinDivert), возвращается завершившийся cmd."""
+        self._op('launch_strategy')
+        self.spawn_winws(cwd, os.path.splitext(os.path.basename(bat_path))[0])
+        with self._lock:
+            self._next_pid += 4
+            return FakeLaunchedProcess(self._next_pid)
+
+    def current_process_parent(self):
+        self._op('current_process_parent')
+        return self.parent_name, self.started_at
+
+    # --- Планировщик заданий ---
+
+    def task_exists(self, task_name):
+        self._op('task_exists')
+        with self._lock:
+            return task_name in self.tasks
+
+    def create_task(self, task_name, command, username=''):
+        self._op('create_task')
+        with self._lock:
+            self.tasks[task_name] = {'command': command, 'username': username}
+        return True, ''
+
+    def delete_task(self, task_name):
+        self._op('delete_task')
+        with self._lock:
+            return self.tasks.pop(task_name, None) is not None
+
+    # --- TCP timestamps ---
+
+    def get_tcp_timestamps(self):
+        self._op('get_tcp_timestamps')
+        return self.tcp_timestamps
+
+    def set_tcp_timestamps(self, enabled):
+        self._op('set_tcp_timestamps')
+        self.tcp_timestamps = bool(enabled)
+        return True
+
+
+class CachingBackend:
+    """Обёртка над backend: кэширует sc query и schtasks /query с TTL.
+
+    Кэш служб сбрасывается после stop_service/delete_service, запуска стратегии
+    и завершения процессов (winws загружает и выгружает WinDivert), кэш задачи — после её
+    создания или удаления. Остальные методы передаются обёрнутому backend.
+    Закэшированные словари служб общие — их нельзя изменять.
+    """
+
+    SERVICE_TTL = 5.0
+    TASK_TTL = 60.0
+
+    def __init__(self, inner, cache=None):
+        self.inner = inner
+        self.cache = cache or QueryCache()
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def query_services(self):
+        return self.cache.get('sc:*', self.inner.query_services, self.SERVICE_TTL)
+
+    def query_service(self, name):
+        return self.cache.get(f'sc:{name.lower()}', lambda: self.inner.query_service(name), self.SERVICE_TTL)
+
+    def stop_service(self, name):
+        try:
+            return self.inner.stop_service(name)
+        finally:
+            self.cache.invalidate(prefix='sc:')
+
+    def delete_service(self, name):
+        try:
+            return self.inner.delete_service(name)
+        finally:
+            self.cache.invalidate(prefix='sc:')
+
+    def terminate_processes(self, name):
+        try:
+            return self.inner.terminate_processes(name)
+        finally:
+            self.cache.invalidate(prefix='sc:')
+
+    def kill_processes(self, name):
+        try:
+            return self.inner.kill_processes(name)
+        finally:
+            self.cache.invalidate(prefix='sc:')
+
+    def launch_strategy(self, bat_path, cwd):
+        try:
+            return self.inner.launch_strategy(bat_path, cwd)
+        finally:
+            self.cache.invalidate(prefix='sc:')
+
+    def task_exists(self, task_name):
+        return self.cache.get(f'task:{task_name}', lambda: self.inner.task_exists(task_name), self.TASK_TTL)
+
+    def create_task(self, task_name, command, username=''):
+        try:
+            return self.inner.create_task(task_name, command, username)
+        finally:
+            self.cache.invalidate(key=f'task:{task_name}')
+
+    def delete_task(self, task_name):
+        try:
+            return self.inner.delete_task(task_name)
+        finally:
+            self.cache.invalidate(key=f'task:{task_name}')
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Текущий backend (по умолчанию WindowsBackend с кэшем запросов)."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = CachingBackend(WindowsBackend())
+    return _backend
+
+
+def stop_processes(name, grace=0.5, backend=None):
+    """Мягко завершает процессы name и через grace секунд принудительно добивает оставшиеся."""
+    backend = backend or get_backend()
+    if backend.terminate_processes(name):
+        time.sleep(grace)
+    backend.kill_processes(name)
+
+
+def invalidate_service_cache(backend=None):
+    """Сбрасывает кэш состояния служб backend (по умолчанию текущего).
+
+    Нужен после запуска или остановки стратегии: WinDivert и служба zapret
+    меняют состояние вне методов backend (их запускает и выгружает winws).
+    """
+    cache = getattr(backend or get_backend(), 'cache', None)
+    if cache is not None:
+        cache.invalidate(prefix='sc:')
+
+
+def set_backend(backend):
+    """Подменяет backend (например, FakeBackend или CachingBackend(FakeBackend()) в тестах);
+    None — вернуть backend по умолчанию."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -236,6 +236,32 @@ TRANSLATIONS = {
         'editor_zoom_out': 'Уменьшить',
         'editor_zoom_reset': 'Сбросить масштаб',
         'editor_format_document': 'Форматировать документ',
+        'editor_optimize_ipset': 'Оптимизировать ipset',
+        'editor_optimize_ipset_done': 'Записей было: {0}, стало: {1}. Некорректных строк (оставлены в конце): {2}.',
+        'editor_optimize_hostlist': 'Оптимизировать список доменов',
+        'editor_optimize_hostlist_done': 'Записей было: {0}, стало: {1}.\nУдалено дубликатов: {2}, поддоменов, покрытых родительским доменом: {3}.',
+        'editor_normalize_hostlist': 'Нормализовать список доменов',
+        'editor_normalize_hostlist_done': 'Записей было: {0}, стало: {1}.\nОтброшено некорректных: {2}, дубликатов: {3}, поддоменов, покрытых родительским доменом: {4}.',
+        'editor_resolve_ipset': 'Построить ipset из доменов...',
+        'editor_resolve_ipset_prompt': 'Доменов: {0}. Адреса A/AAAA будут сохранены в файл папки lists:',
+        'editor_resolve_ipset_progress': 'Разрешение доменов...',
+        'editor_resolve_ipset_bad_name': 'Имя файла должно иметь вид ipset-<имя>.txt (кроме ipset-all.txt) без пути',
+        'editor_resolve_ipset_overwrite': 'Файл {0} уже существует. Перезаписать?',
+        'editor_resolve_ipset_nothing': 'Ни один домен не разрешился — файл {0} не записан (пустой ipset совпадает со всеми адресами)',
+        'editor_resolve_ipset_done': 'Файл {0} сохранён.\nДоменов: {1}, разрешено: {2}, без адресов: {3}\nУникальных адресов: {4}, записей CIDR: {5}',
+        'editor_list_conflicts': 'Конфликты списков',
+        'editor_list_conflicts_none': 'Конфликтов между включающими и исключающими списками нет.',
+        'editor_list_conflicts_summary': 'Записей, которые отменяются исключающими списками: {0}\nТочных совпадений: {1}\nПокрыты родительским доменом или подсетью: {2}',
+        'editor_list_conflicts_exact': 'совпадает с',
+        'editor_list_conflicts_covered': 'покрыт',
+        'editor_lookup_ip': 'Найти IP в списках',
+        'editor_lookup_ip_prompt': 'IP-адреса или фрагмент лога (адреса будут найдены автоматически):',
+        'editor_lookup_ip_empty': 'IP-адреса не найдены',
+        'editor_lookup_ip_included': 'в ipset',
+        'editor_lookup_ip_excluded': 'исключён',
+        'editor_lookup_ip_none': 'нет ни в одном списке',
+        'editor_lookup_ip_invalid': 'некорректный адрес',
+        'editor_lookup_ip_summary': 'Проверено адресов: {0}\nВ ipset: {1}\nИсключены: {2}\nНет в списках: {3}\nНекорректных: {4}',
         'editor_convert_line_endings': 'Конвертировать окончания строк',
         'editor_convert_encoding': 'Конвертировать кодировку',
         'editor_about': 'О программе',
@@ -323,6 +349,8 @@ TRANSLATIONS = {
         'update_installing': 'Установка обновления...',
         'update_completed': 'Обновление завершено',
         'update_completed_text': 'Стратегии zapret успешно обновлены до версии {0}',
+        'update_delta_summary': 'Записано файлов: {0}, без изменений: {1}',
+        'update_removed_upstream': 'Нет в новой версии (оставлены): {0}',
         'update_completed_text_app': 'Программа ZapretDesktop успешно обновлена до версии {0}',
         'update_restart_required': 'Программа будет перезапущена автоматически',
         'update_error_title': 'Ошибка обновления',
@@ -331,6 +359,10 @@ TRANSLATIONS = {
         'update_manual_select_archive': 'Выберите архив для обновления',
         'update_manual_extracting': 'Распаковка архива...',
         'update_manual_completed': 'Стратегии успешно обновлены из архива',
+        'update_rollback': 'Откатить последнее обновление zapret',
+        'update_rollback_confirm': 'Вернуть установку zapret, которая была до последнего обновления?',
+        'update_rollback_unavailable': 'Нет предыдущей установки для отката',
+        'update_rollback_completed': 'Предыдущая установка zapret восстановлена',
         'addons_title': 'Дополнения',
         'addons_description': 'Ссылки на репозитории или релизы GitHub для скачивания списков и стратегий.',
         'addons_col_name': 'Название',
@@ -377,6 +409,7 @@ TRANSLATIONS = {
         'msg_no_strategy_selected': 'Не выбрана стратегия для запуска',
         'update_ipset_progress': 'Обновление ipset-all...',
         'update_ipset_success': 'IPSet List успешно обновлен.',
+        'update_ipset_up_to_date': 'IPSet List уже актуален.',
         'update_ipset_error': 'Ошибка при обновлении IPSet List: {0}',
         'update_hosts_progress': 'Проверка hosts файла...',
         'update_hosts_needs_update': 'Hosts файл требует обновления. Пожалуйста, вручную скопируйте содержимое из открытого файла в ваш hosts файл.',
@@ -526,6 +559,7 @@ TRANSLATIONS = {
         'diag_hosts_found': 'Файл hosts найден с {0} записей',
         'diag_hosts_not_found': '[X] Файл hosts не найден',
         'diag_error_hosts': 'Ошибка проверки файла hosts: {0}',
+        'diag_check_timeout': 'Проверка «{0}» не завершилась за {1} с',
         # Ссылки / контекстное меню
         'link_open_release': 'Открыть релиз версии',
         'link_copy_release': 'Копировать ссылку на релиз',
@@ -763,6 +797,32 @@ TRANSLATIONS = {
         'editor_zoom_out': 'Zoom Out',
         'editor_zoom_reset': 'Reset Zoom',
         'editor_format_document': 'Format Document',
+        'editor_optimize_ipset': 'Optimize ipset',
+        'editor_optimize_ipset_done': 'Entries before: {0}, after: {1}. Invalid lines (kept at the end): {2}.',
+        'editor_optimize_hostlist': 'Optimize hostlist',
+        'editor_optimize_hostlist_done': 'Entries before: {0}, after: {1}.\nRemoved duplicates: {2}, subdomains covered by a parent domain: {3}.',
+        'editor_normalize_hostlist': 'Normalize hostlist',
+        'editor_normalize_hostlist_done': 'Entries before: {0}, after: {1}.\nDropped invalid: {2}, duplicates: {3}, subdomains covered by a parent domain: {4}.',
+        'editor_resolve_ipset': 'Build ipset from domains...',
+        'editor_resolve_ipset_prompt': 'Domains: {0}. A/AAAA addresses will be saved to a file in the lists folder:',
+        'editor_resolve_ipset_progress': 'Resolving domains...',
+        'editor_resolve_ipset_bad_name': 'The file name must look like ipset-<name>.txt (except ipset-all.txt), without a path',
+        'editor_resolve_ipset_overwrite': 'File {0} already exists. Overwrite it?',
+        'editor_resolve_ipset_nothing': 'No domain resolved, so {0} was not written (an empty ipset matches every address)',
+        'editor_resolve_ipset_done': 'Saved {0}.\nDomains: {1}, resolved: {2}, without addresses: {3}\nUnique addresses: {4}, CIDR entries: {5}',
+        'editor_list_conflicts': 'List conflicts',
+        'editor_list_conflicts_none': 'No conflicts between include and exclude lists.',
+        'editor_list_conflicts_summary': 'Entries cancelled by exclude lists: {0}\nExact matches: {1}\nCovered by a parent domain or subnet: {2}',
+        'editor_list_conflicts_exact': 'same as',
+        'editor_list_conflicts_covered': 'covered by',
+        'editor_lookup_ip': 'Find IP in lists',
+        'editor_lookup_ip_prompt': 'IP addresses or a log fragment (addresses are extracted automatically):',
+        'editor_lookup_ip_empty': 'No IP addresses found',
+        'editor_lookup_ip_included': 'in ipset',
+        'editor_lookup_ip_excluded': 'excluded',
+        'editor_lookup_ip_none': 'not in any list',
+        'editor_lookup_ip_invalid': 'invalid address',
+        'editor_lookup_ip_summary': 'Addresses checked: {0}\nIn ipset: {1}\nExcluded: {2}\nNot in lists: {3}\nInvalid: {4}',
         'editor_convert_line_endings': 'Convert Line Endings',
         'editor_convert_encoding': 'Convert Encoding',
         'editor_about': 'About',
@@ -858,6 +918,8 @@ TRANSLATIONS = {
         'update_installing': 'Installing update...',
         'update_completed': 'Update completed',
         'update_completed_text': 'Zapret strategies successfully updated to version {0}',
+        'update_delta_summary': 'Files written: {0}, unchanged: {1}',
+        'update_removed_upstream': 'Not in the new version (kept): {0}',
         'update_completed_text_app': 'ZapretDesktop successfully updated to version {0}',
         'update_restart_required': 'The program will restart automatically',
         'update_error_title': 'Update error',
@@ -866,6 +928,10 @@ TRANSLATIONS = {
         'update_manual_select_archive': 'Select archive for update',
         'update_manual_extracting': 'Extracting archive...',
         'update_manual_completed': 'Strategies successfully updated from archive',
+        'update_rollback': 'Roll back last zapret update',
+        'update_rollback_confirm': 'Restore the zapret installation from before the last update?',
+        'update_rollback_unavailable': 'No previous installation to roll back to',
+        'update_rollback_completed': 'Previous zapret installation restored',
         'addons_title': 'Add-ons',
         'addons_description': 'Links to repositories or GitHub releases to download lists and strategies.',
         'addons_col_name': 'Name',
@@ -912,6 +978,7 @@ TRANSLATIONS = {
         'msg_no_strategy_selected': 'No strategy selected for launch',
         'update_ipset_progress': 'Updating ipset-all...',
         'update_ipset_success': 'IPSet List updated successfully.',
+        'update_ipset_up_to_date': 'IPSet List is already up to date.',
         'update_ipset_error': 'Error updating IPSet List: {0}',
         'update_hosts_progress': 'Checking hosts file...',
         'update_hosts_needs_update': 'Hosts file needs to be updated. Please manually copy the content from the opened file to your hosts file.',
@@ -1061,6 +1128,7 @@ TRANSLATIONS = {
         'diag_hosts_found': 'hosts file found with {0} entry/entries',
         'diag_hosts_not_found': '[X] hosts file not found',
         'diag_error_hosts': 'Error checking hosts file: {0}',
+        'diag_check_timeout': 'Check "{0}" did not finish within {1} s',
     }
 }
 
@@ -0,0 +1,82 @@
+"""
+Снимок состояния главного окна (ui_state.json в папке настроек).
+
+При выходе сохраняется то, что иначе пришлось бы читать с диска: список
+стратегий и версия zapret. Последняя стратегия и режимы фильтров уже лежат
+в конфиге. При следующем запуске окно сразу рисуется по снимку и конфигу,
+а актуальное состояние диска и процессов сверяется в фоне
+(см. MainWindow._start_ui_reconcile).
+"""
+import json
+import os
+import time
+
+from .path_utils import get_config_path
+
+
+SNAPSHOT_FILENAME = 'ui_state.json'
+SNAPSHOT_VERSION = 1
+
+
+def _normalize_path(path):
+    return os.path.normcase(os.path.abspath(path)) if path else ''
+
+
+def load_ui_snapshot(winws_path):
+    """Читает снимок состояния окна.
+
+    Возвращает dict или None, если снимка нет, он повреждён, другой версии формата
+    или был сделан для другой папки winws (тогда рисовать по нему нельзя).
+    """
+    try:
+        with open(get_config_path(SNAPSHOT_FILENAME), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get('version') != SNAPSHOT_VERSION:
+        return None
+    if _normalize_path(data.get('winws_path')) != _normalize_path(winws_path):
+        return None
+    if not isinstance(data.get('strategies'), list):
+        return None
+    return data
+
+
+def save_ui_snapshot(winws_path, strategies, base_version=None):
+    """Сохраняет снимок состояния окна. Запись атомарная: временный файл + os.replace."""
+    data = {
+        'version': SNAPSHOT_VERSION,
+        'saved_at': time.time(),
+        'winws_path': os.path.abspath(winws_path) if winws_path else '',
+        'strategies': list(strategies),
+        'base_version': base_version,
+    }
+    path = get_config_path(SNAPSHOT_FILENAME)
+    tmp_path = path + '.tmp'
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return True
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+
+
+def scan_strategies(winws_folder):
+    """Возвращает отсортированный список стратегий (.bat без расширения, кроме service.bat)
+    или None, если папки winws нет."""
+    if not os.path.isdir(winws_folder):
+        return None
+    names = []
+    with os.scandir(winws_folder) as it:
+        for entry in it:
+            name = entry.name
+            if name.endswith('.bat') and name != 'service.bat' and entry.is_file():
+                names.append(name[:-4])
+    names.sort()
+    return names
@@ -0,0 +1,541 @@
+"""
+Транзакционная установка zapret (winws) из zip-архива.
+
+Новая версия собирается в промежуточной папке рядом с установкой
+(<winws>_staging), проверяется и подменяет текущую переименованием папок.
+Предыдущая установка остаётся в <winws>_backup — откат мгновенный (rollback).
+
+Политика слияния:
+- файлы текущей установки, которых нет в архиве, переносятся как есть;
+- файлы пользователя (USER_OWNED_PATTERNS) всегда берутся из текущей
+  установки, даже если в архиве есть одноимённые.
+
+Дельта-режим (install_zip(..., release=True) — обновление релизом zapret,
+если прошлый релиз ставился так же и его манифест сохранён): содержимое
+установки сравнивается с архивом по CRC-32 и размеру из центрального
+каталога zip, записываются только изменившиеся и новые файлы. CRC файлов
+установки кэшируются в манифесте (winws_manifest.json в папке настроек) и
+пересчитываются только для файлов с другими размером/mtime; там же хранится
+список файлов последнего релиза. Аддоны и ручные архивы ставятся полной сборкой.
+
+Режим IPSet (ipset-all.txt и его .backup/.mode, см. WinwsManager), выбранный
+до установки, после неё применяется заново: новый полный список из архива
+паркуется в .backup, а на место встаёт служебный вариант.
+"""
+import fnmatch
+import json
+import os
+import shutil
+import time
+import zipfile
+import zlib
+
+from .path_utils import get_config_path
+from .winws_manager import WinwsManager
+
+
+# Пути относительно папки winws (через '/', сравнение без учёта регистра)
+USER_OWNED_PATTERNS = (
+    'utils/targets.txt',
+    'utils/*.enabled',
+    'lists/*-user.txt',
+    'lists/*.backup',
+    'lists/*.mode',
+)
+
+RENAME_RETRIES = 5
+RENAME_RETRY_DELAY = 0.5
+MANIFEST_FILENAME = 'winws_manifest.json'
+DELTA_MARKER = '.delta_backup'
+NEW_SUFFIX = '.zd-new'
+IPSET_LIST = 'lists/ipset-all.txt'
+
+
+class InstallError(Exception):
+    """Ошибка установки; текущая установка при этом не изменена."""
+
+
+# (перед, после) — вызываются вокруг переименования папки winws
+_swap_hooks = []
+
+
+def register_swap_hooks(before, after):
+    """Регистрирует обработчики вокруг подмены папки winws.
+
+    На Windows наблюдение QFileSystemWatcher держит дескриптор папки, и
+    переименование завершается отказом в доступе: before() снимает
+    наблюдение, after() возвращает его (вызывается и при ошибке).
+    """
+    _swap_hooks.append((before, after))
+
+
+class _SwapHooks:
+    """Контекст, внутри которого папку winws можно переименовывать."""
+
+    def __enter__(self):
+        for before, _after in _swap_hooks:
+            try:
+                before()
+            except Exception:
+                pass
+        return self
+
+    def __exit__(self, *exc_info):
+        for _before, after in reversed(_swap_hooks):
+            try:
+                after()
+            except Exception:
+                pass
+        return False
+
+
+def is_user_owned(rel_path):
+    """Относится ли файл (путь относительно winws) к файлам пользователя."""
+    rel = rel_path.replace('\\', '/').lower()
+    return any(fnmatch.fnmatchcase(rel, pattern) for pattern in USER_OWNED_PATTERNS)
+
+
+def _rename_with_retry(src, dst):
+    """os.rename с повторами: сразу после остановки winws файлы могут быть ещё заняты."""
+    for attempt in range(RENAME_RETRIES):
+        try:
+            os.rename(src, dst)
+            return
+        except OSError:
+            if attempt == RENAME_RETRIES - 1:
+                raise
+            time.sleep(RENAME_RETRY_DELAY)
+
+
+def _rmtree(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _walk_files(root):
+    """Относительные пути ('/'-разделитель) всех файлов в папке."""
+    result = []
+    for dirpath, _dirs, files in os.walk(root):
+        for name in files:
+            rel = os.path.relpath(os.path.join(dirpath, name), root)
+            result.append(rel.replace(os.sep, '/'))
+    return result
+
+
+def find_archive_root(names):
+    """Префикс папки winws внутри архива ('' или 'path/') по списку имён zip.
+
+    Определяется по центральному каталогу, без распаковки. Приоритет: папка с именем
+    winws; затем общая папка всех .bat; если .bat лежат в разных папках — корень архива.
+    """
+    winws_dirs = []
+    bat_dirs = set()
+    for name in names:
+        parts = name.rstrip('/').split('/')
+        for depth, part in enumerate(parts[:-1] if not name.endswith('/') else parts):
+            if part == 'winws':
+                winws_dirs.append('/'.join(parts[:depth + 1]) + '/')
+        if not name.endswith('/') and name.endswith('.bat'):
+            bat_dirs.add(name[:name.rfind('/') + 1])
+    if winws_dirs:
+        return min(winws_dirs, key=lambda d: (d.count('/'), d))
+    if not bat_dirs:
+        return None
+    if len(bat_dirs) == 1:
+        return bat_dirs.pop()
+    return ''
+
+
+def _archive_entries(zf, prefix):
+    """{относительный путь: ZipInfo} для файлов архива внутри prefix."""
+    entries = {}
+    for info in zf.infolist():
+        name = info.filename
+        if info.is_dir() or not name.startswith(prefix):
+            continue
+        rel = name[len(prefix):]
+        if rel and '..' not in rel.split('/'):
+            entries[rel] = info
+    return entries
+
+
+def _extract_member(zf, info, dst):
+    """Потоково распаковывает один элемент архива в dst (с сохранением даты изменения)."""
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    with zf.open(info) as src, open(dst, 'wb') as out:
+        shutil.copyfileobj(src, out, 1024 * 1024)
+    try:
+        mtime = time.mktime(info.date_time + (0, 0, -1))
+        os.utime(dst, (mtime, mtime))
+    except (OverflowError, ValueError, OSError):
+        pass
+
+
+def _file_crc32(path):
+    crc = 0
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(1024 * 1024)
+            if not block:
+                break
+            crc = zlib.crc32(block, crc)
+    return crc & 0xFFFFFFFF
+
+
+def _load_manifest(winws_folder):
+    """Сохранённый манифест для этой папки winws или пустой dict."""
+    try:
+        with open(get_config_path(MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('winws_path') == os.path.abspath(winws_folder):
+            return data
+    except (OSError, ValueError, AttributeError):
+        pass
+    return {}
+
+
+def has_release_manifest(winws_folder):
+    """Есть ли манифест релиза, установленного в winws_folder (условие дельта-обновления)."""
+    return bool(_load_manifest(winws_folder).get('release_files'))
+
+
+def build_manifest(winws_folder, release_files=None):
+    """Манифест установки: {путь: {'size', 'mtime_ns', 'crc'}}.
+
+    CRC берётся из кэша, если размер и mtime файла не изменились; обновлённый кэш
+    сохраняется в папке настроек (release_files — файлы только что установленного релиза).
+    """
+    winws_folder = os.path.abspath(winws_folder)
+    cached = _load_manifest(winws_folder).get('files') or {}
+    files = {}
+    for rel in _walk_files(winws_folder):
+        if rel.endswith(NEW_SUFFIX):
+            continue  # остаток прерванного дельта-обновления
+        path = os.path.join(winws_folder, *rel.split('/'))
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        old = cached.get(rel)
+        if old and old.get('size') == st.st_size and old.get('mtime_ns') == st.st_mtime_ns:
+            crc = old['crc']
+        else:
+            crc = _file_crc32(path)
+        files[rel] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'crc': crc}
+    save_manifest(winws_folder, files, release_files)
+    return files
+
+
+def save_manifest(winws_folder, files, release_files=None):
+    """Сохраняет манифест; без release_files сохраняется список файлов прежнего релиза."""
+    if release_files is None:
+        release_files = _load_manifest(winws_folder).get('release_files') or []
+    cache_path = get_config_path(MANIFEST_FILENAME)
+    tmp_path = cache_path + '.tmp'
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'winws_path': os.path.abspath(winws_folder), 'files': files,
+                       'release_files': sorted(release_files)}, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+
+class WinwsInstaller:
+    """Установка/обновление папки winws с промежуточной сборкой и атомарной подменой."""
+
+    def __init__(self, winws_folder):
+        self.winws_folder = os.path.abspath(winws_folder)
+
+    @property
+    def staging_folder(self):
+        return f"{self.winws_folder}_staging"
+
+    @property
+    def backup_folder(self):
+        return f"{self.winws_folder}_backup"
+
+    def has_backup(self):
+        return os.path.isdir(self.backup_folder)
+
+    def install_zip(self, zip_path, release=False):
+        """Устанавливает архив поверх текущей установки.
+
+        release=True — архив релиза zapret: если сохранён манифест прошлого релиза,
+        записываются только изменившиеся файлы (дельта), а после установки манифест
+        запоминает файлы нового релиза. Аддоны и ручные архивы (release=False) всегда
+        ставятся полной сборкой.
+        Возвращает dict: mode ('full' или 'delta'); carried_over — перенесённые из текущей
+        установки файлы, которых нет в архиве; preserved — сохранённые файлы пользователя;
+        для дельты также written, unchanged и removed_upstream (файлы прошлого релиза,
+        исчезнувшие из новой версии, — оставлены на месте).
+        При ошибке текущая установка не меняется, исключение — InstallError.
+        """
+        ipset_mode = self._current_ipset_mode()
+        if release and os.path.isdir(self.winws_folder) and has_release_manifest(self.winws_folder):
+            result = self._install_delta(zip_path)
+            if ipset_mode != 'loaded' and IPSET_LIST in (rel.lower() for rel in result['written']):
+                self._backup_parked_ipset()
+        else:
+            result = self._install_full(zip_path, release)
+        self._reapply_ipset_mode(ipset_mode)
+        return result
+
+    def _install_full(self, zip_path, release):
+        """Полная установка: сборка в staging и подмена папки."""
+        staging = self.staging_folder
+        _rmtree(staging)
+        try:
+            with zipfile.ZipFile(zip_path, 'r') as zf:
+                prefix = find_archive_root(zf.namelist())
+                if prefix is None:
+                    raise InstallError('Не найдены .bat файлы в архиве')
+                # Файлы пишутся из архива сразу на итоговые места в staging — одна запись на файл
+                entries = _archive_entries(zf, prefix)
+                for rel, info in entries.items():
+                    _extract_member(zf, info, os.path.join(staging, *rel.split('/')))
+            result = self._merge_current_into(staging)
+            self._validate(staging)
+            result['mode'] = 'full'
+        except InstallError:
+            _rmtree(staging)
+            raise
+        except Exception as e:
+            _rmtree(staging)
+            raise InstallError(f'Ошибка при обновлении: {e}') from e
+        self._swap(staging)
+        if release:
+            build_manifest(self.winws_folder, release_files=entries)
+        return result
+
+    def _backup_parked_ipset(self):
+        """Переносит припаркованный полный список (ipset-all.txt.backup) в бэкап дельты.
+
+        Повторное применение режима IPSet паркует на его место новый список из архива;
+        без этого прежний список пользователя терялся бы и rollback не мог бы его вернуть.
+        """
+        parked = os.path.join(self.winws_folder, *IPSET_LIST.split('/')) + '.backup'
+        if not os.path.isfile(parked):
+            return
+        saved = os.path.join(self.backup_folder, *IPSET_LIST.split('/')) + '.backup'
+        try:
+            os.makedirs(os.path.dirname(saved), exist_ok=True)
+            os.replace(parked, saved)
+        except OSError:
+            pass
+
+    def _current_ipset_mode(self):
+        if not os.path.isdir(self.winws_folder):
+            return 'loaded'
+        return WinwsManager(self.winws_folder).get_ipset_mode()
+
+    def _reapply_ipset_mode(self, mode):
+        """Возвращает режим IPSet, выбранный до установки (архив приносит полный ipset-all.txt)."""
+        if mode == 'loaded':
+            return
+        try:
+            WinwsManager(self.winws_folder).set_ipset_mode(mode)
+        except OSError:
+            pass
+
+    def _install_delta(self, zip_path):
+        """Дельта-обновление: пишет только файлы, чьи CRC/размер отличаются от архива."""
+        try:
+            with zipfile.ZipFile(zip_path, 'r') as zf:
+                prefix = find_archive_root(zf.namelist())
+                if prefix is None:
+                    raise InstallError('Не найдены .bat файлы в архиве')
+                entries = _archive_entries(zf, prefix)
+                previous = _load_manifest(self.winws_folder).get('release_files') or []
+                manifest = build_manifest(self.winws_folder)
+                local = {rel.lower(): rel for rel in manifest}
+                to_write, preserved, unchanged = [], [], 0
+                for rel, info in entries.items():
+                    local_rel = local.get(rel.lower())
+                    if local_rel is None:
+                        to_write.append((rel, info, False))
+                        continue
+                    if is_user_owned(rel):
+                        preserved.append(local_rel)
+                        continue
+                    meta = manifest[local_rel]
+                    if meta['size'] == info.file_size and meta['crc'] == info.CRC:
+                        unchanged += 1
+                    else:
+                        to_write.append((local_rel, info, True))
+                archive_keys = {rel.lower() for rel in entries}
+                carried_over = sorted(
+                    rel for rel in manifest
+                    if rel.lower() not in archive_keys and not is_user_owned(rel)
+                )
+                # Из прошлого релиза исчезли только его собственные файлы, а не файлы аддонов
+                previous_keys = {rel.lower() for rel in previous}
+                removed_upstream = [rel for rel in carried_over if rel.lower() in previous_keys]
+                self._write_delta(zf, to_write)
+        except InstallError:
+            raise
+        except Exception as e:
+            raise InstallError(f'Ошибка при обновлении: {e}') from e
+
+        for rel, info, _existed in to_write:
+            path = os.path.join(self.winws_folder, *rel.split('/'))
+            st = os.stat(path)
+            manifest[rel] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'crc': info.CRC}
+        save_manifest(self.winws_folder, manifest, [local.get(rel.lower(), rel) for rel in entries])
+        return {
+            'mode': 'delta',
+            'written': [rel for rel, _info, _existed in to_write],
+            'unchanged': unchanged,
+            'removed_upstream': removed_upstream,
+            'carried_over': carried_over,
+            'preserved': preserved,
+        }
+
+    def _write_delta(self, zf, to_write):
+        """Записывает файлы дельты транзакционно.
+
+        1) новые версии распаковываются рядом с целевыми (*.zd-new);
+        2) заменяемые файлы переносятся в winws_backup (с маркером дельты для rollback);
+        3) новые версии встают на место через os.replace.
+        """
+        # Даже пустая дельта заменяет прежний бэкап: откатываться нужно к установке
+        # перед этим обновлением, а не к более ранней
+        staged = []
+        try:
+            for rel, info, _existed in to_write:
+                dst = os.path.join(self.winws_folder, *rel.split('/'))
+                _extract_member(zf, info, dst + NEW_SUFFIX)
+                staged.append(dst)
+        except Exception:
+            for dst in staged:
+                try:
+                    os.remove(dst + NEW_SUFFIX)
+                except OSError:
+                    pass
+            raise
+
+        backup = self.backup_folder
+        _rmtree(backup)
+        os.makedirs(backup, exist_ok=True)
+        added = [rel for rel, _info, existed in to_write if not existed]
+        with open(os.path.join(backup, DELTA_MARKER), 'w', encoding='utf-8') as f:
+            json.dump({'added': added}, f, ensure_ascii=False)
+        moved = []
+        try:
+            for rel, _info, existed in to_write:
+                dst = os.path.join(self.winws_folder, *rel.split('/'))
+                if existed:
+                    saved = os.path.join(backup, *rel.split('/'))
+                    os.makedirs(os.path.dirname(saved), exist_ok=True)
+                    _rename_with_retry(dst, saved)
+                    moved.append(rel)
+                os.replace(dst + NEW_SUFFIX, dst)
+        except Exception:
+            # Возвращаем уже заменённые файлы и убираем недозаписанные
+            for rel in moved:
+                try:
+                    os.replace(os.path.join(backup, *rel.split('/')),
+                               os.path.join(self.winws_folder, *rel.split('/')))
+                except OSError:
+                    pass
+            for rel in added:
+                try:
+                    os.remove(os.path.join(self.winws_folder, *rel.split('/')))
+                except OSError:
+                    pass
+            for dst in staged:
+                try:
+                    os.remove(dst + NEW_SUFFIX)
+                except OSError:
+                    pass
+            _rmtree(backup)
+            raise
+
+    def _merge_current_into(self, staging):
+        """Применяет политику слияния: переносит в staging файлы из текущей установки."""
+        carried_over, preserved = [], []
+        if not os.path.isdir(self.winws_folder):
+            return {'carried_over': carried_over, 'preserved': preserved}
+        for rel in _walk_files(self.winws_folder):
+            src = os.path.join(self.winws_folder, *rel.split('/'))
+            dst = os.path.join(staging, *rel.split('/'))
+            exists = os.path.exists(dst)
+            if exists and not is_user_owned(rel):
+                continue  # файл из архива новее
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            shutil.copy2(src, dst)
+            (preserved if exists else carried_over).append(rel)
+        return {'carried_over': carried_over, 'preserved': preserved}
+
+    def _validate(self, staging):
+        """Проверяет собранную установку до подмены."""
+        if not any(name.endswith('.bat') for name in os.listdir(staging)):
+            raise InstallError('В собранной установке нет .bat файлов')
+        exe_rel = os.path.join('bin', 'winws.exe')
+        if os.path.isfile(os.path.join(self.winws_folder, exe_rel)) and \
+                not os.path.isfile(os.path.join(staging, exe_rel)):
+            raise InstallError('В собранной установке нет bin\\winws.exe')
+
+    def _swap(self, staging):
+        """Подменяет установку: winws -> winws_backup, staging -> winws."""
+        backup = self.backup_folder
+        had_current = os.path.isdir(self.winws_folder)
+        try:
+            with _SwapHooks():
+                if had_current:
+                    _rmtree(backup)
+                    _rename_with_retry(self.winws_folder, backup)
+                _rename_with_retry(staging, self.winws_folder)
+        except OSError as e:
+            # Возвращаем прежнюю установку на место
+            if had_current and not os.path.isdir(self.winws_folder) and os.path.isdir(backup):
+                try:
+                    os.rename(backup, self.winws_folder)
+                except OSError:
+                    pass
+            _rmtree(staging)
+            raise InstallError(f'Не удалось заменить папку winws: {e}') from e
+
+    def rollback(self):
+        """Возвращает предыдущую установку из winws_backup. True — откат выполнен."""
+        backup = self.backup_folder
+        if not os.path.isdir(backup):
+            return False
+        if os.path.isfile(os.path.join(backup, DELTA_MARKER)):
+            return self._rollback_delta(backup)
+        failed = f"{self.winws_folder}_failed"
+        _rmtree(failed)
+        with _SwapHooks():
+            if os.path.isdir(self.winws_folder):
+                _rename_with_retry(self.winws_folder, failed)
+            try:
+                _rename_with_retry(backup, self.winws_folder)
+            except OSError:
+                if os.path.isdir(failed):
+                    os.rename(failed, self.winws_folder)
+                raise
+        _rmtree(failed)
+        return True
+
+    def _rollback_delta(self, backup):
+        """Откат дельта-обновления: возвращает заменённые файлы и удаляет добавленные."""
+        marker = os.path.join(backup, DELTA_MARKER)
+        try:
+            with open(marker, 'r', encoding='utf-8') as f:
+                added = json.load(f).get('added') or []
+        except (OSError, ValueError, AttributeError):
+            added = []
+        for rel in _walk_files(backup):
+            if rel == DELTA_MARKER:
+                continue
+            dst = os.path.join(self.winws_folder, *rel.split('/'))
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            os.replace(os.path.join(backup, *rel.split('/')), dst)
+        for rel in added:
+            try:
+                os.remove(os.path.join(self.winws_folder, *rel.split('/')))
+            except OSError:
+                pass
+        _rmtree(backup)
+        return True
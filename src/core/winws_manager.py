@@ -2,15 +2,26 @@
 Модуль для управления настройками winws
 """
 import os
+from .list_cache import get_list_snapshot
 from .path_utils import get_winws_path
 
 
+SERVICE_IP = '203.0.113.113/32'
+
+
 class WinwsManager:
     """Класс для управления настройками winws"""
 
+    def __init__(self, winws_folder=None):
+        # Папка winws; по умолчанию — текущая из настроек (get_winws_path)
+        self._winws_folder = winws_folder
+        # Индексы записей списков: имя -> (сигнатура файла, set записей);
+        # перечитываются, только если файл изменился (mtime/размер)
+        self._entry_indexes = {}
+
     @property
     def winws_folder(self):
-        return get_winws_path()
+        return self._winws_folder or get_winws_path()
 
     @property
     def lists_folder(self):
@@ -51,79 +62,110 @@ class WinwsManager:
     
     # ========== IPSet Filter Management ==========
     
+    @property
+    def _ipset_paths(self):
+        """(живой список, припаркованный полный список, маркер режима) для ipset-all.txt"""
+        list_file = os.path.join(self.lists_folder, 'ipset-all.txt')
+        return list_file, list_file + '.backup', list_file + '.mode'
+    
+    def _detect_ipset_mode(self, list_file):
+        """Определяет режим по содержимому ipset-all.txt, читая не больше 64 байт"""
+        with open(list_file, 'rb') as f:
+            head = f.read(64)
+        content = head.decode('utf-8', errors='replace').strip()
+        if not content:
+            return 'any'
+        if content == SERVICE_IP:
+            return 'none'
+        return 'loaded'
+    
+    def _write_ipset_marker(self, mode, list_file, marker_file):
+        """Записывает маркер режима вместе с сигнатурой (размер, mtime) ipset-all.txt"""
+        try:
+            st = os.stat(list_file)
+            tmp_file = marker_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(f'{mode} {st.st_size} {st.st_mtime_ns}')
+            os.replace(tmp_file, marker_file)
+        except OSError:
+            pass
+    
     def get_ipset_mode(self):
         """Получает текущий режим IPSet Filter
         
+        Режим берётся из маркера ipset-all.txt.mode, если ipset-all.txt не менялся
+        с момента переключения; иначе (файл обновили или переключил service.bat)
+        определяется по первым байтам файла. Размер списка на время не влияет.
+        
         Returns:
             str: 'loaded', 'none', или 'any'
         """
-        list_file = os.path.join(self.lists_folder, 'ipset-all.txt')
-        
-        if not os.path.exists(list_file):
+        list_file, _backup_file, marker_file = self._ipset_paths
+        try:
+            st = os.stat(list_file)
+        except OSError:
             return 'loaded'  # По умолчанию
         
         try:
-            with open(list_file, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-            
-            line_count = len([line for line in content.split('\n') if line.strip()])
-            
-            if line_count == 0:
-                return 'any'
-            elif content == '203.0.113.113/32':
-                return 'none'
-            else:
-                return 'loaded'
-        except Exception:
+            with open(marker_file, 'r', encoding='utf-8') as f:
+                mode, size, mtime_ns = f.read().split()
+            if (int(size), int(mtime_ns)) == (st.st_size, st.st_mtime_ns) and mode in ('loaded', 'none', 'any'):
+                return mode
+        except (OSError, ValueError):
+            pass
+        
+        try:
+            mode = self._detect_ipset_mode(list_file)
+        except OSError:
             return 'loaded'
+        self._write_ipset_marker(mode, list_file, marker_file)
+        return mode
     
     def set_ipset_mode(self, mode):
         """Устанавливает режим IPSet Filter
         
+        Полный список паркуется в ipset-all.txt.backup (формат service.bat) и
+        возвращается обратно только переименованиями (os.replace); служебный
+        вариант ('none' — служебный IP, 'any' — пустой файл) готовится рядом
+        и атомарно подменяет ipset-all.txt. Содержимое полного списка не читается
+        и не копируется.
+        
         Args:
             mode: 'loaded', 'none', или 'any'
         """
-        list_file = os.path.join(self.lists_folder, 'ipset-all.txt')
-        backup_file = list_file + '.backup'
+        if mode not in ('loaded', 'none', 'any'):
+            raise ValueError(f'Unknown IPSet mode: {mode}')
+        list_file, backup_file, marker_file = self._ipset_paths
+        current = self.get_ipset_mode() if os.path.exists(list_file) else None
         
         if mode == 'loaded':
-            # Восстанавливаем из backup
-            if os.path.exists(backup_file):
-                if os.path.exists(list_file):
-                    os.remove(list_file)
-                os.rename(backup_file, list_file)
-            else:
+            if current == 'loaded':
+                return
+            # Возвращаем полный список на место
+            if not os.path.exists(backup_file):
                 raise Exception('Backup file not found. Update IPSet list first.')
-        
-        elif mode == 'none':
-            # Создаем backup если его нет и файл содержит реальные данные
-            if os.path.exists(list_file):
-                with open(list_file, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-                if content and content != '203.0.113.113/32':
-                    if not os.path.exists(backup_file):
-                        with open(backup_file, 'w', encoding='utf-8') as f:
-                            f.write(content)
-            
-            # Записываем служебный IP
-            with open(list_file, 'w', encoding='utf-8') as f:
-                f.write('203.0.113.113/32')
-        
-        elif mode == 'any':
-            # Создаем backup если его нет и файл содержит реальные данные
-            if os.path.exists(list_file):
-                with open(list_file, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-                if content and content != '203.0.113.113/32':
-                    if not os.path.exists(backup_file):
-                        with open(backup_file, 'w', encoding='utf-8') as f:
-                            f.write(content)
-            
-            # Делаем файл пустым
-            with open(list_file, 'w', encoding='utf-8') as f:
-                f.write('')
+            os.replace(backup_file, list_file)
         else:
-            raise ValueError(f'Unknown IPSet mode: {mode}')
+            variant_file = f'{list_file}.{mode}.tmp'
+            with open(variant_file, 'w', encoding='utf-8') as f:
+                f.write(SERVICE_IP if mode == 'none' else '')
+            try:
+                if current == 'loaded':
+                    # Паркуем полный список: жёсткая ссылка не оставляет момента без ipset-all.txt
+                    try:
+                        if os.path.exists(backup_file):
+                            os.remove(backup_file)
+                        os.link(list_file, backup_file)
+                    except OSError:
+                        os.replace(list_file, backup_file)
+                os.replace(variant_file, list_file)
+            except BaseException:
+                try:
+                    os.remove(variant_file)
+                except OSError:
+                    pass
+                raise
+        self._write_ipset_marker(mode, list_file, marker_file)
     
     # ========== Domain Lists Management ==========
     
@@ -136,17 +178,10 @@ class WinwsManager:
         Returns:
             list: Список доменов
         """
-        list_file = os.path.join(self.lists_folder, list_name)
-        
-        if not os.path.exists(list_file):
-            return []
-        
         try:
-            with open(list_file, 'r', encoding='utf-8') as f:
-                lines = [line.strip() for line in f.readlines()]
-                # Удаляем пустые строки и комментарии
-                domains = [line for line in lines if line and not line.startswith('#')]
-                return domains
+            snapshot = get_list_snapshot(os.path.join(self.lists_folder, list_name))
+            # Снимок list_cache уже без пустых строк и комментариев
+            return snapshot.entries() if snapshot is not None else []
         except Exception:
             return []
     
@@ -174,12 +209,7 @@ class WinwsManager:
             list_name: 'list-general.txt', 'list-google.txt', или 'list-exclude.txt'
             domain: Домен для добавления
         """
-        domains = self.get_domain_list(list_name)
-        domain = domain.strip()
-        
-        if domain and domain not in domains:
-            domains.append(domain)
-            self.save_domain_list(list_name, domains)
+        self.add_domains_to_list(list_name, [domain])
     
     def remove_domain_from_list(self, list_name, domain):
         """Удаляет домен из списка
@@ -188,12 +218,31 @@ class WinwsManager:
             list_name: 'list-general.txt', 'list-google.txt', или 'list-exclude.txt'
             domain: Домен для удаления
         """
-        domains = self.get_domain_list(list_name)
-        domain = domain.strip()
+        self.remove_domains_from_list(list_name, [domain])
+    
+    def add_domains_to_list(self, list_name, domains):
+        """Добавляет домены в список пакетом (новые записи дописываются в конец файла)
+        
+        Args:
+            list_name: 'list-general.txt', 'list-google.txt', или 'list-exclude.txt'
+            domains: итерируемый набор доменов
         
-        if domain in domains:
-            domains.remove(domain)
-            self.save_domain_list(list_name, domains)
+        Returns:
+            int: Сколько доменов добавлено
+        """
+        return self._add_entries(list_name, domains)
+    
+    def remove_domains_from_list(self, list_name, domains):
+        """Удаляет домены из списка пакетом (файл перезаписывается один раз)
+        
+        Args:
+            list_name: 'list-general.txt', 'list-google.txt', или 'list-exclude.txt'
+            domains: итерируемый набор доменов
+        
+        Returns:
+            int: Сколько доменов удалено
+        """
+        return self._remove_entries(list_name, domains)
     
     # ========== IPSet Lists Management ==========
     
@@ -206,17 +255,10 @@ class WinwsManager:
         Returns:
             list: Список IP адресов в формате CIDR
         """
-        list_file = os.path.join(self.lists_folder, list_name)
-        
-        if not os.path.exists(list_file):
-            return []
-        
         try:
-            with open(list_file, 'r', encoding='utf-8') as f:
-                lines = [line.strip() for line in f.readlines()]
-                # Удаляем пустые строки и комментарии
-                ips = [line for line in lines if line and not line.startswith('#')]
-                return ips
+            snapshot = get_list_snapshot(os.path.join(self.lists_folder, list_name))
+            # Снимок list_cache уже без пустых строк и комментариев
+            return snapshot.entries() if snapshot is not None else []
         except Exception:
             return []
     
@@ -244,16 +286,7 @@ class WinwsManager:
             list_name: 'ipset-all.txt' или 'ipset-exclude.txt'
             ip: IP адрес в формате CIDR
         """
-        # Не добавляем служебный IP для ipset-all.txt
-        if list_name == 'ipset-all.txt' and ip == '203.0.113.113/32':
-            return
-        
-        ips = self.get_ipset_list(list_name)
-        ip = ip.strip()
-        
-        if ip and ip not in ips:
-            ips.append(ip)
-            self.save_ipset_list(list_name, ips)
+        self.add_ips_to_list(list_name, [ip])
     
     def remove_ip_from_list(self, list_name, ip):
         """Удаляет IP адрес из списка
@@ -262,44 +295,111 @@ class WinwsManager:
             list_name: 'ipset-all.txt' или 'ipset-exclude.txt'
             ip: IP адрес для удаления
         """
-        ips = self.get_ipset_list(list_name)
-        ip = ip.strip()
+        self.remove_ips_from_list(list_name, [ip])
+    
+    def add_ips_to_list(self, list_name, ips):
+        """Добавляет IP адреса в список пакетом (новые записи дописываются в конец файла)
         
-        if ip in ips:
-            ips.remove(ip)
-            self.save_ipset_list(list_name, ips)
+        Args:
+            list_name: 'ipset-all.txt' или 'ipset-exclude.txt'
+            ips: итерируемый набор IP адресов в формате CIDR
+        
+        Returns:
+            int: Сколько адресов добавлено
+        """
+        if list_name == 'ipset-all.txt':
+            # Не добавляем служебный IP для ipset-all.txt
+            ips = (ip for ip in ips if ip.strip() != SERVICE_IP)
+        return self._add_entries(list_name, ips)
     
-    def validate_cidr(self, cidr):
-        """Проверяет корректность CIDR адреса
+    def remove_ips_from_list(self, list_name, ips):
+        """Удаляет IP адреса из списка пакетом (файл перезаписывается один раз)
         
         Args:
-            cidr: IP адрес в формате CIDR
+            list_name: 'ipset-all.txt' или 'ipset-exclude.txt'
+            ips: итерируемый набор IP адресов
         
         Returns:
-            bool: True если корректный, False иначе
+            int: Сколько адресов удалено
         """
-        import re
-        # Простая проверка формата CIDR
-        pattern = r'^(\d{1,3}\.){3}\d{1,3}(/\d{1,2})?$'
-        if not re.match(pattern, cidr):
-            return False
+        return self._remove_entries(list_name, ips)
+    
+    # ========== Batch List Mutation ==========
+    
+    @staticmethod
+    def _file_signature(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+    
+    def _entry_index(self, list_name):
+        """set записей списка (без пустых строк и комментариев); перечитывается только при изменении файла."""
+        list_file = os.path.join(self.lists_folder, list_name)
+        signature = self._file_signature(list_file)
+        cached = self._entry_indexes.get(list_name)
+        if cached and cached[0] == signature:
+            return cached[1]
+        snapshot = get_list_snapshot(list_file) if signature is not None else None
+        entries = set(snapshot.entries()) if snapshot is not None else set()
+        self._entry_indexes[list_name] = (signature, entries)
+        return entries
+    
+    def _add_entries(self, list_name, values):
+        """Дописывает в конец списка записи, которых в нём ещё нет; файл не перезаписывается."""
+        entries = self._entry_index(list_name)
+        new = {}
+        for value in values:
+            value = value.strip()
+            if value and not value.startswith('#') and value not in entries:
+                new[value] = None
+        if not new:
+            return 0
         
-        parts = cidr.split('/')
-        ip_parts = parts[0].split('.')
+        list_file = os.path.join(self.lists_folder, list_name)
+        os.makedirs(self.lists_folder, exist_ok=True)
+        prefix = ''
+        if os.path.exists(list_file) and os.path.getsize(list_file):
+            with open(list_file, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) not in (b'\n', b'\r'):
+                    prefix = '\n'
+        with open(list_file, 'a', encoding='utf-8') as f:
+            f.write(prefix + '\n'.join(new) + '\n')
+        entries.update(new)
+        self._entry_indexes[list_name] = (self._file_signature(list_file), entries)
+        return len(new)
+    
+    def _remove_entries(self, list_name, values):
+        """Удаляет записи из списка одной перезаписью файла (комментарии и порядок сохраняются)."""
+        entries = self._entry_index(list_name)
+        targets = {value.strip() for value in values} & entries
+        if not targets:
+            return 0
         
-        # Проверяем диапазон октетов
-        for part in ip_parts:
-            num = int(part)
-            if num < 0 or num > 255:
-                return False
+        list_file = os.path.join(self.lists_folder, list_name)
+        with open(list_file, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+        tmp_file = list_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.writelines(line for line in lines if line.strip() not in targets)
+        os.replace(tmp_file, list_file)
+        entries -= targets
+        self._entry_indexes[list_name] = (self._file_signature(list_file), entries)
+        return len(targets)
+    
+    def validate_cidr(self, cidr):
+        """Проверяет корректность CIDR адреса (IPv4 или IPv6)
         
-        # Проверяем маску если указана
-        if len(parts) == 2:
-            mask = int(parts[1])
-            if mask < 0 or mask > 32:
-                return False
+        Args:
+            cidr: IP адрес в формате CIDR
         
-        return True
+        Returns:
+            bool: True если корректный, False иначе
+        """
+        from .ipset_engine import is_valid_cidr
+        return is_valid_cidr(cidr.strip())
     
     def validate_domain(self, domain):
         """Проверяет корректность домена
@@ -310,9 +410,9 @@ class WinwsManager:
         Returns:
             bool: True если корректный, False иначе
         """
-        import re
-        # Простая проверка домена
-        pattern = r'^([a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?\.)+[a-zA-Z]{2,}$'
-        return bool(re.match(pattern, domain))
+        from .domain_normalize import is_valid_domain, to_ascii
+        # Регистр не важен, IDN проверяется в punycode
+        ascii_domain = to_ascii(domain)
+        return bool(ascii_domain) and is_valid_domain(ascii_domain)
 
 
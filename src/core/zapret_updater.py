@@ -1,21 +1,47 @@
 import os
-import requests
-import zipfile
-import shutil
 from pathlib import Path
 import json
 from .path_utils import get_winws_path, get_base_path
 from .config_manager import ConfigManager
 
 
+DEFAULT_GITHUB_REPO = "Flowseal/zapret-discord-youtube"
+
+
+def resolve_github_repo(repo_setting):
+    """Приводит настройку zapret_repo (slug owner/repo или полный GitHub URL) к виду owner/repo.
+
+    Пустое или некорректное значение заменяется репозиторием по умолчанию.
+    Не требует создания ZapretUpdater — используется главным окном до первого обращения к апдейтеру.
+    """
+    repo_setting = (repo_setting or "").strip()
+    # Поддерживаем как slug owner/repo, так и полный GitHub URL
+    if repo_setting.lower().startswith("http://") or repo_setting.lower().startswith("https://"):
+        # Пример: https://github.com/Flowseal/zapret-discord-youtube[/...]
+        try:
+            from urllib.parse import urlparse
+            parsed = urlparse(repo_setting)
+            path = (parsed.path or "").strip("/ ")
+            # Берём первые два сегмента пути (owner/repo)
+            parts = path.split("/")
+            if len(parts) >= 2:
+                repo_setting = f"{parts[0]}/{parts[1]}"
+            else:
+                repo_setting = ""
+        except Exception:
+            repo_setting = ""
+    return repo_setting or DEFAULT_GITHUB_REPO
+
+
 class ZapretUpdater:
     """Класс для проверки и обновления стратегий zapret"""
     
-    GITHUB_REPO = "Flowseal/zapret-discord-youtube"  # значение по умолчанию
+    GITHUB_REPO = DEFAULT_GITHUB_REPO  # значение по умолчанию
     
     def __init__(self):
         # Получаем пути динамически
         self.WINWS_FOLDER = get_winws_path()
+        self.last_install_result = None  # итог последней установки (см. WinwsInstaller.install_zip)
         self.config_manager = ConfigManager()
         # Репозиторий можно переопределить в настройках (app.zapret_repo)
         repo_setting = ""
@@ -23,24 +49,7 @@ class ZapretUpdater:
             repo_setting = (self.config_manager.get_setting("zapret_repo", "") or "").strip()
         except Exception:
             repo_setting = ""
-        # Поддерживаем как slug owner/repo, так и полный GitHub URL
-        if repo_setting.lower().startswith("http://") or repo_setting.lower().startswith("https://"):
-            # Пример: https://github.com/Flowseal/zapret-discord-youtube[/...]
-            try:
-                from urllib.parse import urlparse
-                parsed = urlparse(repo_setting)
-                path = (parsed.path or "").strip("/ ")
-                # Берём первые два сегмента пути (owner/repo)
-                parts = path.split("/")
-                if len(parts) >= 2:
-                    repo_setting = f"{parts[0]}/{parts[1]}"
-                else:
-                    repo_setting = ""
-            except Exception:
-                repo_setting = ""
-        if not repo_setting:
-            repo_setting = self.GITHUB_REPO
-        self.github_repo = repo_setting
+        self.github_repo = resolve_github_repo(repo_setting)
         self.github_api_url = f"https://api.github.com/repos/{self.github_repo}/releases/latest"
         # Синхронизируем версию zapret в конфиге с значением из service.bat
         self._sync_zapret_version_with_service()
@@ -104,25 +113,25 @@ class ZapretUpdater:
     
     def check_for_updates(self):
         """Проверяет наличие обновлений на GitHub"""
+        import requests
+        from .http_client import get_http_client, find_release_asset
+        from .downloader import sha256_from_digest
         try:
-            response = requests.get(self.github_api_url, timeout=10)
-            response.raise_for_status()
-            release_data = response.json()
+            # Условный запрос: при неизменном релизе GitHub отвечает 304, данные берутся из кэша
+            release_data = get_http_client().get_json(self.github_api_url, timeout=10)
             
             latest_version = release_data.get('tag_name', '').lstrip('v')
-            download_url = None
             
             # Ищем zip архив для скачивания
-            for asset in release_data.get('assets', []):
-                if asset.get('name', '').endswith('.zip'):
-                    download_url = asset.get('browser_download_url')
-                    break
+            asset = find_release_asset(release_data, '.zip')
+            download_url = asset.get('browser_download_url') if asset else None
             
             return {
                 'has_update': latest_version != self.current_version,
                 'latest_version': latest_version,
                 'current_version': self.current_version,
                 'download_url': download_url,
+                'sha256': sha256_from_digest(asset.get('digest')) if asset else None,
                 'release_url': release_data.get('html_url', ''),
                 'release_notes': release_data.get('body', '')
             }
@@ -137,28 +146,17 @@ class ZapretUpdater:
                 'error': f'Неожиданная ошибка: {str(e)}'
             }
     
-    def download_update(self, download_url, progress_callback=None):
-        """Скачивает обновление"""
+    def download_update(self, download_url, progress_callback=None, expected_sha256=None):
+        """Скачивает обновление (с докачкой и проверкой SHA-256, если она известна)"""
+        from .downloader import download_file
         try:
-            response = requests.get(download_url, stream=True, timeout=30)
-            response.raise_for_status()
-            
             # Создаем временную папку для загрузки
             temp_dir = os.path.join(os.path.dirname(self.WINWS_FOLDER), 'temp_update')
             os.makedirs(temp_dir, exist_ok=True)
             
             zip_path = os.path.join(temp_dir, 'update.zip')
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded = 0
-            
-            with open(zip_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        if progress_callback and total_size > 0:
-                            progress = (downloaded / total_size) * 100
-                            progress_callback(progress)
+            download_file(download_url, zip_path, progress_callback=progress_callback,
+                          expected_sha256=expected_sha256)
             
             return zip_path
         except Exception as e:
@@ -169,9 +167,6 @@ class ZapretUpdater:
         self._do_extract_and_merge(zip_path)
         # Очистка временных файлов
         try:
-            temp_extract = os.path.join(os.path.dirname(self.WINWS_FOLDER), 'temp_extract')
-            if os.path.exists(temp_extract):
-                shutil.rmtree(temp_extract)
             if os.path.exists(zip_path):
                 os.remove(zip_path)
             temp_dir = os.path.dirname(zip_path)
@@ -183,160 +178,41 @@ class ZapretUpdater:
         except Exception:
             pass
 
-    def _do_extract_and_merge(self, zip_path):
-        """Внутренняя логика: резервная копия, распаковка, слияние в winws."""
-        import time
-        backup_folder = None
-        temp_extract = os.path.join(os.path.dirname(self.WINWS_FOLDER), 'temp_extract')
-        try:
-            backup_folder = f"{self.WINWS_FOLDER}_backup"
-            if os.path.exists(self.WINWS_FOLDER):
-                if os.path.exists(backup_folder):
-                    shutil.rmtree(backup_folder)
-                shutil.copytree(self.WINWS_FOLDER, backup_folder)
-            
-            if os.path.exists(temp_extract):
-                shutil.rmtree(temp_extract)
-            os.makedirs(temp_extract, exist_ok=True)
-            
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_extract)
-            
-            # Ищем .bat файлы в распакованном архиве
-            # Проверяем несколько возможных мест:
-            # 1. Прямо в корне архива
-            # 2. В папке winws
-            # 3. В любой другой папке
-            
-            winws_source = None
-            bat_files_found = []
-            
-            # Сначала ищем папку winws
-            for root, dirs, files in os.walk(temp_extract):
-                if 'winws' in dirs:
-                    winws_source = os.path.join(root, 'winws')
-                    break
-            
-            # Если папки winws нет, ищем .bat файлы напрямую
-            if not winws_source:
-                for root, dirs, files in os.walk(temp_extract):
-                    for file in files:
-                        if file.endswith('.bat'):
-                            bat_files_found.append((root, file))
-            
-            # Если нашли .bat файлы, но нет папки winws, создаем структуру
-            if bat_files_found and not winws_source:
-                # Определяем общую папку для всех .bat файлов
-                if len(bat_files_found) > 0:
-                    # Берем первую найденную папку как источник
-                    first_bat_dir = bat_files_found[0][0]
-                    # Проверяем, все ли .bat файлы в одной папке
-                    all_same_dir = all(dir_path == first_bat_dir for dir_path, _ in bat_files_found)
-                    if all_same_dir:
-                        winws_source = first_bat_dir
-                    else:
-                        # Если .bat файлы в разных папках, используем корень архива
-                        winws_source = temp_extract
-            
-            # Если все еще не нашли, используем корень распакованного архива
-            if not winws_source:
-                # Проверяем, есть ли .bat файлы в корне
-                root_files = os.listdir(temp_extract)
-                bat_in_root = [f for f in root_files if f.endswith('.bat')]
-                if bat_in_root:
-                    winws_source = temp_extract
-                else:
-                    # Ищем любую папку с .bat файлами
-                    for root, dirs, files in os.walk(temp_extract):
-                        bat_files = [f for f in files if f.endswith('.bat')]
-                        if bat_files:
-                            winws_source = root
-                            break
-            
-            if not winws_source:
-                raise Exception('Не найдены .bat файлы в архиве')
-            
-            # Ждем немного, чтобы убедиться, что все процессы завершились
-            import time
-            time.sleep(2)
-            
-            # Обновляем файлы по одному, не удаляя всю папку
-            if os.path.isdir(winws_source):
-                # Создаем список всех файлов и папок для обновления
-                items_to_update = []
-                for root, dirs, files in os.walk(winws_source):
-                    # Добавляем файлы
-                    for file in files:
-                        rel_path = os.path.relpath(os.path.join(root, file), winws_source)
-                        items_to_update.append(('file', rel_path, os.path.join(root, file)))
-                    # Добавляем папки
-                    for dir_name in dirs:
-                        rel_path = os.path.relpath(os.path.join(root, dir_name), winws_source)
-                        items_to_update.append(('dir', rel_path, os.path.join(root, dir_name)))
-                
-                # Создаем папку winws если её нет
-                os.makedirs(self.WINWS_FOLDER, exist_ok=True)
-                
-                # Обновляем файлы и папки
-                for item_type, rel_path, src_path in items_to_update:
-                    dst_path = os.path.join(self.WINWS_FOLDER, rel_path)
-                    
-                    # Создаем родительские папки если нужно
-                    parent_dir = os.path.dirname(dst_path)
-                    if parent_dir:
-                        os.makedirs(parent_dir, exist_ok=True)
-                    
-                    try:
-                        if item_type == 'dir':
-                            # Если папка существует, удаляем её
-                            if os.path.exists(dst_path):
-                                for attempt in range(5):
-                                    try:
-                                        shutil.rmtree(dst_path)
-                                        break
-                                    except (PermissionError, OSError):
-                                        if attempt < 4:
-                                            time.sleep(0.5)
-                                        else:
-                                            raise
-                            shutil.copytree(src_path, dst_path)
-                        else:
-                            # Если файл существует, удаляем его
-                            if os.path.exists(dst_path):
-                                # Пробуем удалить несколько раз с задержкой
-                                for attempt in range(5):
-                                    try:
-                                        os.remove(dst_path)
-                                        break
-                                    except (PermissionError, OSError):
-                                        if attempt < 4:
-                                            time.sleep(0.5)
-                                        else:
-                                            raise
-                            shutil.copy2(src_path, dst_path)
-                    except (PermissionError, OSError) as e:
-                        # Если не удалось обновить файл, пропускаем его
-                        print(f"Не удалось обновить {rel_path}: {e}")
-                        continue
-            else:
-                raise Exception('Источник для копирования не найден')
-        except Exception as e:
-            # Восстанавливаем из резервной копии при ошибке
-            if backup_folder and os.path.exists(backup_folder):
-                if os.path.exists(self.WINWS_FOLDER):
-                    shutil.rmtree(self.WINWS_FOLDER)
-                shutil.copytree(backup_folder, self.WINWS_FOLDER)
-            raise Exception(f'Ошибка при обновлении: {str(e)}')
+    def _do_extract_and_merge(self, zip_path, release=False):
+        """Устанавливает архив в winws через WinwsInstaller.
+
+        release=True — релиз zapret: при сохранённом манифесте прошлого релиза пишутся только
+        файлы, отличающиеся от архива. Предыдущая установка (или заменённые файлы) остаётся
+        в winws_backup; файлы пользователя сохраняются. Итог установки — в last_install_result.
+        """
+        from .winws_installer import WinwsInstaller
+        self.last_install_result = WinwsInstaller(self.WINWS_FOLDER).install_zip(zip_path, release=release)
+        return self.last_install_result
+
+    def can_rollback(self):
+        """Есть ли предыдущая установка (winws_backup), к которой можно откатиться."""
+        from .winws_installer import WinwsInstaller
+        return WinwsInstaller(self.WINWS_FOLDER).has_backup()
+
+    def rollback_update(self):
+        """Откатывает последнюю установку из winws_backup и синхронизирует версию с service.bat.
+
+        Returns:
+            bool: True, если откат выполнен
+        """
+        from .winws_installer import WinwsInstaller
+        if not WinwsInstaller(self.WINWS_FOLDER).rollback():
+            return False
+        self._sync_zapret_version_with_service()
+        self.current_version = self.get_current_version()
+        return True
 
     def extract_and_update(self, zip_path, version):
         """Распаковывает архив и обновляет файлы в winws, сохраняет версию."""
-        self._do_extract_and_merge(zip_path)
+        self._do_extract_and_merge(zip_path, release=True)
         self.save_version(version)
         self.current_version = version
         try:
-            temp_extract = os.path.join(os.path.dirname(self.WINWS_FOLDER), 'temp_extract')
-            if os.path.exists(temp_extract):
-                shutil.rmtree(temp_extract)
             if os.path.exists(zip_path):
                 os.remove(zip_path)
             if os.path.exists(os.path.dirname(zip_path)):
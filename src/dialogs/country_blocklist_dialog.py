@@ -3,8 +3,6 @@
 """
 
 import os
-import re
-from urllib.parse import urlparse
 
 from PyQt6.QtWidgets import *
 from PyQt6.QtCore import Qt, QTimer
@@ -14,6 +12,7 @@ from src.widgets.custom_combobox import CustomComboBox
 from src.widgets.custom_checkbox import CustomCheckBox
 from src.widgets.custom_context_widgets import ContextLineEdit, ContextSpinBox
 from src.core.path_utils import get_winws_path
+from src.core.ooni_client import fetch_country_domains
 
 try:
     import requests
@@ -46,70 +45,16 @@ COUNTRIES = [
 ]
 
 
-def _domain_from_url(url):
-    """Извлекает домен из URL."""
-    if not url or not isinstance(url, str) or not url.strip():
-        return None
-    url = url.strip().lower()
-    if url.startswith('http://') or url.startswith('https://'):
-        try:
-            parsed = urlparse(url)
-            host = parsed.netloc
-            if host and ':' in host:
-                host = host.split(':')[0]
-            return host if host else None
-        except Exception:
-            return None
-    if url.startswith('stun://') or url.startswith('stun:'):
-        # stun://host:port -> host
-        m = re.match(r'stun:[/]*([^:/]+)', url, re.I)
-        return m.group(1) if m else None
-    return None
-
-
 def fetch_blocked_domains(country_code, limit=1000, confirmed_only=False):
     """
-    Загружает список заблокированных доменов для страны через OONI API.
+    Загружает список заблокированных доменов для страны через OONI API
+    (параллельно, с кэшем по стране и дозагрузкой только новых измерений).
     Возвращает (domains_set, error_message).
     """
     if not requests:
         return set(), 'Модуль requests не установлен'
-    
-    seen = set()
-    next_url = (
-        f'https://api.ooni.io/api/v1/measurements'
-        f'?probe_cc={country_code}'
-        f'&anomaly=true'
-        f'&test_name=web_connectivity'
-        f'&limit=100'
-    )
-    if confirmed_only:
-        next_url += '&confirmed=true'
-    
-    fetched = 0
-    while next_url and fetched < limit:
-        try:
-            r = requests.get(next_url, timeout=30)
-            r.raise_for_status()
-            data = r.json()
-        except Exception as e:
-            return seen, str(e)
-        
-        results = data.get('results') or []
-        for m in results:
-            inp = m.get('input')
-            domain = _domain_from_url(inp)
-            if domain and domain not in seen and '.' in domain:
-                seen.add(domain)
-                fetched += 1
-                if fetched >= limit:
-                    break
-        
-        next_url = data.get('metadata', {}).get('next_url')
-        if not results and not next_url:
-            break
-    
-    return seen, None
+    domains, error = fetch_country_domains(country_code, limit, confirmed_only)
+    return set(domains), error
 
 
 class CountryBlocklistDialog(QDialog):
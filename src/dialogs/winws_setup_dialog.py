@@ -14,6 +14,7 @@ from src.dialogs.vs_update_dialog import VSUpdateDialog
 from src.core.translator import tr
 from src.core.config_manager import ConfigManager
 from src.core.path_utils import get_winws_path
+from src.core import bat_transforms
 from src.core.embedded_assets import get_app_icon
 from src.ui import theme
 
@@ -201,7 +202,9 @@ class WinwsSetupDialog(StandardDialog):
                 QApplication.processEvents()
 
             update_dialog.set_status(tr("update_downloading", lang))
-            zip_path = updater.download_update(download_url, progress_callback=progress_cb)
+            zip_path = updater.download_update(
+                download_url, progress_callback=progress_cb, expected_sha256=info.get("sha256")
+            )
 
             update_dialog.set_status(tr("update_installing", lang))
             update_dialog.set_progress(90)
@@ -216,61 +219,13 @@ class WinwsSetupDialog(StandardDialog):
             except Exception:
                 settings = {}
 
+            # Все правки (/B, check_updates, regex-правила) — за один проход по .bat
             winws_folder = get_winws_path()
-
-            # Авто-добавление /B
-            if settings.get("add_b_flag_on_update", False) and os.path.isdir(winws_folder):
-                try:
-                    bat_files = [
-                        f for f in os.listdir(winws_folder)
-                        if f.lower().endswith(".bat")
-                        and os.path.isfile(os.path.join(winws_folder, f))
-                    ]
-                    old_string = 'start "zapret: %~n0" /min'
-                    new_string = 'start "zapret: %~n0" /B /min'
-                    for filename in bat_files:
-                        file_path = os.path.join(winws_folder, filename)
-                        try:
-                            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                                content = f.read()
-                            if old_string in content:
-                                new_content = content.replace(old_string, new_string)
-                                with open(file_path, "w", encoding="utf-8") as f:
-                                    f.write(new_content)
-                        except Exception:
-                            continue
-                except Exception:
-                    pass
-
-            # Авто-удаление check_updates
-            if settings.get("remove_check_updates", False) and os.path.isdir(winws_folder):
+            if os.path.isdir(winws_folder):
                 try:
-                    bat_files = [
-                        f for f in os.listdir(winws_folder)
-                        if f.lower().endswith(".bat")
-                        and os.path.isfile(os.path.join(winws_folder, f))
-                    ]
-                    for filename in bat_files:
-                        file_path = os.path.join(winws_folder, filename)
-                        try:
-                            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                                lines = f.readlines()
-                            new_lines = []
-                            modified = False
-                            for line in lines:
-                                stripped = line.strip().lower()
-                                if (
-                                    stripped == "call service.bat check_updates"
-                                    or "call service.bat check_updates" in stripped
-                                ):
-                                    modified = True
-                                    continue
-                                new_lines.append(line)
-                            if modified:
-                                with open(file_path, "w", encoding="utf-8") as f:
-                                    f.writelines(new_lines)
-                        except Exception:
-                            continue
+                    bat_transforms.apply_transforms(
+                        winws_folder, bat_transforms.update_transforms(settings)
+                    )
                 except Exception:
                     pass
 
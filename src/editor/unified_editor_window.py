@@ -4,8 +4,10 @@ QTabWidget, в каждой вкладке: QLineEdit (поиск), QListWidget,
 """
 
 import os
+import re
 import subprocess
 import locale
+import threading
 from pathlib import Path
 from PyQt6.QtWidgets import *
 from PyQt6.QtCore import *
@@ -45,9 +47,62 @@ def get_bat_files(winws_folder):
     return bat_files
 
 
+class _ListConflictWorker(QThread):
+    """Фоновый инкрементальный поиск конфликтов между списками (ListConflictAnalyzer.refresh)."""
+    done_signal = pyqtSignal(object, str)  # conflicts, error_message
+
+    def __init__(self, analyzer):
+        super().__init__()
+        self._analyzer = analyzer
+
+    def run(self):
+        try:
+            self.done_signal.emit(self._analyzer.refresh(), '')
+        except Exception as e:
+            self.done_signal.emit(None, str(e))
+
+
+# Имя файла, в который можно сохранить ipset из доменов (ipset-all.txt ведёт WinwsManager)
+_RESOLVE_IPSET_NAME_RE = re.compile(r'ipset-[\w.-]+\.txt', re.IGNORECASE)
+# Сколько ждать остановки разрешения доменов при закрытии окна (мс)
+RESOLVE_STOP_TIMEOUT_MS = 3000
+# Воркеры, не успевшие остановиться до закрытия окна (держим ссылки до завершения)
+_detached_workers = set()
+
+
+class _ResolveIpsetWorker(QThread):
+    """Фоновое разрешение доменов hostlist и запись ipset (dns_resolver.build_ipset_from_domains)."""
+    progress_signal = pyqtSignal(int, int)  # done, total
+    done_signal = pyqtSignal(object, str)  # stats (None и пустая ошибка — отменено), error_message
+
+    def __init__(self, domains, target_path):
+        super().__init__()
+        self._domains = domains
+        self._target_path = target_path
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def run(self):
+        from src.core.dns_resolver import ResolveCancelled, build_ipset_from_domains
+        try:
+            stats = build_ipset_from_domains(self._domains, self._target_path,
+                                             on_progress=self.progress_signal.emit,
+                                             cancel_event=self._cancel_event)
+            self.done_signal.emit(stats, '')
+        except ResolveCancelled:
+            self.done_signal.emit(None, '')
+        except Exception as e:
+            self.done_signal.emit(None, str(e))
+
+
 class EditorTabContent(QWidget):
     """Одна вкладка: фильтр (QLineEdit), список файлов (QListWidget), редактор (QPlainTextEdit) в QSplitter."""
     
+    # Файлы папки вкладки изменились (сохранение, правка извне, добавление/удаление)
+    files_changed = pyqtSignal()
+    
     def __init__(self, parent, folder, file_names, language='ru', is_lists_tab=False, tab_kind='lists'):
         super().__init__(parent)
         self.folder = folder
@@ -58,6 +113,7 @@ class EditorTabContent(QWidget):
         self._current_file = self.file_names[0] if self.file_names else ''
         self.is_saving = False
         self.file_watcher = QFileSystemWatcher(self)
+        self._suspended_watch_paths = []  # пути, снятые с наблюдения на время подмены папки winws
         self.save_timer = QTimer(self)
         self.save_timer.setSingleShot(True)
         self.save_timer.timeout.connect(self.auto_save_file)
@@ -245,8 +301,23 @@ QListWidget::item:selected:!active {{ background-color: {p.accent}; color: #ffff
         self._dir_refresh_timer.setSingleShot(True)
         self._dir_refresh_timer.timeout.connect(self._refresh_file_list_from_disk)
     
+    def suspend_watching(self):
+        """Снимает наблюдение за папкой вкладки и её файлами (на время подмены папки winws)."""
+        self._suspended_watch_paths = self.file_watcher.directories() + self.file_watcher.files()
+        if self._suspended_watch_paths:
+            self.file_watcher.removePaths(self._suspended_watch_paths)
+    
+    def resume_watching(self):
+        """Возвращает наблюдение, снятое suspend_watching, и перечитывает список файлов."""
+        paths = [p for p in self._suspended_watch_paths if os.path.exists(p)]
+        self._suspended_watch_paths = []
+        if paths:
+            self.file_watcher.addPaths(paths)
+        self._on_directory_changed()
+    
     def _on_directory_changed(self):
         """Папка изменилась — обновляем список файлов с небольшой задержкой (debounce)."""
+        self.files_changed.emit()
         self._dir_refresh_timer.stop()
         self._dir_refresh_timer.start(300)
 
@@ -497,6 +568,7 @@ QListWidget::item:selected:!active {{ background-color: {p.accent}; color: #ffff
                     pass
             self.editor.document().setModified(False)
             self.save_timer.stop()
+            self.files_changed.emit()
             self._last_status = tr('targets_saved', self.language)
             self._push_status()
             self._on_editor_cursor_changed()
@@ -568,6 +640,7 @@ QListWidget::item:selected:!active {{ background-color: {p.accent}; color: #ffff
     def on_file_changed_externally(self, path):
         if self.is_saving:
             return
+        self.files_changed.emit()
         if path == self.get_current_file_path():
             self.save_timer.stop()
             self.load_current_file()
@@ -870,6 +943,21 @@ class UnifiedEditorWindow(StandardDialog):
         self._update_breadcrumb()
         self._update_window_title()
         
+        # Конфликты между включающими и исключающими списками: индекс обновляется в фоне
+        # при изменениях в папке lists (перечитываются только изменённые файлы)
+        from src.core.list_conflicts import ListConflictAnalyzer
+        self._conflict_analyzer = ListConflictAnalyzer(lists_folder)
+        self._resolve_worker = None
+        self._list_conflicts = None
+        self._conflict_worker = None
+        self._conflict_rescan_pending = False
+        self._conflict_show_pending = False
+        self._conflict_timer = QTimer(self)
+        self._conflict_timer.setSingleShot(True)
+        self._conflict_timer.timeout.connect(self._start_conflict_scan)
+        self.tab_lists.files_changed.connect(lambda: self._conflict_timer.start(500))
+        self._conflict_timer.start(500)
+        
         self.menu_bar = QMenuBar()
         
         # Файл
@@ -1110,6 +1198,30 @@ class UnifiedEditorWindow(StandardDialog):
         self.action_country_blocklist.triggered.connect(self.show_country_blocklist)
         tools_menu.addAction(self.action_country_blocklist)
         
+        self.action_optimize_ipset = QAction(tr('editor_optimize_ipset', self.language), self)
+        self.action_optimize_ipset.triggered.connect(self.optimize_ipset_action)
+        tools_menu.addAction(self.action_optimize_ipset)
+        
+        self.action_optimize_hostlist = QAction(tr('editor_optimize_hostlist', self.language), self)
+        self.action_optimize_hostlist.triggered.connect(self.optimize_hostlist_action)
+        tools_menu.addAction(self.action_optimize_hostlist)
+        
+        self.action_normalize_hostlist = QAction(tr('editor_normalize_hostlist', self.language), self)
+        self.action_normalize_hostlist.triggered.connect(self.normalize_hostlist_action)
+        tools_menu.addAction(self.action_normalize_hostlist)
+        
+        self.action_resolve_ipset = QAction(tr('editor_resolve_ipset', self.language), self)
+        self.action_resolve_ipset.triggered.connect(self.resolve_ipset_action)
+        tools_menu.addAction(self.action_resolve_ipset)
+        
+        self.action_list_conflicts = QAction(tr('editor_list_conflicts', self.language), self)
+        self.action_list_conflicts.triggered.connect(self.list_conflicts_action)
+        tools_menu.addAction(self.action_list_conflicts)
+        
+        self.action_lookup_ip = QAction(tr('editor_lookup_ip', self.language), self)
+        self.action_lookup_ip.triggered.connect(self.lookup_ip_action)
+        tools_menu.addAction(self.action_lookup_ip)
+        
         self.action_format_document = QAction(tr('editor_format_document', self.language), self)
         self.action_format_document.setShortcut(QKeySequence("Shift+Alt+F"))
         self.action_format_document.triggered.connect(self.format_document_action)
@@ -1338,6 +1450,14 @@ class UnifiedEditorWindow(StandardDialog):
                 elif stripped:  # не пустая строка
                     can_comment = True
             block = block.next()
+        if hasattr(self, 'action_optimize_ipset'):
+            self.action_optimize_ipset.setEnabled(self._is_ipset_tab(tab))
+        if hasattr(self, 'action_optimize_hostlist'):
+            self.action_optimize_hostlist.setEnabled(self._is_hostlist_tab(tab))
+        if hasattr(self, 'action_normalize_hostlist'):
+            self.action_normalize_hostlist.setEnabled(self._is_hostlist_tab(tab))
+        if hasattr(self, 'action_resolve_ipset'):
+            self.action_resolve_ipset.setEnabled(self._is_hostlist_tab(tab) and self._resolve_worker is None)
         if hasattr(self, 'action_comment'):
             self.action_comment.setEnabled(can_comment)
         if hasattr(self, 'action_uncomment'):
@@ -2177,6 +2297,251 @@ class UnifiedEditorWindow(StandardDialog):
             cursor.insertText(formatted_text)
             self._update_actions_state()
     
+    @staticmethod
+    def _is_ipset_tab(tab):
+        """True, если во вкладке списков открыт ipset-файл."""
+        return (getattr(tab, 'tab_kind', '') == 'lists'
+                and getattr(tab, '_current_file', '').lower().startswith('ipset'))
+    
+    def optimize_ipset_action(self):
+        """Сжимает открытый ipset до минимального покрытия CIDR (изменение можно отменить)."""
+        from src.core.ipset_engine import optimize_ipset_text
+        tab = self.current_tab_content()
+        if tab is None or not self._is_ipset_tab(tab):
+            return
+        editor = tab.get_current_editor()
+        text = editor.toPlainText()
+        new_text, stats = optimize_ipset_text(text)
+        if new_text != text:
+            cursor = editor.textCursor()
+            cursor.select(QTextCursor.SelectionType.Document)
+            cursor.insertText(new_text)
+            self._update_actions_state()
+        QMessageBox.information(
+            self, tr('editor_optimize_ipset', self.language),
+            tr('editor_optimize_ipset_done', self.language).format(
+                stats['before'], stats['after'], stats['invalid'])
+        )
+    
+    @staticmethod
+    def _is_hostlist_tab(tab):
+        """True, если во вкладке списков открыт список доменов (не ipset)."""
+        return (getattr(tab, 'tab_kind', '') == 'lists'
+                and not getattr(tab, '_current_file', '').lower().startswith('ipset'))
+    
+    def optimize_hostlist_action(self):
+        """Удаляет из открытого списка доменов дубликаты и поддомены, покрытые родителем (можно отменить)."""
+        from src.core.domain_index import optimize_hostlist_lines
+        tab = self.current_tab_content()
+        if tab is None or not self._is_hostlist_tab(tab):
+            return
+        editor = tab.get_current_editor()
+        text = editor.toPlainText()
+        new_lines, stats = optimize_hostlist_lines(text.split('\n'))
+        if stats['duplicates'] or stats['redundant']:
+            cursor = editor.textCursor()
+            cursor.select(QTextCursor.SelectionType.Document)
+            cursor.insertText('\n'.join(new_lines))
+            self._update_actions_state()
+        QMessageBox.information(
+            self, tr('editor_optimize_hostlist', self.language),
+            tr('editor_optimize_hostlist_done', self.language).format(
+                stats['before'], stats['after'], stats['duplicates'], stats['redundant'])
+        )
+    
+    def lookup_ip_action(self):
+        """Ищет IP-адреса (или все адреса из вставленного лога) в ipset-списках."""
+        from src.core.ip_lookup import IpLookup, extract_ips, verdict
+        tab = self.current_tab_content()
+        selected = ''
+        if tab is not None:
+            selected = tab.get_current_editor().textCursor().selectedText().replace('\u2029', '\n')
+        text, ok = QInputDialog.getMultiLineText(
+            self, tr('editor_lookup_ip', self.language), tr('editor_lookup_ip_prompt', self.language), selected
+        )
+        if not ok:
+            return
+        ips = extract_ips(text)
+        if not ips:
+            QMessageBox.warning(self, tr('editor_lookup_ip', self.language),
+                                tr('editor_lookup_ip_empty', self.language))
+            return
+        if not hasattr(self, '_ip_lookup'):
+            self._ip_lookup = IpLookup(self.tab_lists.folder)
+        results = self._ip_lookup.lookup_many(ips)
+        counts = {'excluded': 0, 'included': 0, 'none': 0, 'invalid': 0}
+        details = []
+        for result in results:
+            kind = verdict(result)
+            counts[kind] += 1
+            where = '; '.join(f"{m['list']}:{m['line']} {m['cidr']}" for m in result['matches'])
+            details.append(f"{result['ip']}\t{tr('editor_lookup_ip_' + kind, self.language)}"
+                           + (f"\t{where}" if where else ''))
+        msg = QMessageBox(self)
+        msg.setWindowTitle(tr('editor_lookup_ip', self.language))
+        msg.setIcon(QMessageBox.Icon.Information)
+        if len(results) == 1:
+            msg.setText(details[0].replace('\t', '\n'))
+        else:
+            msg.setText(tr('editor_lookup_ip_summary', self.language).format(
+                len(results), counts['included'], counts['excluded'], counts['none'], counts['invalid']))
+            msg.setDetailedText('\n'.join(details))
+        msg.exec()
+    
+    def normalize_hostlist_action(self):
+        """Нормализует открытый список доменов: URL -> домен, регистр, punycode, повторы, поддомены, сортировка."""
+        from src.core.domain_normalize import normalize_domains
+        tab = self.current_tab_content()
+        if tab is None or not self._is_hostlist_tab(tab):
+            return
+        editor = tab.get_current_editor()
+        text = editor.toPlainText()
+        stats = {}
+        new_text = '\n'.join(normalize_domains(text.split('\n'), stats=stats))
+        if new_text != text.strip():
+            cursor = editor.textCursor()
+            cursor.select(QTextCursor.SelectionType.Document)
+            cursor.insertText(new_text + '\n' if new_text else '')
+            self._update_actions_state()
+        QMessageBox.information(
+            self, tr('editor_normalize_hostlist', self.language),
+            tr('editor_normalize_hostlist_done', self.language).format(
+                stats['input'], stats['output'], stats['invalid'], stats['duplicates'], stats['redundant'])
+        )
+    
+    def resolve_ipset_action(self):
+        """Разрешает домены открытого списка в IP (A/AAAA) и сохраняет их CIDR-покрытие в ipset-*.txt."""
+        tab = self.current_tab_content()
+        if tab is None or not self._is_hostlist_tab(tab) or self._resolve_worker is not None:
+            return
+        lines = tab.get_current_editor().toPlainText().split('\n')
+        domains = list(dict.fromkeys(
+            line.strip().lower() for line in lines if line.strip() and not line.strip().startswith('#')))
+        if not domains:
+            return
+        stem = os.path.splitext(tab._current_file)[0]
+        if stem.startswith('list-'):
+            stem = stem[len('list-'):]
+        name, ok = QInputDialog.getText(
+            self, tr('editor_resolve_ipset', self.language),
+            tr('editor_resolve_ipset_prompt', self.language).format(len(domains)),
+            text=f'ipset-{stem}.txt'
+        )
+        name = name.strip()
+        if not ok or not name:
+            return
+        if not _RESOLVE_IPSET_NAME_RE.fullmatch(name) or name.lower() == 'ipset-all.txt':
+            QMessageBox.warning(self, tr('editor_resolve_ipset', self.language),
+                                tr('editor_resolve_ipset_bad_name', self.language))
+            return
+        target_path = os.path.join(tab.folder, name)
+        if os.path.exists(target_path):
+            reply = QMessageBox.question(
+                self, tr('editor_resolve_ipset', self.language),
+                tr('editor_resolve_ipset_overwrite', self.language).format(name),
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.No
+            )
+            if reply != QMessageBox.StandardButton.Yes:
+                return
+        
+        progress = QProgressDialog(tr('editor_resolve_ipset_progress', self.language),
+                                   tr('settings_cancel', self.language), 0, len(domains), self)
+        progress.setWindowTitle(tr('editor_resolve_ipset', self.language))
+        progress.setMinimumDuration(0)
+        progress.show()
+        worker = _ResolveIpsetWorker(domains, target_path)
+        worker.progress_signal.connect(lambda done, total: progress.setValue(done))
+        progress.canceled.connect(worker.cancel)
+        
+        def done(stats, error):
+            progress.close()
+            if error:
+                QMessageBox.warning(self, tr('editor_resolve_ipset', self.language), error)
+                return
+            if stats is None:
+                return  # отменено пользователем
+            if not stats['written']:
+                QMessageBox.warning(self, tr('editor_resolve_ipset', self.language),
+                                    tr('editor_resolve_ipset_nothing', self.language).format(name))
+                return
+            QMessageBox.information(
+                self, tr('editor_resolve_ipset', self.language),
+                tr('editor_resolve_ipset_done', self.language).format(
+                    name, stats['domains'], stats['resolved'], stats['failed'], stats['addresses'], stats['cidrs'])
+            )
+        
+        def finished():
+            # Ссылку держим до конца run(): done_signal приходит, пока поток ещё работает
+            self._resolve_worker = None
+            worker.deleteLater()
+            self._update_actions_state()
+        
+        worker.done_signal.connect(done)
+        worker.finished.connect(finished)
+        self._resolve_worker = worker
+        self._update_actions_state()
+        worker.start()
+    
+    def _start_conflict_scan(self):
+        """Запускает фоновый пересчёт конфликтов; если он уже идёт — повторит после завершения."""
+        if self._conflict_worker is not None and self._conflict_worker.isRunning():
+            self._conflict_rescan_pending = True
+            return
+        self._conflict_rescan_pending = False
+        worker = _ListConflictWorker(self._conflict_analyzer)
+        worker.done_signal.connect(self._on_conflict_scan_done)
+        worker.finished.connect(self._on_conflict_worker_finished)
+        self._conflict_worker = worker
+        worker.start()
+    
+    def _on_conflict_worker_finished(self):
+        # Ссылку держим до конца run(): done_signal приходит, пока поток ещё работает
+        worker = self._conflict_worker
+        self._conflict_worker = None
+        if worker is not None:
+            worker.deleteLater()
+        if self._conflict_rescan_pending:
+            self._start_conflict_scan()
+    
+    def _on_conflict_scan_done(self, conflicts, error):
+        if self._conflict_rescan_pending:
+            return  # результат уже устарел — применится результат повторного скана
+        if conflicts is not None:
+            self._list_conflicts = conflicts
+        if self._conflict_show_pending:
+            self._conflict_show_pending = False
+            if error:
+                QMessageBox.warning(self, tr('editor_list_conflicts', self.language), error)
+            else:
+                self._show_list_conflicts()
+    
+    def list_conflicts_action(self):
+        """Показывает записи включающих списков, совпадающие с исключающими или покрытые ими."""
+        self._conflict_show_pending = True
+        self._start_conflict_scan()
+    
+    def _show_list_conflicts(self):
+        conflicts = self._list_conflicts or []
+        msg = QMessageBox(self)
+        msg.setWindowTitle(tr('editor_list_conflicts', self.language))
+        if not conflicts:
+            msg.setIcon(QMessageBox.Icon.Information)
+            msg.setText(tr('editor_list_conflicts_none', self.language))
+            msg.exec()
+            return
+        exact = sum(1 for c in conflicts if c['type'] == 'exact')
+        msg.setIcon(QMessageBox.Icon.Warning)
+        msg.setText(tr('editor_list_conflicts_summary', self.language).format(
+            len(conflicts), exact, len(conflicts) - exact))
+        msg.setDetailedText('\n'.join(
+            f"{c['include']}:{c['include_line']} {c['entry']}\t"
+            f"{tr('editor_list_conflicts_' + c['type'], self.language)}\t"
+            f"{c['exclude']}:{c['exclude_line']} {c['exclude_entry']}"
+            for c in conflicts
+        ))
+        msg.exec()
+    
     def convert_line_endings_action(self):
         """Конвертирует окончания строк в выбранный формат."""
         tab = self.current_tab_content()
@@ -2215,10 +2580,29 @@ class UnifiedEditorWindow(StandardDialog):
             f"ZapretDesktop Editor\n\n{tr('editor_window_title', self.language)}"
         )
 
+    def suspend_winws_watching(self):
+        """Снимает наблюдение за папками winws (списки, стратегии) перед подменой папки winws."""
+        for tab in (self.tab_lists, self.tab_bat):
+            tab.suspend_watching()
+    
+    def resume_winws_watching(self):
+        for tab in (self.tab_lists, self.tab_bat):
+            tab.resume_watching()
+    
     def closeEvent(self, event):
         """При закрытии окна сбрасываем singleton, чтобы следующий запуск создавал новое окно
         с корректным состоянием (размер/кнопка разворота)."""
         super().closeEvent(event)
+        self._conflict_timer.stop()
+        if self._conflict_worker is not None:
+            self._conflict_worker.wait()
+        worker = self._resolve_worker
+        if worker is not None:
+            worker.cancel()
+            if not worker.wait(RESOLVE_STOP_TIMEOUT_MS):
+                # Не дожидаемся: поток живёт до конца run(), ссылку держит модуль
+                _detached_workers.add(worker)
+                worker.finished.connect(lambda: _detached_workers.discard(worker))
         # Сбрасываем кешированный экземпляр, если он указывает на это окно
         global get_unified_editor_window
         if 'get_unified_editor_window' in globals():
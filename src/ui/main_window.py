@@ -6,71 +6,45 @@ from .system_tray import SystemTray
 from src.core.config_manager import ConfigManager, VERSION, MD5
 from src.core.translator import tr
 from src.core.autostart_manager import AutostartManager
-from src.core.zapret_updater import ZapretUpdater
-from src.core.app_updater import AppUpdater
 from src.core.winws_manager import WinwsManager
-from .test_window import TestWindow
-from src.dialogs.settings_dialog import SettingsDialog
-from src.editor.unified_editor_window import get_unified_editor_window
-from src.dialogs.bin_creator_dialog import BinCreatorDialog
+from src.core import startup_profiler
 from src.core.path_utils import get_base_path, get_config_path, get_winws_path
+from src.core.ui_snapshot import load_ui_snapshot, save_ui_snapshot, scan_strategies
+from src.core.system_backend import get_backend, invalidate_service_cache, stop_processes
 from src.core.embedded_assets import get_app_icon
 from .standard_window import StandardMainWindow
 from .standard_dialog import StandardDialog
 from src.widgets.style_menu import StyleMenu
 from src.widgets.custom_combobox import CustomComboBox
 from src.widgets.custom_context_widgets import ContextTextEdit
-from src.dialogs.vs_update_dialog import VSUpdateDialog
 from src.ui.message_box_utils import configure_message_box
-from src.dialogs.addons_dialog import AddonsDialog
-from src.dialogs.winws_setup_dialog import WinwsSetupDialog
 from src.ui import theme
 from src.core.window_styles import apply_window_style
 import os
 import re
-import requests
 import subprocess
-import psutil
 import threading
-import winreg
 import json
 import csv
 from datetime import datetime
 
 
 class _StartWorker(QThread):
-    """Фоновый запуск .bat: автоперезапуск приложений и Popen. Не блокирует UI."""
+    """Фоновый запуск .bat: автоперезапуск приложений и запуск через system_backend. Не блокирует UI."""
     done_signal = pyqtSignal(bool, object, str)  # success, process, error_message
 
-    def __init__(self, main_win, bat_path_abs, bat_dir, is_nt):
+    def __init__(self, main_win, bat_path_abs, bat_dir):
         super().__init__()
         self._main_win = main_win
         self._bat_path_abs = bat_path_abs
         self._bat_dir = bat_dir
-        self._is_nt = is_nt
 
     def run(self):
         try:
             import time
             time.sleep(0.5)  # столько же времени прохода, как при завершении (terminate + 0.5s)
             self._main_win._handle_auto_restart_apps()
-            if self._is_nt:
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                startupinfo.wShowWindow = subprocess.SW_HIDE
-                proc = subprocess.Popen(
-                    ['cmd.exe', '/c', self._bat_path_abs],
-                    cwd=self._bat_dir,
-                    startupinfo=startupinfo,
-                    creationflags=subprocess.CREATE_NO_WINDOW
-                )
-            else:
-                proc = subprocess.Popen(
-                    [self._bat_path_abs],
-                    cwd=self._bat_dir,
-                    stdout=subprocess.DEVNULL,
-                    stderr=subprocess.DEVNULL
-                )
+            proc = get_backend().launch_strategy(self._bat_path_abs, self._bat_dir)
             self.done_signal.emit(True, proc, '')
         except Exception as e:
             self.done_signal.emit(False, None, str(e))
@@ -92,6 +66,73 @@ class _StopWorker(QThread):
         self.done_signal.emit()
 
 
+class _UiReconcileWorker(QThread):
+    """Фоновая сверка снимка окна с диском и процессами: список стратегий, версия,
+    запущенный winws и состояние фильтров. Результат применяется в главном потоке."""
+    done_signal = pyqtSignal(object)  # dict с актуальным состоянием
+
+    def __init__(self, main_win):
+        super().__init__()
+        self._main_win = main_win
+
+    def run(self):
+        state = {}
+        winws_folder = get_winws_path()
+        try:
+            state['strategies'] = scan_strategies(winws_folder)
+        except OSError:
+            pass
+        try:
+            from src.core.winws_version import read_local_version_from_winws_root
+            state['base_version'] = read_local_version_from_winws_root(winws_folder) or "unknown"
+        except Exception:
+            state['base_version'] = "unknown"
+        state['winws_running'] = self._main_win._is_winws_process_running()
+        state['running_strategy'] = (
+            self._main_win._detect_running_strategy() if state['winws_running'] else None
+        )
+        try:
+            state['game_filter_enabled'] = self._main_win.winws_manager.is_game_filter_enabled()
+            state['ipset_filter_mode'] = self._main_win.winws_manager.get_ipset_mode()
+        except Exception:
+            pass
+        self.done_signal.emit(state)
+
+
+class _DiagnosticsWorker(QThread):
+    """Фоновая диагностика: проверки идут параллельно, каждая строка результата
+    передаётся в UI сигналом сразу по готовности."""
+    result_signal = pyqtSignal(str, str)  # status, message
+    done_signal = pyqtSignal()
+
+    def __init__(self, lang):
+        super().__init__()
+        self._lang = lang
+
+    def run(self):
+        from src.core.diagnostics import run_diagnostics
+        try:
+            run_diagnostics(self._lang, self.result_signal.emit)
+        except Exception as e:
+            self.result_signal.emit("?", str(e))
+        self.done_signal.emit()
+
+
+class _ListUpdateWorker(QThread):
+    """Фоновое обновление списка (ipset / hosts) через list_updater."""
+    done_signal = pyqtSignal(object, str)  # result, error_message
+
+    def __init__(self, task):
+        super().__init__()
+        self._task = task
+
+    def run(self):
+        try:
+            self.done_signal.emit(self._task(), '')
+        except Exception as e:
+            self.done_signal.emit(None, str(e))
+
+
 class MainWindow(StandardMainWindow):
     update_found_signal = pyqtSignal(str)
 
@@ -110,20 +151,26 @@ class MainWindow(StandardMainWindow):
         self.process_monitor_timer.timeout.connect(self.check_winws_process)
         self._start_worker = None  # фоновый запуск стратегии
         self._stop_worker = None   # фоновая остановка
+        self._ui_reconcile_worker = None  # фоновая сверка снимка окна при запуске
+        self._diagnostics_workers = set()  # живые воркеры диагностики (держим ссылки до завершения)
+        self._list_update_worker = None  # фоновое обновление ipset / hosts
+        self._base_version = None  # версия zapret из service.bat (для снимка окна)
         # Отслеживание появления/изменения папки winws
         self.winws_watcher = QFileSystemWatcher(self)
         self.winws_watcher.directoryChanged.connect(self._on_winws_dir_changed)
         self._init_winws_watcher()
+        from src.core.winws_installer import register_swap_hooks
+        register_swap_hooks(self._suspend_winws_watchers, self._resume_winws_watchers)
         # Инициализация менеджера конфигурации
         self.config = ConfigManager()
         # Загружаем настройки из файла
         self.settings = self.config.load_settings()
         # Инициализация менеджера автозапуска
         self.autostart_manager = AutostartManager()
-        # Инициализация менеджера обновлений zapret
-        self.zapret_updater = ZapretUpdater()
-        # Инициализация менеджера обновлений программы
-        self.app_updater = AppUpdater()
+        # Менеджеры обновлений zapret и программы создаются лениво (см. свойства zapret_updater/app_updater):
+        # их конструкторы читают service.bat и конфиг, а requests импортируется только при первой проверке
+        self._zapret_updater = None
+        self._app_updater = None
         self.latest_available_version = None   
         self.update_found_signal.connect(self._on_background_update_found)
         # Инициализация менеджера настроек winws
@@ -131,14 +178,24 @@ class MainWindow(StandardMainWindow):
         # Защита от повторного открытия окна настроек
         self._settings_dialog = None
         self._settings_dialog_opening = False
-        self.init_ui()
-        self.init_menu_bar()
-        self.init_tray()
+        # Снимок окна с прошлого запуска: по нему окно рисуется сразу,
+        # а диск и процессы сверяются в фоне (_start_ui_reconcile)
+        with startup_profiler.phase('MainWindow.load_ui_snapshot'):
+            self._ui_snapshot = load_ui_snapshot(get_winws_path())
+        with startup_profiler.phase('MainWindow.init_ui'):
+            self.init_ui()
+        with startup_profiler.phase('MainWindow.init_menu_bar'):
+            self.init_menu_bar()
+        with startup_profiler.phase('MainWindow.init_tray'):
+            self.init_tray()
         # Применяем переводы после инициализации всех компонентов
         self.retranslate_ui()
         
         # Синхронизируем настройки фильтров с файлами winws
-        self.update_filter_statuses()
+        # (при наличии снимка — в фоне, вместе с остальной сверкой)
+        if self._ui_snapshot is None:
+            with startup_profiler.phase('MainWindow.update_filter_statuses'):
+                self.update_filter_statuses()
         # Обновляем заголовок окна с учётом текущей стратегии (если уже запущена)
         self._update_window_title_with_strategy()
         
@@ -153,10 +210,44 @@ class MainWindow(StandardMainWindow):
         # Запускаем мониторинг процесса (проверка каждые 1 секунду)
         self.process_monitor_timer.start(1000)
         
-        # Если включен автозапуск последней стратегии, запускаем её
-        if self.settings.get('auto_start_last_strategy', False):
+        # Сохраняем снимок окна при любом выходе (меню, трей, завершение сеанса)
+        QApplication.instance().aboutToQuit.connect(self._save_ui_snapshot)
+
+        if self._ui_snapshot is not None:
+            # Автозапуск последней стратегии — только после сверки: по снимку нельзя
+            # знать, не запущен ли уже winws
+            self._start_ui_reconcile()
+        elif self.settings.get('auto_start_last_strategy', False):
+            # Если включен автозапуск последней стратегии, запускаем её
             # Небольшая задержка, чтобы окно успело полностью инициализироваться
             QTimer.singleShot(1000, lambda: self.auto_start_last_strategy())
+
+    @property
+    def zapret_updater(self):
+        """Менеджер обновлений zapret; создаётся при первом обращении."""
+        if self._zapret_updater is None:
+            from src.core.zapret_updater import ZapretUpdater
+            self._zapret_updater = ZapretUpdater()
+        return self._zapret_updater
+
+    @zapret_updater.setter
+    def zapret_updater(self, value):
+        self._zapret_updater = value
+
+    @property
+    def app_updater(self):
+        """Менеджер обновлений программы; создаётся при первом обращении."""
+        if self._app_updater is None:
+            from src.core.app_updater import AppUpdater
+            self._app_updater = AppUpdater()
+        return self._app_updater
+
+    def _get_zapret_repo_slug(self):
+        """Репозиторий zapret (owner/repo) без создания ZapretUpdater, если он ещё не нужен."""
+        if self._zapret_updater is not None:
+            return getattr(self._zapret_updater, "github_repo", "") or ""
+        from src.core.zapret_updater import resolve_github_repo
+        return resolve_github_repo(self.settings.get('zapret_repo', ''))
     
     def _is_autostart(self):
         """Проверяет, запущено ли приложение через автозапуск"""
@@ -170,10 +261,8 @@ class MainWindow(StandardMainWindow):
             # Дополнительная проверка: если родительский процесс - explorer.exe, winlogon.exe или userinit.exe,
             # и автозапуск включен, то вероятно это автозапуск
             try:
-                current_process = psutil.Process()
-                parent = current_process.parent()
-                if parent:
-                    parent_name = parent.name().lower()
+                parent_name, process_create_time = get_backend().current_process_parent()
+                if parent_name:
                     # Если родитель - explorer.exe и автозапуск включен, это может быть автозапуск
                     # Но explorer.exe также может быть родителем при обычном запуске
                     # Поэтому проверяем только winlogon.exe и userinit.exe как более надежные индикаторы
@@ -185,7 +274,6 @@ class MainWindow(StandardMainWindow):
                         # Проверяем, что процесс запущен недавно (в течение последних 30 секунд)
                         # Это может указывать на автозапуск
                         import time
-                        process_create_time = current_process.create_time()
                         current_time = time.time()
                         if current_time - process_create_time < 30:
                             return True
@@ -238,7 +326,14 @@ class MainWindow(StandardMainWindow):
         
         # ComboBox
         self.combo_box = CustomComboBox()
-        self.load_bat_files()
+        if self._ui_snapshot is not None:
+            # Рисуем список стратегий по снимку без обращения к диску
+            self._fill_strategy_combo(
+                self._ui_snapshot['strategies'],
+                self._ui_snapshot.get('base_version') or "unknown",
+            )
+        else:
+            self.load_bat_files()
         self.combo_box.currentTextChanged.connect(self.on_strategy_changed)
         self.combo_box.setMinimumHeight(35)
         self.combo_box.setMinimumWidth(300)
@@ -260,7 +355,10 @@ class MainWindow(StandardMainWindow):
         button_layout.addStretch()
         content_layout.addLayout(button_layout)
         
-        self.restore_last_strategy()
+        if self._ui_snapshot is not None:
+            self._apply_strategy_selection(False, None, auto_start=False)
+        else:
+            self.restore_last_strategy()
         
         content_layout.addStretch()
         
@@ -309,6 +407,7 @@ class MainWindow(StandardMainWindow):
         self.check_app_updates_action = None
         self.check_updates_action = None
         self.manual_update_action = None
+        self.rollback_update_action = None
     
     def init_menu_bar(self):
         """Создает меню бар"""
@@ -457,6 +556,11 @@ class MainWindow(StandardMainWindow):
         self.manual_update_action.triggered.connect(self.manual_update_strategies)
         self.update_menu.addAction(self.manual_update_action)
         
+        # Откатить последнее обновление zapret (из winws_backup)
+        self.rollback_update_action = QAction('', self)
+        self.rollback_update_action.triggered.connect(self.rollback_zapret_update)
+        self.update_menu.addAction(self.rollback_update_action)
+        
         self.update_menu.addSeparator()
         
         # Update IPSet List
@@ -580,6 +684,8 @@ class MainWindow(StandardMainWindow):
             self.check_updates_action.setText(tr('update_check_zapret', lang))
         if self.manual_update_action:
             self.manual_update_action.setText(tr('update_manual', lang))
+        if self.rollback_update_action:
+            self.rollback_update_action.setText(tr('update_rollback', lang))
         if hasattr(self, 'update_ipset_action') and self.update_ipset_action:
             self.update_ipset_action.setText(tr('update_ipset_list', lang))
         if hasattr(self, 'addons_menu_action') and self.addons_menu_action:
@@ -595,7 +701,7 @@ class MainWindow(StandardMainWindow):
             self.open_github_action.setText(tr('help_open_github', lang))
         if hasattr(self, 'open_github_zapret_action') and self.open_github_zapret_action:
             # Имя пользователя берём из настроек zapret_repo (owner/repo или URL)
-            slug = getattr(self.zapret_updater, "github_repo", ZapretUpdater.GITHUB_REPO)
+            slug = self._get_zapret_repo_slug()
             slug = (slug or "").strip().strip("/")
             owner = "Flowseal"
             if slug:
@@ -727,6 +833,7 @@ class MainWindow(StandardMainWindow):
     
     def _show_settings_dialog_impl(self):
         """Реализация открытия диалога настроек"""
+        from src.dialogs.settings_dialog import SettingsDialog
         dialog = SettingsDialog(
             parent=self,
             settings=self.settings,
@@ -884,6 +991,7 @@ class MainWindow(StandardMainWindow):
     
     def check_app_updates(self):
         """Проверяет наличие обновлений программы ZapretDesktop"""
+        from src.dialogs.vs_update_dialog import VSUpdateDialog
         lang = self.settings.get('language', 'ru')
         
         # Показываем окно проверки в стиле VS
@@ -931,6 +1039,7 @@ class MainWindow(StandardMainWindow):
     
     def download_and_install_app_update(self, update_info):
         """Скачивает и устанавливает обновление программы"""
+        from src.dialogs.vs_update_dialog import VSUpdateDialog
         lang = self.settings.get('language', 'ru')
         
         if not update_info.get('download_url'):
@@ -965,7 +1074,8 @@ class MainWindow(StandardMainWindow):
             update_dialog.add_detail(f"{tr('update_downloading', lang)} {update_info['latest_version']}...")
             exe_path = self.app_updater.download_update(
                 update_info['download_url'],
-                progress_callback=update_progress
+                progress_callback=update_progress,
+                expected_sha256=update_info.get('sha256')
             )
             
             # Устанавливаем обновление
@@ -1010,6 +1120,9 @@ class MainWindow(StandardMainWindow):
     
     def check_zapret_updates(self):
         """Проверяет наличие обновлений стратегий zapret"""
+        from src.dialogs.vs_update_dialog import VSUpdateDialog
+        from src.dialogs.winws_setup_dialog import WinwsSetupDialog
+        from src.core.zapret_updater import ZapretUpdater
         lang = self.settings.get('language', 'ru')
 
         # Если папка winws отсутствует (или удалена), открываем окно первоначальной загрузки
@@ -1080,6 +1193,7 @@ class MainWindow(StandardMainWindow):
     
     def download_and_install_update(self, update_info):
         """Скачивает и устанавливает обновление"""
+        from src.dialogs.vs_update_dialog import VSUpdateDialog
         lang = self.settings.get('language', 'ru')
         
         if not update_info.get('download_url'):
@@ -1091,17 +1205,7 @@ class MainWindow(StandardMainWindow):
             return
         
         # Сначала останавливаем winws.exe, если он запущен
-        winws_running = False
-        try:
-            for proc in psutil.process_iter(['pid', 'name']):
-                try:
-                    if proc.info['name'] and proc.info['name'].lower() == 'winws.exe':
-                        winws_running = True
-                        break
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                    pass
-        except Exception:
-            pass
+        winws_running = self._is_winws_process_running()
         
         if winws_running:
             # Показываем диалог остановки
@@ -1124,17 +1228,7 @@ class MainWindow(StandardMainWindow):
                 
                 # Дополнительная проверка - ждем пока процесс точно завершится
                 for i in range(10):
-                    winws_still_running = False
-                    try:
-                        for proc in psutil.process_iter(['pid', 'name']):
-                            try:
-                                if proc.info['name'] and proc.info['name'].lower() == 'winws.exe':
-                                    winws_still_running = True
-                                    break
-                            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                                pass
-                    except Exception:
-                        pass
+                    winws_still_running = self._is_winws_process_running()
                     
                     if not winws_still_running:
                         break
@@ -1168,7 +1262,8 @@ class MainWindow(StandardMainWindow):
             update_dialog.add_detail(f"{tr('update_downloading', lang)} {update_info['latest_version']}...")
             zip_path = self.zapret_updater.download_update(
                 update_info['download_url'],
-                progress_callback=update_progress
+                progress_callback=update_progress,
+                expected_sha256=update_info.get('sha256')
             )
             
             # Устанавливаем обновление
@@ -1179,6 +1274,13 @@ class MainWindow(StandardMainWindow):
             
             self.zapret_updater.extract_and_update(zip_path, update_info['latest_version'])
             
+            install_result = self.zapret_updater.last_install_result or {}
+            if install_result.get('mode') == 'delta':
+                update_dialog.add_detail(tr('update_delta_summary', lang).format(
+                    len(install_result['written']), install_result['unchanged']))
+                if install_result['removed_upstream']:
+                    update_dialog.add_detail(tr('update_removed_upstream', lang).format(
+                        ', '.join(install_result['removed_upstream'])))
             update_dialog.set_progress(100)
             update_dialog.set_status(tr('update_completed', lang))
             update_dialog.add_detail(tr('update_completed_text', lang).format(update_info["latest_version"]))
@@ -1201,13 +1303,8 @@ class MainWindow(StandardMainWindow):
             if index >= 0:
                 self.combo_box.setCurrentIndex(index)
             
-            # Если включена настройка "Добавлять /B при обновлении", добавляем /B флаг
-            if self.settings.get('add_b_flag_on_update', False):
-                self.add_b_flag_to_all_strategies(silent=True)
-            
-            # Если включена настройка "Удалять проверку обновлений", удаляем строку check_updates
-            if self.settings.get('remove_check_updates', False):
-                self.remove_check_updates_from_all_strategies(silent=True)
+            # Правки стратегий после обновления (/B, check_updates, regex-правила) — за один проход
+            self._apply_update_transforms()
             
             msg = configure_message_box(QMessageBox(self))
             msg.setWindowTitle(tr('update_completed', lang))
@@ -1225,6 +1322,7 @@ class MainWindow(StandardMainWindow):
     
     def _show_addons_dialog(self):
         """Открывает окно «Дополнения»."""
+        from src.dialogs.addons_dialog import AddonsDialog
         d = AddonsDialog(self, self.settings)
         d.exec()
     
@@ -1255,7 +1353,7 @@ class MainWindow(StandardMainWindow):
             return
         repo_slug = f"{owner}/{repo}"
         # Если это тот же репозиторий, что используется для zapret‑обновлений
-        if repo_slug.lower() == getattr(self.zapret_updater, "github_repo", ZapretUpdater.GITHUB_REPO).lower():
+        if repo_slug.lower() == self._get_zapret_repo_slug().lower():
             # Проверяем наличие winws
             winws_folder = get_winws_path()
             has_winws = (
@@ -1281,6 +1379,8 @@ class MainWindow(StandardMainWindow):
           - full/strategies/bin: передаётся в zapret_updater (пока обрабатывается как полная установка)
           - lists: обновляет только winws\\lists (list-*.txt, ipset-*.txt и т.п.)
         """
+        from src.core.http_client import get_http_client
+        from src.dialogs.vs_update_dialog import VSUpdateDialog
         # Проверяем наличие winws перед скачиванием (только если не списки)
         winws_folder = get_winws_path()
         has_winws = (
@@ -1295,17 +1395,7 @@ class MainWindow(StandardMainWindow):
             # Прямое скачивание и установка через ZapretUpdater (без проверки версии)
             return self._download_and_install_zapret_direct(lang, owner, repo)
 
-        winws_running = False
-        try:
-            for proc in psutil.process_iter(['pid', 'name']):
-                try:
-                    if proc.info['name'] and proc.info['name'].lower() == 'winws.exe':
-                        winws_running = True
-                        break
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                    pass
-        except Exception:
-            pass
+        winws_running = self._is_winws_process_running()
         if winws_running:
             reply = QMessageBox.question(
                 self,
@@ -1327,37 +1417,9 @@ class MainWindow(StandardMainWindow):
         update_dialog.show()
         QApplication.processEvents()
         try:
-            download_url = None
-            # Сначала пытаемся взять последний релиз
-            api_url = f"https://api.github.com/repos/{owner}/{repo}/releases/latest"
-            r = requests.get(api_url, timeout=15)
-            if r.status_code == 404:
-                # У репозитория нет релизов — падаем обратно на архив ветки по умолчанию
-                repo_api = f"https://api.github.com/repos/{owner}/{repo}"
-                r_repo = requests.get(repo_api, timeout=15)
-                r_repo.raise_for_status()
-                repo_data = r_repo.json()
-                default_branch = (repo_data.get("default_branch") or "main").strip()
-                if not default_branch:
-                    default_branch = "main"
-                download_url = f"https://github.com/{owner}/{repo}/archive/refs/heads/{default_branch}.zip"
-            else:
-                r.raise_for_status()
-                data = r.json()
-                for asset in data.get('assets', []):
-                    if asset.get('name', '').endswith('.zip'):
-                        download_url = asset.get('browser_download_url')
-                        break
-                # Если в релизе нет zip‑ассетов, тоже пробуем архив ветки по умолчанию
-                if not download_url:
-                    repo_api = f"https://api.github.com/repos/{owner}/{repo}"
-                    r_repo = requests.get(repo_api, timeout=15)
-                    r_repo.raise_for_status()
-                    repo_data = r_repo.json()
-                    default_branch = (repo_data.get("default_branch") or "main").strip()
-                    if not default_branch:
-                        default_branch = "main"
-                    download_url = f"https://github.com/{owner}/{repo}/archive/refs/heads/{default_branch}.zip"
+            # Последний релиз (первый .zip) или архив ветки по умолчанию; метаданные
+            # запрашиваются условно через общий HTTP-клиент
+            download_url = get_http_client().get_release_zip_url(f"{owner}/{repo}")
 
             if not download_url:
                 update_dialog.close()
@@ -1403,6 +1465,8 @@ class MainWindow(StandardMainWindow):
 
     def _download_and_install_zapret_direct(self, lang, owner, repo):
         """Скачивает и устанавливает zapret напрямую (без окна настройки и проверки версии)."""
+        from src.core.http_client import get_http_client
+        from src.dialogs.vs_update_dialog import VSUpdateDialog
         update_dialog = VSUpdateDialog(self, lang)
         update_dialog.set_status(tr('update_downloading', lang))
         update_dialog.show_cancel(False)
@@ -1410,36 +1474,9 @@ class MainWindow(StandardMainWindow):
         QApplication.processEvents()
 
         try:
-            download_url = None
-            # Сначала пытаемся взять последний релиз
-            api_url = f"https://api.github.com/repos/{owner}/{repo}/releases/latest"
-            r = requests.get(api_url, timeout=15)
-            if r.status_code == 404:
-                # У репозитория нет релизов — падаем обратно на архив ветки по умолчанию
-                repo_api = f"https://api.github.com/repos/{owner}/{repo}"
-                r_repo = requests.get(repo_api, timeout=15)
-                r_repo.raise_for_status()
-                repo_data = r_repo.json()
-                default_branch = (repo_data.get("default_branch") or "main").strip()
-                if not default_branch:
-                    default_branch = "main"
-                download_url = f"https://github.com/{owner}/{repo}/archive/refs/heads/{default_branch}.zip"
-            else:
-                r.raise_for_status()
-                data = r.json()
-                for asset in data.get('assets', []):
-                    if asset.get('name', '').endswith('.zip'):
-                        download_url = asset.get('browser_download_url')
-                        break
-                if not download_url:
-                    repo_api = f"https://api.github.com/repos/{owner}/{repo}"
-                    r_repo = requests.get(repo_api, timeout=15)
-                    r_repo.raise_for_status()
-                    repo_data = r_repo.json()
-                    default_branch = (repo_data.get("default_branch") or "main").strip()
-                    if not default_branch:
-                        default_branch = "main"
-                    download_url = f"https://github.com/{owner}/{repo}/archive/refs/heads/{default_branch}.zip"
+            # Последний релиз (первый .zip) или архив ветки по умолчанию; метаданные
+            # запрашиваются условно через общий HTTP-клиент
+            download_url = get_http_client().get_release_zip_url(f"{owner}/{repo}")
 
             if not download_url:
                 update_dialog.close()
@@ -1462,63 +1499,8 @@ class MainWindow(StandardMainWindow):
             # Используем extract_zip_to_winws (не extract_and_update, чтобы не записывать версию)
             self.zapret_updater.extract_zip_to_winws(zip_path)
 
-            # Применяем автоматические правки (если включены)
-            settings = self.config.load_settings()
-            winws_folder = get_winws_path()
-
-            # Авто-добавление /B
-            if settings.get("add_b_flag_on_update", False) and os.path.isdir(winws_folder):
-                try:
-                    bat_files = [
-                        f for f in os.listdir(winws_folder)
-                        if f.lower().endswith(".bat") and os.path.isfile(os.path.join(winws_folder, f))
-                    ]
-                    old_string = 'start "zapret: %~n0" /min'
-                    new_string = 'start "zapret: %~n0" /B /min'
-                    for filename in bat_files:
-                        file_path = os.path.join(winws_folder, filename)
-                        try:
-                            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                                content = f.read()
-                            if old_string in content:
-                                new_content = content.replace(old_string, new_string)
-                                with open(file_path, "w", encoding="utf-8") as f:
-                                    f.write(new_content)
-                        except Exception:
-                            continue
-                except Exception:
-                    pass
-
-            # Авто-удаление check_updates
-            if settings.get("remove_check_updates", False) and os.path.isdir(winws_folder):
-                try:
-                    bat_files = [
-                        f for f in os.listdir(winws_folder)
-                        if f.lower().endswith(".bat") and os.path.isfile(os.path.join(winws_folder, f))
-                    ]
-                    for filename in bat_files:
-                        file_path = os.path.join(winws_folder, filename)
-                        try:
-                            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                                lines = f.readlines()
-                            new_lines = []
-                            modified = False
-                            for line in lines:
-                                stripped = line.strip().lower()
-                                if (
-                                    stripped == "call service.bat check_updates"
-                                    or "call service.bat check_updates" in stripped
-                                ):
-                                    modified = True
-                                    continue
-                                new_lines.append(line)
-                            if modified:
-                                with open(file_path, "w", encoding="utf-8") as f:
-                                    f.writelines(new_lines)
-                        except Exception:
-                            continue
-                except Exception:
-                    pass
+            # Применяем автоматические правки (если включены) — за один проход
+            self._apply_update_transforms()
 
             update_dialog.set_progress(100)
             update_dialog.set_status(tr('update_completed', lang))
@@ -1581,17 +1563,7 @@ class MainWindow(StandardMainWindow):
         winws_folder = get_winws_path()
         
         # Проверяем, запущен ли winws.exe
-        winws_running = False
-        try:
-            for proc in psutil.process_iter(['pid', 'name']):
-                try:
-                    if proc.info['name'] and proc.info['name'].lower() == 'winws.exe':
-                        winws_running = True
-                        break
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                    pass
-        except Exception:
-            pass
+        winws_running = self._is_winws_process_running()
         
         if winws_running:
             reply = QMessageBox.question(
@@ -1648,13 +1620,8 @@ class MainWindow(StandardMainWindow):
             if index >= 0:
                 self.combo_box.setCurrentIndex(index)
             
-            # Если включена настройка "Добавлять /B при обновлении", добавляем /B флаг
-            if self.settings.get('add_b_flag_on_update', False):
-                self.add_b_flag_to_all_strategies(silent=True)
-            
-            # Если включена настройка "Удалять проверку обновлений", удаляем строку check_updates
-            if self.settings.get('remove_check_updates', False):
-                self.remove_check_updates_from_all_strategies(silent=True)
+            # Правки стратегий после обновления (/B, check_updates, regex-правила) — за один проход
+            self._apply_update_transforms()
             
             msg = configure_message_box(QMessageBox(self))
             msg.setWindowTitle(tr('update_completed', lang))
@@ -1670,157 +1637,76 @@ class MainWindow(StandardMainWindow):
             msg.setIcon(QMessageBox.Icon.Critical)
             msg.exec()
     
-    def extract_archive_to_winws(self, archive_path, winws_folder):
-        """Распаковывает архив (ZIP или RAR) в папку winws"""
-        import time
-        import zipfile
-        import shutil
+    def rollback_zapret_update(self):
+        """Возвращает установку zapret, которая была до последнего обновления (winws_backup)."""
+        lang = self.settings.get('language', 'ru')
+        if not self.zapret_updater.can_rollback():
+            msg = configure_message_box(QMessageBox(self))
+            msg.setWindowTitle(tr('update_rollback', lang))
+            msg.setText(tr('update_rollback_unavailable', lang))
+            msg.setIcon(QMessageBox.Icon.Information)
+            msg.exec()
+            return
+        reply = QMessageBox.question(
+            self,
+            tr('update_rollback', lang),
+            tr('update_rollback_confirm', lang),
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.No
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
         
-        # Нормализуем пути до абсолютных
-        winws_folder = os.path.abspath(winws_folder)
-        archive_path = os.path.abspath(archive_path)
+        if self._is_winws_process_running():
+            reply = QMessageBox.question(
+                self,
+                tr('update_stopping_winws', lang),
+                tr('update_winws_running', lang) + '\n' + tr('update_winws_stop_required', lang),
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.Yes
+            )
+            if reply != QMessageBox.StandardButton.Yes:
+                return
+            self.stop_winws_process(silent=True)
+            import time
+            time.sleep(2)
         
-        # Создаем резервную копию
-        backup_folder = f"{winws_folder}_backup"
-        if os.path.exists(winws_folder):
-            if os.path.exists(backup_folder):
-                shutil.rmtree(backup_folder)
-            shutil.copytree(winws_folder, backup_folder)
+        try:
+            self.zapret_updater.rollback_update()
+        except Exception as e:
+            msg = configure_message_box(QMessageBox(self))
+            msg.setWindowTitle(tr('update_error_title', lang))
+            msg.setText(tr('update_error_text', lang).format(str(e)))
+            msg.setIcon(QMessageBox.Icon.Critical)
+            msg.exec()
+            return
         
-        # Ждем немного для освобождения файлов
-        time.sleep(1)
+        # Обновляем список стратегий в ComboBox
+        current_strategy = self._get_selected_strategy_name()
+        self.combo_box.clear()
+        self.load_bat_files()
+        index = self._find_combo_index_by_data(current_strategy)
+        if index >= 0:
+            self.combo_box.setCurrentIndex(index)
+        self.update_filter_statuses()
         
-        # Определяем тип архива
+        msg = configure_message_box(QMessageBox(self))
+        msg.setWindowTitle(tr('update_rollback', lang))
+        msg.setText(tr('update_rollback_completed', lang))
+        msg.setIcon(QMessageBox.Icon.Information)
+        msg.exec()
+    
+    def extract_archive_to_winws(self, archive_path, winws_folder):
+        """Распаковывает архив (ZIP) в папку winws.
+
+        Установка через WinwsInstaller полной сборкой (дельта — только для релизов
+        через проверку обновлений); прежняя установка остаётся в winws_backup.
+        """
+        from src.core.winws_installer import WinwsInstaller
         archive_ext = os.path.splitext(archive_path)[1].lower()
-        
-        # Создаем временную папку для распаковки
-        winws_parent = os.path.dirname(winws_folder) or os.getcwd()
-        temp_extract = os.path.join(winws_parent, 'temp_manual_extract')
-        if os.path.exists(temp_extract):
-            shutil.rmtree(temp_extract)
-        os.makedirs(temp_extract, exist_ok=True)
-        
-        try:
-            if archive_ext == '.zip':
-                # Распаковываем ZIP
-                with zipfile.ZipFile(archive_path, 'r') as zip_ref:
-                    zip_ref.extractall(temp_extract)
-            else:
-                raise Exception(f'Неподдерживаемый формат архива: {archive_ext}. Поддерживается только ZIP формат.')
-            
-            # Ищем папку winws или .bat файлы в распакованном архиве
-            winws_source = None
-            
-            # Сначала ищем папку winws
-            for root, dirs, files in os.walk(temp_extract):
-                if 'winws' in dirs:
-                    winws_source = os.path.join(root, 'winws')
-                    break
-            
-            # Если папки winws нет, ищем .bat файлы
-            if not winws_source:
-                bat_files_found = []
-                for root, dirs, files in os.walk(temp_extract):
-                    for file in files:
-                        if file.endswith('.bat'):
-                            bat_files_found.append((root, file))
-                
-                if bat_files_found:
-                    # Определяем общую папку для всех .bat файлов
-                    first_bat_dir = bat_files_found[0][0]
-                    all_same_dir = all(dir_path == first_bat_dir for dir_path, _ in bat_files_found)
-                    if all_same_dir:
-                        winws_source = first_bat_dir
-                    else:
-                        winws_source = temp_extract
-            
-            if not winws_source:
-                raise Exception('Не найдены .bat файлы или папка winws в архиве')
-            
-            # Обновляем файлы по одному
-            if os.path.isdir(winws_source):
-                # Нормализуем путь источника до абсолютного
-                winws_source = os.path.abspath(winws_source)
-                
-                # Создаем папку winws если её нет
-                if not os.path.exists(winws_folder):
-                    os.makedirs(winws_folder, exist_ok=True)
-                
-                # Рекурсивно копируем все файлы и папки из winws_source в winws_folder
-                def copy_tree(src, dst):
-                    """Рекурсивно копирует дерево файлов и папок"""
-                    src = os.path.abspath(src)
-                    dst = os.path.abspath(dst)
-                    
-                    if os.path.isdir(src):
-                        # Если папка назначения существует, удаляем её содержимое
-                        if os.path.exists(dst):
-                            # Удаляем существующую папку и её содержимое
-                            for attempt in range(5):
-                                try:
-                                    shutil.rmtree(dst)
-                                    break
-                                except (PermissionError, OSError):
-                                    if attempt < 4:
-                                        time.sleep(0.5)
-                                    else:
-                                        raise
-                        # Создаем папку назначения
-                        os.makedirs(dst, exist_ok=True)
-                        # Копируем содержимое папки
-                        for item in os.listdir(src):
-                            src_item = os.path.join(src, item)
-                            dst_item = os.path.join(dst, item)
-                            copy_tree(src_item, dst_item)
-                    else:
-                        # Копируем файл
-                        # Сначала создаем родительские папки если нужно
-                        parent_dir = os.path.dirname(dst)
-                        if parent_dir:
-                            os.makedirs(parent_dir, exist_ok=True)
-                        # Удаляем существующий файл если есть
-                        if os.path.exists(dst):
-                            for attempt in range(5):
-                                try:
-                                    os.remove(dst)
-                                    break
-                                except (PermissionError, OSError):
-                                    if attempt < 4:
-                                        time.sleep(0.5)
-                                    else:
-                                        raise
-                        shutil.copy2(src, dst)
-                
-                # Копируем все содержимое
-                for item in os.listdir(winws_source):
-                    src_item = os.path.join(winws_source, item)
-                    dst_item = os.path.join(winws_folder, item)
-                    copy_tree(src_item, dst_item)
-            
-            # Очищаем временные файлы
-            try:
-                shutil.rmtree(temp_extract)
-            except Exception:
-                pass
-                
-        except Exception as e:
-            # Восстанавливаем из резервной копии при ошибке
-            if os.path.exists(backup_folder):
-                if os.path.exists(winws_folder):
-                    try:
-                        shutil.rmtree(winws_folder)
-                    except Exception:
-                        pass
-                # Используем рекурсивное копирование вместо copytree
-                os.makedirs(winws_folder, exist_ok=True)
-                for item in os.listdir(backup_folder):
-                    src_item = os.path.join(backup_folder, item)
-                    dst_item = os.path.join(winws_folder, item)
-                    if os.path.isdir(src_item):
-                        shutil.copytree(src_item, dst_item)
-                    else:
-                        shutil.copy2(src_item, dst_item)
-            raise
+        if archive_ext != '.zip':
+            raise Exception(f'Неподдерживаемый формат архива: {archive_ext}. Поддерживается только ZIP формат.')
+        return WinwsInstaller(winws_folder).install_zip(os.path.abspath(archive_path))
     
     def toggle_add_b_flag_on_update(self):
         """Переключает настройку добавления /B флага при обновлении"""
@@ -1830,6 +1716,7 @@ class MainWindow(StandardMainWindow):
     
     def show_test_window(self):
         """Открывает окно тестирования стратегий"""
+        from .test_window import TestWindow
         # Передаем None, чтобы TestWindow сам определил правильный путь
         test_window = TestWindow(self, winws_folder=None)
         test_window.exec()
@@ -1851,6 +1738,7 @@ class MainWindow(StandardMainWindow):
     
     def show_editor(self):
         """Открывает объединённый редактор (списки, drivers\\etc, стратегии)"""
+        from src.editor.unified_editor_window import get_unified_editor_window
         w = get_unified_editor_window(self, initial_tab=0)
         w.show()
         w.raise_()
@@ -1858,6 +1746,7 @@ class MainWindow(StandardMainWindow):
 
     def show_bin_creator(self):
         """Открывает диалог создания bin-файлов (winws/bin/*.bin)."""
+        from src.dialogs.bin_creator_dialog import BinCreatorDialog
         lang = self.settings.get('language', 'ru')
         dlg = BinCreatorDialog(self, language=lang)
         dlg.exec()
@@ -1923,329 +1812,8 @@ class MainWindow(StandardMainWindow):
         # Добавляем начальное сообщение
         
         text_edit.append(tr('diag_running', lang))
-        QApplication.processEvents()
-        
-        results = []
-        
-        # 1. Base Filtering Engine
-        try:
-            result = subprocess.run(['sc', 'query', 'BFE'], capture_output=True, text=True, timeout=5)
-            if 'RUNNING' in result.stdout:
-                results.append(("✓", tr('diag_bfe_passed', lang)))
-            else:
-                results.append(("✗", tr('diag_bfe_failed', lang)))
-        except Exception as e:
-            results.append(("?", tr('diag_error_bfe', lang).format(str(e))))
-        
-        # 2. Proxy check
-        try:
-            import winreg
-            try:
-                key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Software\Microsoft\Windows\CurrentVersion\Internet Settings")
-                proxy_enable, _ = winreg.QueryValueEx(key, "ProxyEnable")
-                if proxy_enable:
-                    proxy_server, _ = winreg.QueryValueEx(key, "ProxyServer")
-                    results.append(("?", tr('diag_proxy_enabled', lang).format(proxy_server)))
-                    results.append(("?", tr('diag_proxy_check_proxy', lang)))
-                else:
-                    results.append(("✓", tr('diag_proxy_passed', lang)))
-                winreg.CloseKey(key)
-            except FileNotFoundError:
-                results.append(("✓", tr('diag_proxy_passed', lang)))
-        except Exception as e:
-            results.append(("?", tr('diag_error_proxy', lang).format(str(e))))
-        
-        # 3. TCP timestamps check
-        try:
-            result = subprocess.run(['netsh', 'interface', 'tcp', 'show', 'global'], 
-                                  capture_output=True, text=True, timeout=5)
-            if 'timestamps' in result.stdout.lower() and 'enabled' in result.stdout.lower():
-                results.append(("✓", tr('diag_tcp_passed', lang)))
-            else:
-                results.append(("?", tr('diag_tcp_disabled', lang)))
-                enable_result = subprocess.run(['netsh', 'interface', 'tcp', 'set', 'global', 'timestamps=enabled'],
-                                              capture_output=True, text=True, timeout=5)
-                if enable_result.returncode == 0:
-                    results.append(("✓", tr('diag_tcp_enabled', lang)))
-                else:
-                    results.append(("✗", tr('diag_tcp_failed', lang)))
-        except Exception as e:
-            results.append(("?", tr('diag_error_tcp', lang).format(str(e))))
-        
-        # 4. AdguardSvc.exe
-        try:
-            for proc in psutil.process_iter(['name']):
-                if proc.info['name'] and proc.info['name'].lower() == 'adguardsvc.exe':
-                    results.append(("✗", tr('diag_adguard_found', lang)))
-                    results.append(("✗", "https://github.com/Flowseal/zapret-discord-youtube/issues/417"))
-                    break
-            else:
-                results.append(("✓", tr('diag_adguard_passed', lang)))
-        except Exception:
-            results.append(("✓", tr('diag_adguard_passed', lang)))
-        
-        # 5. Killer services
-        try:
-            result = subprocess.run(['sc', 'query'], capture_output=True, text=True, timeout=5)
-            if 'Killer' in result.stdout:
-                results.append(("✗", tr('diag_killer_found', lang)))
-                results.append(("✗", "https://github.com/Flowseal/zapret-discord-youtube/issues/2512#issuecomment-2821119513"))
-            else:
-                results.append(("✓", tr('diag_killer_passed', lang)))
-        except Exception as e:
-            results.append(("?", tr('diag_error_killer', lang).format(str(e))))
-        
-        # 6. Intel Connectivity Network Service
-        try:
-            result = subprocess.run(['sc', 'query'], capture_output=True, text=True, timeout=5)
-            if 'Intel' in result.stdout and 'Connectivity' in result.stdout and 'Network' in result.stdout:
-                results.append(("✗", tr('diag_intel_found', lang)))
-                results.append(("✗", "https://github.com/ValdikSS/GoodbyeDPI/issues/541#issuecomment-2661670982"))
-            else:
-                results.append(("✓", tr('diag_intel_passed', lang)))
-        except Exception as e:
-            results.append(("?", tr('diag_error_intel', lang).format(str(e))))
-        
-        # 7. Check Point
-        try:
-            result = subprocess.run(['sc', 'query'], capture_output=True, text=True, timeout=5)
-            checkpoint_found = 'TracSrvWrapper' in result.stdout or 'EPWD' in result.stdout
-            if checkpoint_found:
-                results.append(("✗", tr('diag_checkpoint_found', lang)))
-                results.append(("✗", tr('diag_checkpoint_uninstall', lang)))
-            else:
-                results.append(("✓", tr('diag_checkpoint_passed', lang)))
-        except Exception as e:
-            results.append(("?", tr('diag_error_checkpoint', lang).format(str(e))))
-        
-        # 8. SmartByte
-        try:
-            result = subprocess.run(['sc', 'query'], capture_output=True, text=True, timeout=5)
-            if 'SmartByte' in result.stdout:
-                results.append(("✗", tr('diag_smartbyte_found', lang)))
-                results.append(("✗", tr('diag_smartbyte_uninstall', lang)))
-            else:
-                results.append(("✓", tr('diag_smartbyte_passed', lang)))
-        except Exception as e:
-            results.append(("?", tr('diag_error_smartbyte', lang).format(str(e))))
-        
-        # 9. WinDivert64.sys file
-        try:
-            winws_folder = get_winws_path()
-            bin_path = os.path.join(winws_folder, 'bin')
-            sys_files = [f for f in os.listdir(bin_path) if f.endswith('.sys')] if os.path.exists(bin_path) else []
-            if not sys_files:
-                results.append(("✗", tr('diag_windivert_not_found', lang)))
-            else:
-                results.append(("✓", tr('diag_windivert_found', lang).format(', '.join(sys_files))))
-        except Exception as e:
-            results.append(("?", tr('diag_error_windivert', lang).format(str(e))))
-        
-        # 10. VPN services
-        try:
-            result = subprocess.run(['sc', 'query'], capture_output=True, text=True, timeout=5)
-            if 'VPN' in result.stdout:
-                vpn_services = []
-                for line in result.stdout.split('\n'):
-                    if 'VPN' in line:
-                        parts = line.split(':')
-                        if len(parts) > 1:
-                            vpn_services.append(parts[1].strip())
-                if vpn_services:
-                    results.append(("?", tr('diag_vpn_found', lang).format(', '.join(vpn_services))))
-                    results.append(("?", tr('diag_vpn_disable', lang)))
-                else:
-                    results.append(("✓", tr('diag_vpn_passed', lang)))
-            else:
-                results.append(("✓", tr('diag_vpn_passed', lang)))
-        except Exception as e:
-            results.append(("?", tr('diag_error_vpn', lang).format(str(e))))
-        
-        # 11. DNS (DoH check)
-        try:
-            ps_cmd = "Get-ChildItem -Recurse -Path 'HKLM:System\\CurrentControlSet\\Services\\Dnscache\\InterfaceSpecificParameters\\' -ErrorAction SilentlyContinue | Get-ItemProperty -ErrorAction SilentlyContinue | Where-Object { $_.DohFlags -gt 0 } | Measure-Object | Select-Object -ExpandProperty Count"
-            result = subprocess.run(['powershell', '-Command', ps_cmd], capture_output=True, text=True, timeout=10)
-            doh_found = result.stdout.strip().isdigit() and int(result.stdout.strip()) > 0
-            if not doh_found:
-                results.append(("?", tr('diag_dns_configure', lang)))
-                results.append(("?", tr('diag_dns_win11', lang)))
-            else:
-                results.append(("✓", tr('diag_secure_dns_passed', lang)))
-        except Exception:
-            results.append(("?", tr('diag_dns_unknown', lang)))
-        
-        # 12. WinDivert conflict
-        try:
-            winws_running = False
-            for proc in psutil.process_iter(['name']):
-                if proc.info['name'] and proc.info['name'].lower() == 'winws.exe':
-                    winws_running = True
-                    break
-            
-            windivert_running = False
-            try:
-                result = subprocess.run(['sc', 'query', 'WinDivert'], capture_output=True, text=True, timeout=5)
-                windivert_running = 'RUNNING' in result.stdout or 'STOP_PENDING' in result.stdout
-            except Exception:
-                pass
-            
-            if not winws_running and windivert_running:
-                results.append(("?", tr('diag_windivert_attempt', lang)))
-                try:
-                    subprocess.run(['net', 'stop', 'WinDivert'], capture_output=True, timeout=5)
-                    subprocess.run(['sc', 'delete', 'WinDivert'], capture_output=True, timeout=5)
-                    result = subprocess.run(['sc', 'query', 'WinDivert'], capture_output=True, text=True, timeout=5)
-                    if result.returncode != 0:
-                        results.append(("✓", tr('diag_windivert_removed', lang)))
-                    else:
-                        results.append(("✗", tr('diag_windivert_delete_failed', lang)))
-                except Exception as e:
-                    results.append(("✗", tr('diag_windivert_error', lang).format(str(e))))
-            else:
-                results.append(("✓", tr('diag_windivert_conflict_passed', lang)))
-        except Exception as e:
-            results.append(("?", tr('diag_error_windivert_conflict', lang).format(str(e))))
-        
-        # 13. Проверка статуса службы zapret
-        try:
-            result = subprocess.run(['sc', 'query', 'zapret'], capture_output=True, text=True, timeout=5)
-            if result.returncode == 0:
-                if 'RUNNING' in result.stdout:
-                    results.append(("✓", tr('diag_zapret_running', lang)))
-                    # Пытаемся получить информацию о стратегии из реестра
-                    try:
-                        key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"System\CurrentControlSet\Services\zapret")
-                        strategy_path, _ = winreg.QueryValueEx(key, "zapret-discord-youtube")
-                        results.append(("✓", tr('diag_zapret_strategy', lang).format(strategy_path)))
-                        winreg.CloseKey(key)
-                    except Exception:
-                        pass
-                elif 'STOPPED' in result.stdout:
-                    results.append(("?", tr('diag_zapret_stopped', lang)))
-                else:
-                    results.append(("?", tr('diag_zapret_unknown', lang)))
-            else:
-                results.append(("?", tr('diag_zapret_not_installed', lang)))
-        except Exception as e:
-            results.append(("?", tr('diag_error_zapret', lang).format(str(e))))
-        
-        # 14. Проверка запущен ли winws.exe
-        try:
-            winws_running = False
-            winws_pid = None
-            for proc in psutil.process_iter(['name', 'pid']):
-                if proc.info['name'] and proc.info['name'].lower() == 'winws.exe':
-                    winws_running = True
-                    winws_pid = proc.info['pid']
-                    break
-            
-            if winws_running:
-                results.append(("✓", tr('diag_winws_running', lang).format(winws_pid)))
-            else:
-                results.append(("?", tr('diag_winws_not_running', lang)))
-        except Exception as e:
-            results.append(("?", tr('diag_error_winws', lang).format(str(e))))
-        
-        # 15. Проверка версии Windows и архитектуры
-        try:
-            import platform
-            windows_version = platform.version()
-            windows_release = platform.release()
-            architecture = platform.machine()
-            results.append(("✓", tr('diag_windows_version', lang).format(windows_release, windows_version, architecture)))
-        except Exception as e:
-            results.append(("?", tr('diag_error_windows', lang).format(str(e))))
-        
-        # 16. Проверка прав администратора
-        try:
-            import ctypes
-            is_admin = ctypes.windll.shell32.IsUserAnAdmin() != 0
-            if is_admin:
-                results.append(("✓", tr('diag_admin_yes', lang)))
-            else:
-                results.append(("✗", tr('diag_admin_no', lang)))
-        except Exception as e:
-            results.append(("?", tr('diag_error_admin', lang).format(str(e))))
         
-        # 17. Проверка наличия файлов стратегий
-        try:
-            winws_folder = get_winws_path()
-            strategies_path = os.path.join(winws_folder, 'strategies')
-            if os.path.exists(strategies_path):
-                bat_files = [f for f in os.listdir(strategies_path) if f.endswith('.bat')]
-                if bat_files:
-                    results.append(("✓", tr('diag_strategies_found', lang).format(len(bat_files))))
-                else:
-                    results.append(("?", tr('diag_strategies_empty', lang)))
-            else:
-                results.append(("?", tr('diag_strategies_not_found', lang)))
-        except Exception as e:
-            results.append(("?", tr('diag_error_strategies', lang).format(str(e))))
-        
-        # 18. Проверка DNS серверов
-        try:
-            result = subprocess.run(['ipconfig', '/all'], capture_output=True, text=True, timeout=5)
-            dns_servers = []
-            for line in result.stdout.split('\n'):
-                if 'DNS Servers' in line or 'DNS-серверы' in line:
-                    parts = line.split(':')
-                    if len(parts) > 1:
-                        dns = parts[1].strip()
-                        if dns and dns not in dns_servers:
-                            dns_servers.append(dns)
-            if dns_servers:
-                results.append(("✓", tr('diag_dns_servers', lang).format(', '.join(dns_servers[:3]))))
-            else:
-                results.append(("?", tr('diag_dns_not_detected', lang)))
-        except Exception as e:
-            results.append(("?", tr('diag_error_dns', lang).format(str(e))))
-        
-        # 19. Проверка сетевых адаптеров
-        try:
-            result = subprocess.run(['ipconfig'], capture_output=True, text=True, timeout=5)
-            adapters = []
-            current_adapter = None
-            for line in result.stdout.split('\n'):
-                if 'adapter' in line.lower() or 'адаптер' in line.lower():
-                    if current_adapter:
-                        adapters.append(current_adapter)
-                    current_adapter = line.strip()
-            if current_adapter:
-                adapters.append(current_adapter)
-            if adapters:
-                results.append(("✓", tr('diag_adapters_found', lang).format(len(adapters))))
-            else:
-                results.append(("?", tr('diag_adapters_not_detected', lang)))
-        except Exception as e:
-            results.append(("?", tr('diag_error_adapters', lang).format(str(e))))
-        
-        # 20. Проверка наличия файла targets.txt
-        try:
-            winws_folder = get_winws_path()
-            targets_path = os.path.join(winws_folder, 'utils', 'targets.txt')
-            if os.path.exists(targets_path):
-                with open(targets_path, 'r', encoding='utf-8') as f:
-                    targets_count = len([line for line in f if line.strip()])
-                results.append(("✓", tr('diag_targets_found', lang).format(targets_count)))
-            else:
-                results.append(("?", tr('diag_targets_not_found', lang)))
-        except Exception as e:
-            results.append(("?", tr('diag_error_targets', lang).format(str(e))))
-        
-        # 21. Проверка наличия файла hosts
-        try:
-            hosts_path = r"C:\Windows\System32\drivers\etc\hosts"
-            if os.path.exists(hosts_path):
-                with open(hosts_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    hosts_lines = [line for line in f if line.strip() and not line.strip().startswith('#')]
-                results.append(("✓", tr('diag_hosts_found', lang).format(len(hosts_lines))))
-            else:
-                results.append(("✗", tr('diag_hosts_not_found', lang)))
-        except Exception as e:
-            results.append(("?", tr('diag_error_hosts', lang).format(str(e))))
-        
-        # Отображаем результаты
-        for status, message in results:
+        def append_result(status, message):
             if status == "✓":
                 text_edit.setTextColor(QColor(0, 128, 0))  # Зеленый
             elif status == "✗":
@@ -2253,13 +1821,31 @@ class MainWindow(StandardMainWindow):
             else:
                 text_edit.setTextColor(QColor(255, 165, 0))  # Оранжевый
             text_edit.append(f"{status} {message}")
-            QApplication.processEvents()
-        
-        text_edit.setTextColor(QColor(0, 0, 0))  # Черный для остального текста
-        text_edit.append(tr('diag_completed', lang))
+
+        def on_done():
+            text_edit.setTextColor(QColor(0, 0, 0))  # Черный для остального текста
+            text_edit.append(tr('diag_completed', lang))
+
+        # Проверки выполняются параллельно в фоне, результаты появляются по мере готовности
+        worker = _DiagnosticsWorker(lang)
+        worker.result_signal.connect(append_result)
+        worker.done_signal.connect(on_done)
+        worker.finished.connect(lambda: self._diagnostics_workers.discard(worker))
+        self._diagnostics_workers.add(worker)
+        dialog.finished.connect(lambda _code: self._disconnect_diagnostics_worker(worker))
+        worker.start()
         
         dialog.exec()
     
+    @staticmethod
+    def _disconnect_diagnostics_worker(worker):
+        """Отвязывает воркер от закрытого окна диагностики (проверки дорабатывают в фоне)."""
+        for signal in (worker.result_signal, worker.done_signal):
+            try:
+                signal.disconnect()
+            except (TypeError, RuntimeError):
+                pass
+
     def _export_diagnostics_text(self, text_edit, lang):
         """Экспортирует результаты диагностики в TXT формат"""
         content = text_edit.toPlainText()
@@ -2389,6 +1975,7 @@ class MainWindow(StandardMainWindow):
         Args:
             silent: Если True, не показывает диалоги подтверждения и результатов
         """
+        from src.core import bat_transforms
         lang = self.settings.get('language', 'ru')
         winws_folder = get_winws_path()
         
@@ -2401,10 +1988,7 @@ class MainWindow(StandardMainWindow):
             return
         
         # Ищем все .bat файлы
-        bat_files = []
-        for filename in os.listdir(winws_folder):
-            if filename.endswith('.bat') and os.path.isfile(os.path.join(winws_folder, filename)):
-                bat_files.append(filename)
+        bat_files = bat_transforms.list_bat_files(winws_folder)
         
         if not bat_files:
             if not silent:
@@ -2430,35 +2014,13 @@ class MainWindow(StandardMainWindow):
             if reply != QMessageBox.StandardButton.Yes:
                 return
         
-        # Обрабатываем файлы
-        processed_count = 0
-        modified_count = 0
-        errors = []
-        
-        for filename in bat_files:
-            file_path = os.path.join(winws_folder, filename)
-            try:
-                # Читаем файл
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                
-                # Ищем и заменяем строку
-                old_string = 'start "zapret: %~n0" /min'
-                new_string = 'start "zapret: %~n0" /B /min'
-                
-                if old_string in content:
-                    # Заменяем все вхождения
-                    new_content = content.replace(old_string, new_string)
-                    
-                    # Сохраняем файл
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        f.write(new_content)
-                    
-                    modified_count += 1
-                
-                processed_count += 1
-            except Exception as e:
-                errors.append(f'{filename}: {str(e)}')
+        # Обрабатываем файлы за один проход (пишутся только изменившиеся)
+        result = bat_transforms.apply_transforms(
+            winws_folder, bat_transforms.resolve(['add_b_flag']), files=bat_files
+        )
+        processed_count = result['processed']
+        modified_count = len(result['modified'])
+        errors = result['errors']
         
         # Показываем результат (только если не silent режим)
         if not silent:
@@ -2481,6 +2043,7 @@ class MainWindow(StandardMainWindow):
         Args:
             silent: Если True, не показывает диалоги подтверждения и результатов
         """
+        from src.core import bat_transforms
         lang = self.settings.get('language', 'ru')
         winws_folder = get_winws_path()
         
@@ -2493,10 +2056,7 @@ class MainWindow(StandardMainWindow):
             return
         
         # Ищем все .bat файлы
-        bat_files = []
-        for filename in os.listdir(winws_folder):
-            if filename.endswith('.bat') and os.path.isfile(os.path.join(winws_folder, filename)):
-                bat_files.append(filename)
+        bat_files = bat_transforms.list_bat_files(winws_folder)
         
         if not bat_files:
             if not silent:
@@ -2522,35 +2082,13 @@ class MainWindow(StandardMainWindow):
             if reply != QMessageBox.StandardButton.Yes:
                 return
         
-        # Обрабатываем файлы
-        processed_count = 0
-        modified_count = 0
-        errors = []
-        
-        for filename in bat_files:
-            file_path = os.path.join(winws_folder, filename)
-            try:
-                # Читаем файл
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                
-                # Ищем и заменяем строку
-                old_string = 'start "zapret: %~n0" /B /min'
-                new_string = 'start "zapret: %~n0" /min'
-                
-                if old_string in content:
-                    # Заменяем все вхождения
-                    new_content = content.replace(old_string, new_string)
-                    
-                    # Сохраняем файл
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        f.write(new_content)
-                    
-                    modified_count += 1
-                
-                processed_count += 1
-            except Exception as e:
-                errors.append(f'{filename}: {str(e)}')
+        # Обрабатываем файлы за один проход (пишутся только изменившиеся)
+        result = bat_transforms.apply_transforms(
+            winws_folder, bat_transforms.resolve(['remove_b_flag']), files=bat_files
+        )
+        processed_count = result['processed']
+        modified_count = len(result['modified'])
+        errors = result['errors']
         
         # Показываем результат (только если не silent режим)
         if not silent:
@@ -2574,6 +2112,7 @@ class MainWindow(StandardMainWindow):
         Args:
             silent: Если True, не показывает диалоги подтверждения и результатов
         """
+        from src.core import bat_transforms
         lang = self.settings.get('language', 'ru')
         winws_folder = get_winws_path()
         
@@ -2587,49 +2126,18 @@ class MainWindow(StandardMainWindow):
             return
         
         # Ищем все .bat файлы
-        bat_files = []
-        for filename in os.listdir(winws_folder):
-            if filename.endswith('.bat') and os.path.isfile(os.path.join(winws_folder, filename)):
-                bat_files.append(filename)
+        bat_files = bat_transforms.list_bat_files(winws_folder)
         
         if not bat_files:
             return
         
-        # Обрабатываем файлы
-        processed_count = 0
-        modified_count = 0
-        errors = []
-        
-        for filename in bat_files:
-            file_path = os.path.join(winws_folder, filename)
-            try:
-                # Читаем файл
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    lines = f.readlines()
-                
-                # Удаляем строки с "call service.bat check_updates"
-                new_lines = []
-                modified = False
-                for line in lines:
-                    # Проверяем, содержит ли строка "call service.bat check_updates"
-                    # Учитываем возможные пробелы и регистр
-                    stripped_line = line.strip()
-                    # Проверяем точное совпадение или с возможными пробелами
-                    if (stripped_line.lower() == 'call service.bat check_updates' or
-                        'call service.bat check_updates' in stripped_line.lower()):
-                        modified = True
-                        continue  # Пропускаем эту строку
-                    new_lines.append(line)
-                
-                if modified:
-                    # Сохраняем файл
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        f.writelines(new_lines)
-                    modified_count += 1
-                
-                processed_count += 1
-            except Exception as e:
-                errors.append(f'{filename}: {str(e)}')
+        # Обрабатываем файлы за один проход (пишутся только изменившиеся)
+        result = bat_transforms.apply_transforms(
+            winws_folder, bat_transforms.resolve(['remove_check_updates']), files=bat_files
+        )
+        processed_count = result['processed']
+        modified_count = len(result['modified'])
+        errors = result['errors']
         
         # Показываем результат (только если не silent режим)
         if not silent and (modified_count > 0 or errors):
@@ -2645,6 +2153,17 @@ class MainWindow(StandardMainWindow):
                 msg.setIcon(QMessageBox.Icon.Information)
             msg.exec()
     
+    def _apply_update_transforms(self):
+        """Применяет к стратегиям правки после обновления по настройкам
+        (/B, удаление check_updates, regex-правила bat_regex_rules) — каждый .bat читается один раз."""
+        from src.core import bat_transforms
+        winws_folder = get_winws_path()
+        if not os.path.isdir(winws_folder):
+            return None
+        return bat_transforms.apply_transforms(
+            winws_folder, bat_transforms.update_transforms(self.settings)
+        )
+    
     def toggle_remove_check_updates(self):
         """Переключает настройку удаления проверки обновлений"""
         checked = self.remove_check_updates_action.isChecked()
@@ -2652,180 +2171,107 @@ class MainWindow(StandardMainWindow):
         self.config.set_setting('remove_check_updates', checked)
     
     def update_ipset_list(self):
-        """Обновляет список IPSet из репозитория"""
+        """Обновляет список IPSet из репозитория (в фоне; при неизменном списке файл не трогается)"""
+        from src.core import list_updater
         lang = self.settings.get('language', 'ru')
-        winws_folder = get_winws_path()
-        list_file = os.path.join(winws_folder, 'lists', 'ipset-all.txt')
-        url = 'https://raw.githubusercontent.com/Flowseal/zapret-discord-youtube/refs/heads/main/.service/ipset-service.txt'
-        
-        # Показываем прогресс
-        progress_dialog = QProgressDialog(self)
-        progress_dialog.setWindowTitle(tr('update_ipset_list', lang))
-        progress_dialog.setLabelText(tr('update_ipset_progress', lang))
-        progress_dialog.setRange(0, 0)
-        progress_dialog.setCancelButton(None)
-        progress_dialog.show()
-        QApplication.processEvents()
-        
-        try:
-            # Создаем директорию если не существует
-            os.makedirs(os.path.dirname(list_file), exist_ok=True)
-            
-            # Пробуем использовать curl
-            curl_path = os.path.join(os.environ.get('SystemRoot', 'C:\\Windows'), 'System32', 'curl.exe')
-            if os.path.exists(curl_path):
-                result = subprocess.run(
-                    [curl_path, '-L', '-o', list_file, url],
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-                if result.returncode != 0:
-                    raise Exception(f'curl failed: {result.stderr}')
-            else:
-                # Используем PowerShell
-                ps_command = f'''
-$url = '{url}';
-$out = '{list_file}';
-$dir = Split-Path -Parent $out;
-if (-not (Test-Path $dir)) {{ New-Item -ItemType Directory -Path $dir | Out-Null }};
-$res = Invoke-WebRequest -Uri $url -TimeoutSec 10 -UseBasicParsing;
-if ($res.StatusCode -eq 200) {{ $res.Content | Out-File -FilePath $out -Encoding UTF8 }} else {{ exit 1 }}
-'''
-                result = subprocess.run(
-                    ['powershell', '-Command', ps_command],
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-                if result.returncode != 0:
-                    raise Exception(f'PowerShell failed: {result.stderr}')
-            
-            progress_dialog.close()
-            
-            msg = configure_message_box(QMessageBox(self))
-            msg.setWindowTitle(tr('update_ipset_list', lang))
-            msg.setText(tr('update_ipset_success', lang))
-            msg.setIcon(QMessageBox.Icon.Information)
-            msg.exec()
-        except Exception as e:
-            progress_dialog.close()
+        list_file = os.path.join(get_winws_path(), 'lists', 'ipset-all.txt')
+
+        def on_done(result, error):
             msg = configure_message_box(QMessageBox(self))
-            msg.setWindowTitle(tr('msg_error', lang))
-            msg.setText(tr('update_ipset_error', lang).format(str(e)))
-            msg.setIcon(QMessageBox.Icon.Warning)
+            if error:
+                msg.setWindowTitle(tr('msg_error', lang))
+                msg.setText(tr('update_ipset_error', lang).format(error))
+                msg.setIcon(QMessageBox.Icon.Warning)
+            else:
+                msg.setWindowTitle(tr('update_ipset_list', lang))
+                if result['status'] == 'not_modified':
+                    msg.setText(tr('update_ipset_up_to_date', lang))
+                else:
+                    msg.setText(tr('update_ipset_success', lang))
+                msg.setIcon(QMessageBox.Icon.Information)
             msg.exec()
-    
+
+        self._start_list_update(
+            lambda: list_updater.update_ipset_list(list_file),
+            tr('update_ipset_list', lang), tr('update_ipset_progress', lang), on_done,
+        )
+
     def update_hosts_file(self):
-        """Обновляет hosts файл из репозитория"""
+        """Скачивает hosts репозитория в zapret_hosts.txt (в фоне) и сверяет его с системным hosts"""
+        from src.core import list_updater
         lang = self.settings.get('language', 'ru')
         hosts_file = os.path.join(os.environ.get('SystemRoot', 'C:\\Windows'), 'System32', 'drivers', 'etc', 'hosts')
-        hosts_url = 'https://raw.githubusercontent.com/Flowseal/zapret-discord-youtube/refs/heads/main/.service/hosts'
         temp_file = os.path.join(os.environ.get('TEMP', 'C:\\Temp'), 'zapret_hosts.txt')
-        
-        # Показываем прогресс
-        progress_dialog = QProgressDialog(self)
-        progress_dialog.setWindowTitle(tr('update_hosts_file', lang))
-        progress_dialog.setLabelText(tr('update_hosts_progress', lang))
-        progress_dialog.setRange(0, 0)
-        progress_dialog.setCancelButton(None)
-        progress_dialog.show()
-        QApplication.processEvents()
-        
-        try:
-            # Скачиваем файл
-            curl_path = os.path.join(os.environ.get('SystemRoot', 'C:\\Windows'), 'System32', 'curl.exe')
-            if os.path.exists(curl_path):
-                result = subprocess.run(
-                    [curl_path, '-L', '-s', '-o', temp_file, hosts_url],
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-                if result.returncode != 0:
-                    raise Exception(f'curl failed: {result.stderr}')
-            else:
-                # Используем PowerShell
-                ps_command = f'''
-$url = '{hosts_url}';
-$out = '{temp_file}';
-$res = Invoke-WebRequest -Uri $url -TimeoutSec 10 -UseBasicParsing;
-if ($res.StatusCode -eq 200) {{ $res.Content | Out-File -FilePath $out -Encoding UTF8 }} else {{ exit 1 }}
-'''
-                result = subprocess.run(
-                    ['powershell', '-Command', ps_command],
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-                if result.returncode != 0:
-                    raise Exception(f'PowerShell failed: {result.stderr}')
-            
-            if not os.path.exists(temp_file):
-                raise Exception(tr('update_hosts_download_failed', lang))
-            
-            # Читаем первую и последнюю строки из скачанного файла
-            with open(temp_file, 'r', encoding='utf-8') as f:
-                lines = [line.strip() for line in f.readlines() if line.strip()]
-            
-            if not lines:
-                raise Exception(tr('update_hosts_file_empty', lang))
-            
-            first_line = lines[0]
-            last_line = lines[-1]
-            
-            # Проверяем, нужно ли обновление
-            needs_update = False
-            if os.path.exists(hosts_file):
-                with open(hosts_file, 'r', encoding='utf-8') as f:
-                    hosts_content = f.read()
-                    if first_line not in hosts_content or last_line not in hosts_content:
-                        needs_update = True
-            else:
-                needs_update = True
-            
-            progress_dialog.close()
-            
-            if needs_update:
+
+        def task():
+            result = list_updater.update_hosts_copy(temp_file)
+            result['needs_update'] = list_updater.hosts_needs_update(temp_file, hosts_file)
+            return result
+
+        def on_done(result, error):
+            if error:
+                msg = configure_message_box(QMessageBox(self))
+                msg.setWindowTitle(tr('msg_error', lang))
+                msg.setText(tr('update_hosts_error', lang).format(error))
+                msg.setIcon(QMessageBox.Icon.Warning)
+                msg.exec()
+                return
+            msg = QMessageBox(self)
+            msg.setWindowTitle(tr('update_hosts_file', lang))
+            msg.setIcon(QMessageBox.Icon.Information)
+            if result['needs_update']:
                 # Открываем скачанный файл в notepad и проводник с hosts файлом
-                msg = QMessageBox(self)
-                msg.setWindowTitle(tr('update_hosts_file', lang))
                 msg.setText(tr('update_hosts_needs_update', lang))
-                msg.setIcon(QMessageBox.Icon.Information)
                 msg.exec()
-                
-                # Открываем скачанный файл в notepad
                 subprocess.Popen(['notepad', temp_file])
-                
-                # Открываем проводник с hosts файлом
                 subprocess.Popen(['explorer', '/select,', hosts_file])
             else:
-                # Удаляем временный файл
-                try:
-                    os.remove(temp_file)
-                except Exception:
-                    pass
-                
-                msg = QMessageBox(self)
-                msg.setWindowTitle(tr('update_hosts_file', lang))
+                # zapret_hosts.txt остаётся: по нему идёт условный запрос и его показывает редактор
                 msg.setText(tr('update_hosts_up_to_date', lang))
-                msg.setIcon(QMessageBox.Icon.Information)
                 msg.exec()
-        except Exception as e:
+
+        self._start_list_update(
+            task, tr('update_hosts_file', lang), tr('update_hosts_progress', lang), on_done,
+        )
+
+    def _start_list_update(self, task, title, label, on_done):
+        """Запускает обновление списка в фоне с немодальным индикатором; on_done(result, error) — в главном потоке."""
+        if self._list_update_worker is not None and self._list_update_worker.isRunning():
+            return
+        progress_dialog = QProgressDialog(self)
+        progress_dialog.setWindowTitle(title)
+        progress_dialog.setLabelText(label)
+        progress_dialog.setRange(0, 0)
+        progress_dialog.setCancelButton(None)
+        progress_dialog.show()
+
+        def done(result, error):
             progress_dialog.close()
-            msg = configure_message_box(QMessageBox(self))
-            msg.setWindowTitle(tr('msg_error', lang))
-            msg.setText(tr('update_hosts_error', lang).format(str(e)))
-            msg.setIcon(QMessageBox.Icon.Warning)
-            msg.exec()
+            on_done(result, error)
+
+        def finished():
+            # Ссылку держим до конца run(): done_signal приходит, пока поток ещё работает
+            self._list_update_worker = None
+            worker.deleteLater()
+
+        worker = _ListUpdateWorker(task)
+        worker.done_signal.connect(done)
+        worker.finished.connect(finished)
+        self._list_update_worker = worker
+        worker.start()
     
     def update_filter_statuses(self):
         """Синхронизирует настройки Game Filter и IPSet Filter из файлов с конфигом"""
-        game_filter_enabled = self.winws_manager.is_game_filter_enabled()
+        self._apply_filter_statuses(
+            self.winws_manager.is_game_filter_enabled(),
+            self.winws_manager.get_ipset_mode(),
+        )
+
+    def _apply_filter_statuses(self, game_filter_enabled, ipset_mode):
+        """Записывает в конфиг прочитанные из файлов winws состояния фильтров, если они изменились."""
         if game_filter_enabled != self.settings.get('game_filter_enabled', False):
             self.settings['game_filter_enabled'] = game_filter_enabled
             self.config.set_setting('game_filter_enabled', game_filter_enabled)
-        ipset_mode = self.winws_manager.get_ipset_mode()
         if ipset_mode != self.settings.get('ipset_filter_mode', 'loaded'):
             self.settings['ipset_filter_mode'] = ipset_mode
             self.config.set_setting('ipset_filter_mode', ipset_mode)
@@ -3021,7 +2467,7 @@ if ($res.StatusCode -eq 200) {{ $res.Content | Out-File -FilePath $out -Encoding
     
     def open_github_zapret(self):
         """Открывает страницу GitHub репозитория zapret из настроек."""
-        slug = getattr(self.zapret_updater, "github_repo", ZapretUpdater.GITHUB_REPO)
+        slug = self._get_zapret_repo_slug()
         slug = (slug or "").strip().strip("/")
         # Если вдруг в github_repo уже попал полный URL — используем его как есть
         if slug.lower().startswith("http://") or slug.lower().startswith("https://"):
@@ -3068,23 +2514,14 @@ if ($res.StatusCode -eq 200) {{ $res.Content | Out-File -FilePath $out -Encoding
     
     def load_bat_files(self):
         """Загружает названия .bat файлов из папки winws"""
+        # Все .bat, кроме service.bat, без расширения и по алфавиту; None — папки winws нет
+        self._fill_strategy_combo(scan_strategies(get_winws_path()))
+
+    def _fill_strategy_combo(self, bat_files, base_version=None):
+        """Заполняет ComboBox стратегиями (bat_files=None — папка winws не найдена).
+        base_version — уже известная версия zapret, чтобы не читать service.bat повторно."""
         lang = self.settings.get('language', 'ru')
-        winws_folder = get_winws_path()
-        bat_files = []
-        
-        if os.path.exists(winws_folder):
-            # Получаем все файлы из папки winws
-            for filename in os.listdir(winws_folder):
-                # Проверяем, что это .bat файл и это файл, а не папка
-                # Исключаем service.bat
-                if filename.endswith('.bat') and filename != 'service.bat' and os.path.isfile(os.path.join(winws_folder, filename)):
-                    # Убираем расширение .bat
-                    name_without_ext = filename[:-4]  # Убираем последние 4 символа (.bat)
-                    bat_files.append(name_without_ext)
-            
-            # Сортируем список для удобства
-            bat_files.sort()
-            
+        if bat_files is not None:
             # Сохраняем текущий выбор
             current_strategy = self._get_selected_strategy_name()
             
@@ -3104,7 +2541,63 @@ if ($res.StatusCode -eq 200) {{ $res.Content | Out-File -FilePath $out -Encoding
             self.combo_box.addItem(tr('msg_winws_not_found', lang), None)
 
         # После пересборки списка стратегий — обновляем отображение версии/ pid
-        self._refresh_strategy_display()
+        self._refresh_strategy_display(base_version)
+
+    def _strategy_names_in_combo(self):
+        """Список стратегий в ComboBox (без служебного пункта «внешний запуск»)."""
+        names = []
+        for i in range(self.combo_box.count()):
+            data = self.combo_box.itemData(i)
+            if isinstance(data, str) and data and data != "__external_winws__":
+                names.append(data)
+        return names
+
+    def _start_ui_reconcile(self):
+        """Запускает фоновую сверку окна, нарисованного по снимку, с диском и процессами."""
+        worker = _UiReconcileWorker(self)
+        worker.done_signal.connect(self._on_ui_reconcile_done)
+        def _on_ui_reconcile_finished():
+            # Ссылку держим до конца run(): done_signal приходит, пока поток ещё работает
+            self._ui_reconcile_worker = None
+            worker.deleteLater()
+        worker.finished.connect(_on_ui_reconcile_finished)
+        self._ui_reconcile_worker = worker
+        worker.start()
+
+    def _on_ui_reconcile_done(self, state):
+        """Применяет результат фоновой сверки (главный поток)."""
+        base_version = state.get('base_version') or "unknown"
+        if 'strategies' in state:
+            strategies = state['strategies']
+            if strategies is None or strategies != self._strategy_names_in_combo():
+                # Список на диске изменился — пересобираем без записи last_strategy из промежуточных выборов
+                self.combo_box.blockSignals(True)
+                try:
+                    self._fill_strategy_combo(strategies, base_version)
+                finally:
+                    self.combo_box.blockSignals(False)
+            else:
+                self._refresh_strategy_display(base_version)
+        # Пока идёт сверка, монитор процесса мог уже обнаружить winws — тогда выбор не трогаем
+        if not self.is_running:
+            self._apply_strategy_selection(
+                state.get('winws_running', False), state.get('running_strategy'), auto_start=False
+            )
+        if 'game_filter_enabled' in state:
+            self._apply_filter_statuses(state['game_filter_enabled'], state['ipset_filter_mode'])
+        self._update_window_title_with_strategy()
+        if not self.is_running and self.settings.get('auto_start_last_strategy', False):
+            QTimer.singleShot(0, self.auto_start_last_strategy)
+
+    def _save_ui_snapshot(self):
+        """Сохраняет снимок окна для мгновенной отрисовки при следующем запуске."""
+        try:
+            strategies = self._strategy_names_in_combo()
+            if not strategies and not os.path.isdir(get_winws_path()):
+                return  # без папки winws рисовать нечего — при запуске пойдём обычным путём
+            save_ui_snapshot(get_winws_path(), strategies, base_version=self._base_version)
+        except Exception:
+            pass
 
     def _init_winws_watcher(self):
         """Инициализирует наблюдение за папкой winws."""
@@ -3137,6 +2630,32 @@ if ($res.StatusCode -eq 200) {{ $res.Content | Out-File -FilePath $out -Encoding
         except Exception:
             pass
 
+    def _suspend_winws_watchers(self):
+        """Снимает наблюдение за winws (окно и редактор) перед подменой папки установщиком:
+        на Windows открытые дескрипторы наблюдения не дают переименовать папку."""
+        watched = self.winws_watcher.directories() + self.winws_watcher.files()
+        if watched:
+            self.winws_watcher.removePaths(watched)
+        editor = self._open_editor_window()
+        if editor is not None:
+            editor.suspend_winws_watching()
+
+    def _resume_winws_watchers(self):
+        """Возвращает наблюдение после подмены папки winws."""
+        self._init_winws_watcher()
+        editor = self._open_editor_window()
+        if editor is not None:
+            editor.resume_winws_watching()
+
+    @staticmethod
+    def _open_editor_window():
+        """Открытый редактор или None (модуль редактора не загружается ради проверки)."""
+        import sys
+        module = sys.modules.get('src.editor.unified_editor_window')
+        if module is None:
+            return None
+        return getattr(module.get_unified_editor_window, '_instance', None)
+
     def _on_winws_dir_changed(self, path: str):
         """Обработчик изменений в файловой системе для автодетекта winws."""
         try:
@@ -3196,24 +2715,19 @@ if ($res.StatusCode -eq 200) {{ $res.Content | Out-File -FilePath $out -Encoding
             return
 
     def _get_running_winws_process(self):
-        """Возвращает первый найденный процесс winws.exe (psutil.Process) или None."""
+        """Возвращает первый найденный процесс winws.exe (ProcessInfo) или None."""
         try:
-            for proc in psutil.process_iter(['pid', 'name']):
-                try:
-                    if proc.info.get('name', '').lower() == 'winws.exe':
-                        return proc
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                    continue
+            procs = get_backend().list_processes('winws.exe')
         except Exception:
             return None
-        return None
+        return procs[0] if procs else None
 
     def _guess_winws_root_from_process(self, proc):
         """Пытается определить корень winws (где лежит service.bat) по процессу winws.exe."""
         import pathlib
         candidates = []
         try:
-            exe = proc.exe()
+            exe = proc.exe
             if exe:
                 exe_path = pathlib.Path(exe)
                 candidates.append(exe_path)                 # ...\bin\winws.exe (как файл)
@@ -3223,7 +2737,7 @@ if ($res.StatusCode -eq 200) {{ $res.Content | Out-File -FilePath $out -Encoding
         except Exception:
             pass
         try:
-            cwd = proc.cwd()
+            cwd = proc.cwd
             if cwd:
                 cwd_path = pathlib.Path(cwd)
                 candidates.append(cwd_path)
@@ -3268,19 +2782,22 @@ if ($res.StatusCode -eq 200) {{ $res.Content | Out-File -FilePath $out -Encoding
             version = None
         return (version, pid, winws_root)
 
-    def _refresh_strategy_display(self):
+    def _refresh_strategy_display(self, base_version=None):
         """
         Обновляет отображаемые тексты в ComboBox:
         - Для всех стратегий показывает [version] (версия берётся из service.bat в нашей winws)
         - Если winws запущен "внешне" (не этой сессией ZapretDesktop) — для активной стратегии показывает [version | pid]
+        base_version — уже известная версия (из снимка окна или фоновой сверки); None — прочитать service.bat.
         """
         ext_key = "__external_winws__"
         # Базовая версия наших стратегий (из нашей winws), показывается всегда
-        try:
-            from src.core.winws_version import read_local_version_from_winws_root
-            base_version = read_local_version_from_winws_root(get_winws_path()) or "unknown"
-        except Exception:
-            base_version = "unknown"
+        if base_version is None:
+            try:
+                from src.core.winws_version import read_local_version_from_winws_root
+                base_version = read_local_version_from_winws_root(get_winws_path()) or "unknown"
+            except Exception:
+                base_version = "unknown"
+        self._base_version = base_version
 
         # Сначала сбрасываем тексты к "сырым" именам (userData) и сразу украшаем версией
         try:
@@ -3354,16 +2871,11 @@ if ($res.StatusCode -eq 200) {{ $res.Content | Out-File -FilePath $out -Encoding
             proc_cmdline = None
             proc_exe = None
             # Ищем реально запущенный winws.exe и его путь на диске
-            for proc in psutil.process_iter(['name', 'cmdline', 'exe']):
-                try:
-                    if proc.info.get('name', '').lower() == 'winws.exe':
-                        cmdline = proc.info.get('cmdline')
-                        if cmdline:
-                            proc_cmdline = ' '.join(cmdline) if isinstance(cmdline, list) else str(cmdline)
-                        proc_exe = proc.info.get('exe') or ''
-                        break
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                    pass
+            proc = self._get_running_winws_process()
+            if proc:
+                if proc.cmdline:
+                    proc_cmdline = ' '.join(proc.cmdline)
+                proc_exe = proc.exe or ''
             if not proc_cmdline or 'winws.exe' not in proc_cmdline.lower():
                 return None
             if not proc_exe:
@@ -3430,24 +2942,26 @@ if ($res.StatusCode -eq 200) {{ $res.Content | Out-File -FilePath $out -Encoding
         except Exception:
             return None
     
+    def _is_winws_process_running(self):
+        """Проверяет, есть ли среди процессов winws.exe."""
+        try:
+            return get_backend().is_process_running('winws.exe')
+        except Exception:
+            return False
+
     def restore_last_strategy(self):
         """Восстанавливает последнюю выбранную стратегию.
         Если winws.exe уже запущен (программа перезапущена), пытается определить
         запущенную стратегию и выбрать её в ComboBox."""
+        winws_running = self._is_winws_process_running()
+        detected = self._detect_running_strategy() if winws_running else None
+        self._apply_strategy_selection(winws_running, detected)
+
+    def _apply_strategy_selection(self, winws_running, detected, auto_start=True):
+        """Выбирает в ComboBox запущенную (detected) или последнюю стратегию.
+        auto_start=False — не планировать автозапуск (окно нарисовано по снимку, сверка ещё идёт)."""
         strategy_to_select = None
-        winws_running = False
-        try:
-            for proc in psutil.process_iter(['name']):
-                try:
-                    if proc.info.get('name', '').lower() == 'winws.exe':
-                        winws_running = True
-                        break
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                    pass
-        except Exception:
-            pass
         if winws_running:
-            detected = self._detect_running_strategy()
             if detected:
                 strategy_to_select = detected
                 self.is_running = True
@@ -3462,9 +2976,9 @@ if ($res.StatusCode -eq 200) {{ $res.Content | Out-File -FilePath $out -Encoding
                 self.combo_box.setCurrentIndex(index)
                 if winws_running:
                     # Если стратегия уже запущена при старте приложения — обновляем combo (в т.ч. pid) и заголовок
-                    self._refresh_strategy_display()
+                    self._refresh_strategy_display(self._base_version)
                     self._update_window_title_with_strategy()
-                elif self.settings.get('auto_start_last_strategy', False):
+                elif auto_start and self.settings.get('auto_start_last_strategy', False):
                     QTimer.singleShot(500, self.auto_start_strategy)
         # Всегда синхронизируем кнопку и ComboBox с is_running после восстановления
         self._sync_run_state_ui()
@@ -3648,7 +3162,7 @@ if ($res.StatusCode -eq 200) {{ $res.Content | Out-File -FilePath $out -Encoding
         if self._start_worker is not None and self._start_worker.isRunning():
             self._is_auto_start = False
             return
-        self._start_worker = _StartWorker(self, bat_path_abs, bat_dir, os.name == 'nt')
+        self._start_worker = _StartWorker(self, bat_path_abs, bat_dir)
         self._start_worker.done_signal.connect(
             lambda ok, proc, err: self._on_start_worker_done(ok, proc, err, current_strategy, bat_filename)
         )
@@ -3662,6 +3176,7 @@ if ($res.StatusCode -eq 200) {{ $res.Content | Out-File -FilePath $out -Encoding
     def _on_start_worker_done(self, success, process, error_message, current_strategy, bat_filename):
         """Вызывается в главном потоке после завершения _StartWorker."""
         lang = self.settings.get('language', 'ru')
+        invalidate_service_cache()  # запуск .bat загружает WinDivert / меняет службы
         is_service_file = bat_filename.lower().startswith('service')
         if not success:
             self.is_running = False
@@ -3710,30 +3225,22 @@ if ($res.StatusCode -eq 200) {{ $res.Content | Out-File -FilePath $out -Encoding
         apps = self.settings.get('auto_restart_apps', [])
         if not apps:
             return
-        try:
-            import psutil
-        except ImportError:
-            return
-
-        targets = [name.lower() for name in apps if name]
+        targets = {name.lower() for name in apps if name}
         if not targets:
             return
 
+        backend = get_backend()
         to_restart = []
-        for proc in psutil.process_iter(['name', 'exe']):
-            try:
-                name = (proc.info.get('name') or '').lower()
-                if name in targets:
-                    exe_path = proc.info.get('exe')
-                    if exe_path and os.path.exists(exe_path):
-                        to_restart.append(exe_path)
-                    # Пытаемся аккуратно завершить
-                    try:
-                        proc.terminate()
-                    except Exception:
-                        pass
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                continue
+        try:
+            running = {proc.name.lower() for proc in backend.list_processes()}
+            for name in targets & running:
+                for proc in backend.list_processes(name):
+                    if proc.exe and os.path.exists(proc.exe):
+                        to_restart.append(proc.exe)
+                # Пытаемся аккуратно завершить
+                backend.terminate_processes(name)
+        except Exception:
+            return
 
         # Перезапускаем приложения
         for exe_path in to_restart:
@@ -3754,33 +3261,8 @@ if ($res.StatusCode -eq 200) {{ $res.Content | Out-File -FilePath $out -Encoding
     
     def _do_stop_winws_process(self):
         """Синхронно завершает все процессы winws.exe (вызывается из потока или main)."""
-        import time
-        processes_to_kill = []
-        for proc in psutil.process_iter(['pid', 'name']):
-            try:
-                if proc.info.get('name', '').lower() == 'winws.exe':
-                    processes_to_kill.append(proc)
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
-        for proc in processes_to_kill:
-            try:
-                proc.terminate()
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
-        if processes_to_kill:
-            time.sleep(0.5)
-        remaining = []
-        for proc in psutil.process_iter(['pid', 'name']):
-            try:
-                if proc.info.get('name', '').lower() == 'winws.exe':
-                    remaining.append(proc)
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
-        for proc in remaining:
-            try:
-                proc.kill()
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
+        stop_processes('winws.exe')
+        invalidate_service_cache()  # WinDivert выгружается уже после завершения winws
 
     def stop_winws_process(self, silent=False):
         """Останавливает процесс winws.exe. При silent=False — в фоне (UI не замирает).
@@ -3833,17 +3315,7 @@ if ($res.StatusCode -eq 200) {{ $res.Content | Out-File -FilePath $out -Encoding
         import time
         
         # Проверяем, запущен ли процесс winws.exe
-        winws_running = False
-        try:
-            for proc in psutil.process_iter(['pid', 'name']):
-                try:
-                    if proc.info['name'] and proc.info['name'].lower() == 'winws.exe':
-                        winws_running = True
-                        break
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                    pass
-        except Exception:
-            pass
+        winws_running = self._is_winws_process_running()
         
         # Скрываем полоску прогресса только когда процесс исчез и мы не ждём его появления
         # (при ожидании старта bat_start_time не None и is_running True — не скрываем)
@@ -3956,6 +3428,7 @@ if ($res.StatusCode -eq 200) {{ $res.Content | Out-File -FilePath $out -Encoding
     def showEvent(self, event):
         """Обработка показа окна - обновляет меню трея"""
         super().showEvent(event)
+        startup_profiler.first_window_shown()
         # Обновляем меню трея при показе окна
         if hasattr(self, 'tray') and self.tray:
             self.tray.update_menu()